@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史数据归档文件
+
+归档行按 表/设备/月份 分区，存为 gzip 压缩的 NDJSON（每行一个JSON对象）：
+    <root>/<table>/<device_id>/<YYYY-MM>.ndjson.gz
+设备目录名为 device_id 的百分号编码（字母数字和 _.- 保持原样），不同设备不会落到同一目录。
+追加写入时在文件末尾新增一个 gzip 成员，读取时 gzip 会连续读出全部成员，
+已写入的数据不会被改写。写入后 fsync，调用方确认写入成功后再删除数据库中的行。
+"""
+
+import gzip
+import json
+import os
+import re
+import threading
+from datetime import date, datetime
+from urllib.parse import quote
+
+_SAFE_NAME = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+def device_dir_name(device_id):
+    """设备ID对应的目录名（可逆），只含字母数字、_.-~ 和 %XX"""
+    name = quote(str(device_id), safe='')
+    if name in ('', '.', '..'):
+        name = name.replace('.', '%2E') or '%'
+    return name
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"无法序列化 {type(value).__name__}")
+
+
+def _month_key(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return f'{value.year:04d}-{value.month:02d}'
+
+
+class ArchiveStore(object):
+    """按设备和月份分区的压缩归档"""
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _device_dir(self, table, device_id):
+        return os.path.join(self.root, table, device_dir_name(device_id))
+
+    def _read_dirs(self, table, device_id):
+        """读取时查找的目录：旧版本把非法字符替换为 _ 的目录（可能混有其他设备的行）也要读"""
+        directory = self._device_dir(table, device_id)
+        legacy = os.path.join(self.root, table, _SAFE_NAME.sub('_', str(device_id)))
+        return [directory] if legacy == directory else [directory, legacy]
+
+    def write(self, table, rows, time_field, device_field='device_id'):
+        """追加归档行（dict 列表），按设备和月份写入各分区，返回写入的分区文件数"""
+        partitions = {}
+        for row in rows:
+            key = (row[device_field], _month_key(row[time_field]))
+            partitions.setdefault(key, []).append(row)
+        with self._lock:
+            for (device_id, month), items in partitions.items():
+                directory = self._device_dir(table, device_id)
+                os.makedirs(directory, exist_ok=True)
+                data = ''.join(json.dumps(item, ensure_ascii=False, default=_json_default) + '\n'
+                               for item in items).encode('utf-8')
+                path = os.path.join(directory, f'{month}.ndjson.gz')
+                with open(path, 'ab') as f:
+                    f.write(gzip.compress(data))
+                    f.flush()
+                    os.fsync(f.fileno())
+        return len(partitions)
+
+    def months(self, table, device_id):
+        """设备已有的归档月份，升序"""
+        months = set()
+        for directory in self._read_dirs(table, device_id):
+            if os.path.isdir(directory):
+                months.update(name[:-len('.ndjson.gz')] for name in os.listdir(directory)
+                              if name.endswith('.ndjson.gz'))
+        return sorted(months)
+
+    def read(self, table, device_id, time_field, since=None, until=None, device_field='device_id'):
+        """读取设备在 [since, until) 时间范围内的归档行，时间字段解析为 datetime
+
+        同一行被重复归档（归档后删除前中断）时按 id 去重；只返回 device_field 等于 device_id 的行。
+        """
+        first = _month_key(since) if since else None
+        last = _month_key(until) if until else None
+        seen = set()
+        for month in self.months(table, device_id):
+            if (first and month < first) or (last and month > last):
+                continue
+            for directory in self._read_dirs(table, device_id):
+                path = os.path.join(directory, f'{month}.ndjson.gz')
+                if not os.path.exists(path):
+                    continue
+                with gzip.open(path, 'rt', encoding='utf-8') as f:
+                    for line in f:
+                        row = json.loads(line)
+                        if row.get(device_field) != device_id:
+                            continue
+                        at = datetime.fromisoformat(row[time_field]) if row.get(time_field) else None
+                        if at is None or (since and at < since) or (until and at >= until):
+                            continue
+                        row_id = row.get('id')
+                        if row_id is not None:
+                            if row_id in seen:
+                                continue
+                            seen.add(row_id)
+                        row[time_field] = at
+                        yield row
+
+    def stats(self):
+        """各表的分区文件数和压缩后字节数"""
+        info = {}
+        if not os.path.isdir(self.root):
+            return info
+        for table in sorted(os.listdir(self.root)):
+            files = size = 0
+            for directory, _, names in os.walk(os.path.join(self.root, table)):
+                for name in names:
+                    if name.endswith('.ndjson.gz'):
+                        files += 1
+                        size += os.path.getsize(os.path.join(directory, name))
+            info[table] = {'files': files, 'bytes': size}
+        return info
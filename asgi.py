@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ASGI 入口（单进程，HTTP 和 WebSocket 共用一个端口和事件循环）
+
+    uvicorn asgi:app --host 0.0.0.0 --port 80 --workers 1
+
+设备和网页都连接 ws://<主机>:80/ws ，不再使用独立的 8765 端口，其他路径上的WebSocket连接被拒绝。
+连接表和后台任务都在这一个进程中，不要用 --workers 启动多个进程；
+需要多进程时使用 gunicorn.conf.py 的部署方式。
+"""
+
+import os
+
+# 网页与HTTP同源连接 /ws，必须在导入服务器模块（读取配置）之前设置
+os.environ.setdefault('PET_FEEDER_WS_SAME_ORIGIN', '1')
+
+from pet_feeder_server import create_asgi_app  # noqa: E402
+
+app = create_asgi_app()
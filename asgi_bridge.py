@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ASGI 适配层
+
+把现有的 Flask（WSGI）应用和 websockets 风格的连接处理函数挂到同一个 ASGI 应用上，
+HTTP 和 WebSocket 共用一个端口、一个事件循环：
+    - http: Flask 视图是同步函数，请求在线程池中执行，事件循环只负责收发；
+      async_route(environ) 返回协程函数的请求由它在事件循环中直接处理
+    - websocket: 只接受 ws_path 上的连接，用 AsgiWebSocket 包装成 recv()/send()/remote_address 的接口，
+      断开时抛出 websockets.exceptions.ConnectionClosed，原有的处理函数无需修改
+    - lifespan: 启动/关闭时调用 on_startup/on_shutdown（可以是协程函数）
+"""
+
+import asyncio
+import io
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from websockets.exceptions import ConnectionClosedError, ConnectionClosedOK
+from websockets.frames import Close
+
+log = logging.getLogger('pet_feeder.asgi')
+
+_NORMAL_CLOSURE = (1000, 1001)
+
+
+def _closed(code, reason=''):
+    frame = Close(code, reason)
+    if code in _NORMAL_CLOSURE:
+        return ConnectionClosedOK(frame, None)
+    return ConnectionClosedError(frame, None)
+
+
+class AsgiWebSocket(object):
+    """ASGI websocket 连接，提供 websockets 连接对象中处理函数用到的接口"""
+
+    def __init__(self, scope, receive, send):
+        self.scope = scope
+        self._receive = receive
+        self._send = send
+        self.path = scope.get('path', '/')
+        self.remote_address = tuple(scope['client']) if scope.get('client') else None
+        self.request_headers = {k.decode('latin-1'): v.decode('latin-1') for k, v in scope.get('headers', ())}
+        self._close_code = None
+
+    async def accept(self):
+        message = await self._receive()
+        if message['type'] != 'websocket.connect':
+            raise _closed(1006, f"意外的ASGI消息: {message['type']}")
+        await self._send({'type': 'websocket.accept'})
+
+    async def reject(self):
+        """不接受连接（握手前关闭，ASGI服务器返回 HTTP 403）"""
+        message = await self._receive()
+        if message['type'] == 'websocket.connect':
+            await self._send({'type': 'websocket.close', 'code': 1008})
+
+    async def recv(self):
+        if self._close_code is not None:
+            raise _closed(self._close_code)
+        message = await self._receive()
+        if message['type'] == 'websocket.disconnect':
+            self._close_code = message.get('code', 1000)
+            raise _closed(self._close_code)
+        text = message.get('text')
+        return text if text is not None else message.get('bytes')
+
+    async def send(self, data):
+        if self._close_code is not None:
+            raise _closed(self._close_code)
+        message = {'type': 'websocket.send'}
+        message['text' if isinstance(data, str) else 'bytes'] = data
+        try:
+            await self._send(message)
+        except (OSError, RuntimeError) as e:
+            # 不同 ASGI 服务器在连接已断开时抛出的异常不同，统一成 ConnectionClosed
+            self._close_code = 1006
+            raise _closed(1006, str(e)) from e
+
+    async def close(self, code=1000, reason=''):
+        if self._close_code is None:
+            self._close_code = code
+            try:
+                await self._send({'type': 'websocket.close', 'code': code, 'reason': reason})
+            except (OSError, RuntimeError):
+                pass
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self.recv()
+        except ConnectionClosedOK:
+            raise StopAsyncIteration
+
+
+def wsgi_environ(scope, body):
+    """按 PEP 3333 由 ASGI http scope 构造 WSGI environ"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client')
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]) if server[1] is not None else '80',
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0] if client else '',
+        'REMOTE_PORT': str(client[1]) if client else '',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+            continue
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = 'HTTP_' + name
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def call_wsgi(wsgi_app, environ):
+    """在线程池中执行 WSGI 应用，返回 (状态码, 响应头, 响应体)"""
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info and response:
+            raise exc_info[1].with_traceback(exc_info[2])
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                               for name, value in headers]
+
+    result = wsgi_app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return response['status'], response['headers'], body
+
+
+class AsgiApp(object):
+    """HTTP 交给 WSGI 应用、WebSocket 交给 ws_handler 的 ASGI 应用
+
+    async_route(environ) 返回 None 时请求交给 WSGI 应用；返回协程函数 handler 时
+    在事件循环中 await handler(environ, run_sync)，得到 (状态码, 响应头, 响应体)，
+    handler 中的阻塞操作通过 await run_sync(fn, *args) 放到线程池执行。
+    """
+
+    def __init__(self, wsgi_app, ws_handler, http_threads=16, on_startup=None, on_shutdown=None,
+                 ws_path='/ws', async_route=None):
+        self.wsgi_app = wsgi_app
+        self.ws_handler = ws_handler
+        self.on_startup = on_startup
+        self.on_shutdown = on_shutdown
+        self.ws_path = ws_path
+        self.async_route = async_route
+        self.executor = ThreadPoolExecutor(max_workers=http_threads, thread_name_prefix='asgi-http')
+
+    async def run_sync(self, fn, *args):
+        """在HTTP线程池中执行阻塞函数"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        elif scope['type'] == 'websocket':
+            await self._websocket(scope, receive, send)
+        elif scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+
+    async def _http(self, scope, receive, send):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        environ = wsgi_environ(scope, b''.join(chunks))
+        handler = self.async_route(environ) if self.async_route else None
+        if handler is not None:
+            status, headers, body = await handler(environ, self.run_sync)
+        else:
+            status, headers, body = await self.run_sync(call_wsgi, self.wsgi_app, environ)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _websocket(self, scope, receive, send):
+        websocket = AsgiWebSocket(scope, receive, send)
+        if websocket.path != self.ws_path:
+            await websocket.reject()
+            return
+        try:
+            await websocket.accept()
+        except ConnectionClosedError:
+            return
+        try:
+            await self.ws_handler(websocket)
+        finally:
+            await websocket.close()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self._call_hook(self.on_startup)
+                except Exception as e:
+                    log.exception("ASGI应用启动失败")
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                try:
+                    await self._call_hook(self.on_shutdown)
+                finally:
+                    self.executor.shutdown(wait=False)
+                    await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _call_hook(self, hook):
+        if hook is None:
+            return
+        result = hook()
+        if asyncio.iscoroutine(result):
+            await result
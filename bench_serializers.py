@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API 响应序列化微基准
+
+在临时数据库中写入 --rows 行喂食记录和设备，分别用两种方式生成同样内容的JSON响应：
+    orm:  ORM 查询 .all()，逐行建 dict（strftime / pytz astimezone），jsonify
+    core: Core select 结果元组 + serializers.RowSerializer 预编译函数，serializers.dumps
+输出每种方式的 行/秒 和单次耗时（取 --repeat 次中最快的一次），结果为JSON，便于不同提交之间对比。
+
+用法:
+    python bench_serializers.py --rows 10000 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='API响应序列化微基准')
+    parser.add_argument('--rows', type=int, default=10000, help='每种负载的行数')
+    parser.add_argument('--repeat', type=int, default=5, help='每种方式重复次数，取最快一次')
+    parser.add_argument('--output', default=None, help='结果JSON写入的文件，默认只输出到标准输出')
+    parser.add_argument('--seed', type=int, default=1, help='随机数种子')
+    return parser.parse_args()
+
+
+def seed(server, rows, rng):
+    from sqlalchemy import insert
+
+    now = datetime.utcnow().replace(microsecond=0)
+    with server.app.app_context():
+        server.db.session.execute(insert(server.FeedingRecord), [{
+            'device_id': 'BENCH-00000',
+            'day_of_week': i % 7,
+            'hour': i % 24,
+            'minute': i % 60,
+            'feeding_amount': round(rng.uniform(5, 50), 1),
+            'actual_amount': round(rng.uniform(5, 50), 1),
+            'status': 'success',
+            'created_at': now - timedelta(seconds=i * 37),
+        } for i in range(rows)])
+        server.db.session.execute(insert(server.Device), [{
+            'device_id': f'BENCH-{i:05d}',
+            'password': 'x',
+            'firmware_version': '1.0.0',
+            'first_seen': now - timedelta(days=30),
+            'last_seen': now - timedelta(seconds=rng.randint(0, 3600)),
+            'last_grain_update': now - timedelta(seconds=rng.randint(0, 3600)),
+            'grain_weight': round(rng.uniform(0, 500), 1),
+            'heartbeat_count': rng.randint(0, 10000),
+        } for i in range(rows)])
+        server.db.session.commit()
+
+
+def records_orm(server):
+    """改为预编译序列化之前 api_feeding_records 的做法"""
+    from flask import jsonify
+    records = server.FeedingRecord.query.filter_by(device_id='BENCH-00000').all()
+    items = [{
+        'id': r.id,
+        'day_of_week': r.day_of_week,
+        'hour': r.hour,
+        'minute': r.minute,
+        'feeding_amount': r.feeding_amount,
+        'actual_amount': r.actual_amount,
+        'status': r.status,
+        'created_at': r.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'type': 'plan'
+    } for r in records]
+    return jsonify({'records': items}).get_data()
+
+
+def records_core(server):
+    serializer = server.PLAN_RECORD_SERIALIZER
+    rows = server.db.session.execute(
+        serializer.select().where(server.FeedingRecord.device_id == 'BENCH-00000'))
+    return server.json_response({'records': serializer.many(rows)}).get_data()
+
+
+def devices_orm(server):
+    """改为预编译序列化之前 api_devices 的做法"""
+    import pytz
+    from flask import jsonify
+    beijing = pytz.timezone('Asia/Shanghai')
+    now = datetime.utcnow()
+    devices = server.Device.query.filter(server.Device.device_id.like('BENCH-%')).all()
+    items = [{
+        'device_id': d.device_id,
+        'device_type': d.device_type,
+        'firmware_version': d.firmware_version,
+        'heartbeat_count': d.heartbeat_count,
+        'first_seen': d.first_seen.strftime('%Y-%m-%d %H:%M:%S'),
+        'last_seen': d.last_seen.strftime('%Y-%m-%d %H:%M:%S'),
+        'last_seen_local': d.last_seen.replace(tzinfo=pytz.utc).astimezone(beijing).strftime('%Y-%m-%d %H:%M:%S'),
+        'is_online': (now - d.last_seen).total_seconds() < 300,
+        'grain_weight': d.grain_weight,
+        'last_grain_update': d.last_grain_update.replace(tzinfo=pytz.utc).astimezone(beijing).strftime('%Y-%m-%d %H:%M:%S')
+    } for d in devices]
+    return jsonify({'devices': items}).get_data()
+
+
+def devices_core(server):
+    serializer = server.DEVICE_LIST_SERIALIZER
+    rows = server.db.session.execute(
+        serializer.select().where(server.Device.device_id.like('BENCH-%')),
+        {'online_cutoff': datetime.utcnow() - server.DEVICE_ONLINE_WINDOW})
+    return server.json_response({'devices': serializer.many(rows)}).get_data()
+
+
+def measure(server, fn, rows, repeat):
+    best = None
+    size = 0
+    for _ in range(repeat):
+        with server.app.test_request_context('/'):
+            started = time.perf_counter()
+            body = fn(server)
+            elapsed = time.perf_counter() - started
+            server.db.session.remove()
+        size = len(body)
+        best = elapsed if best is None else min(best, elapsed)
+    return {'ms': round(best * 1000, 2), 'rows_per_s': int(rows / best), 'bytes': size}
+
+
+def main():
+    args = parse_args()
+    tmp_dir = tempfile.TemporaryDirectory(prefix='pet_feeder_bench_')
+    os.environ['PET_FEEDER_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp_dir.name, 'bench.db')}"
+    os.environ.setdefault('PET_FEEDER_LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('PET_FEEDER_LOG_FILE', '')
+
+    # 环境变量必须在导入服务器模块之前设置
+    import pet_feeder_server as server
+    import serializers
+    server.create_tables()
+    seed(server, args.rows, random.Random(args.seed))
+
+    result = {
+        'rows': args.rows,
+        'repeat': args.repeat,
+        'json_backend': serializers.backend(),
+        'python': sys.version.split()[0],
+    }
+    for name, before, after in (('feeding_records', records_orm, records_core),
+                                ('devices', devices_orm, devices_core)):
+        orm = measure(server, before, args.rows, args.repeat)
+        core = measure(server, after, args.rows, args.repeat)
+        result[name] = {'orm': orm, 'core': core,
+                        'speedup': round(core['rows_per_s'] / orm['rows_per_s'], 2)}
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
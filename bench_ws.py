@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备WebSocket吞吐量压测
+
+在本进程内启动 ws_handler（使用临时数据库），用 asyncio 模拟大量喂食器设备：
+注册后按间隔上报 grain_weight、feeding_record、sync_result，并定期发送 version_check。
+模拟设备默认预先写入数据库（已入网的设备），--new-devices 时走首次注册建档流程。
+结束时输出JSON结果（连接速率、消息吞吐、处理耗时分位数、写队列统计），便于不同提交之间对比。
+
+用法:
+    python bench_ws.py --devices 2000 --duration 60 --output bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import websockets
+
+import ws_codec
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='设备WebSocket吞吐量压测')
+    parser.add_argument('--devices', type=int, default=1000, help='模拟设备数')
+    parser.add_argument('--duration', type=float, default=30.0, help='全部设备连接后的压测时长（秒）')
+    parser.add_argument('--connect-concurrency', type=int, default=200, help='同时发起连接的设备数上限')
+    parser.add_argument('--grain-interval', type=float, default=5.0, help='粮桶重量上报间隔（秒）')
+    parser.add_argument('--record-interval', type=float, default=30.0, help='喂食记录上报间隔（秒）')
+    parser.add_argument('--sync-interval', type=float, default=60.0, help='同步数据上报间隔（秒）')
+    parser.add_argument('--version-interval', type=float, default=60.0, help='版本检查间隔（秒）')
+    parser.add_argument('--encoding', default='json', help='注册时请求的消息编码（json/msgpack/cbor）')
+    parser.add_argument('--new-devices', action='store_true', help='不预先建档，模拟设备首次注册')
+    parser.add_argument('--port', type=int, default=0, help='监听端口，0为自动选择')
+    parser.add_argument('--database', default=None, help='数据库URI，默认使用临时SQLite文件')
+    parser.add_argument('--output', default=None, help='结果JSON写入的文件，默认只输出到标准输出')
+    parser.add_argument('--seed', type=int, default=1, help='随机数种子')
+    return parser.parse_args()
+
+
+def _raise_file_limit():
+    """每个模拟设备占用两个文件描述符（客户端+服务端），尽量调高上限"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def _percentiles(values):
+    """精确分位数（毫秒）"""
+    if not values:
+        return {'count': 0, 'p50_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+    values = sorted(values)
+
+    def pick(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))], 3)
+
+    return {
+        'count': len(values),
+        'p50_ms': pick(0.50),
+        'p99_ms': pick(0.99),
+        'max_ms': round(values[-1], 3),
+    }
+
+
+class FleetStats(object):
+    """模拟设备侧的计数"""
+
+    def __init__(self):
+        self.connected = 0
+        self.connect_failed = 0
+        self.disconnected = 0
+        self.sent = {}
+        self.received = 0
+        self.connect_ms = []
+        self.version_rtt_ms = []
+        self.all_connected_at = None
+        self.stop_at = None
+
+    def count_sent(self, msg_type):
+        self.sent[msg_type] = self.sent.get(msg_type, 0) + 1
+
+    def connect_finished(self, devices, duration, start_event):
+        """最后一台设备完成连接（或失败）时开始计时"""
+        if self.connected + self.connect_failed == devices:
+            self.all_connected_at = time.perf_counter()
+            self.stop_at = time.monotonic() + duration
+            start_event.set()
+
+
+def _device_id(index):
+    return f"BENCH-{index:05d}"
+
+
+def seed_devices(server, count):
+    """批量写入模拟设备，所有设备共用一个密码哈希"""
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+
+    password = generate_password_hash('123456')
+    with server.app.app_context():
+        server.db.session.execute(insert(server.Device), [{
+            'device_id': _device_id(i),
+            'password': password,
+            'firmware_version': '1.0.0',
+            'protocol_version': '1.0',
+            'hardware_version': '1.0',
+        } for i in range(count)])
+        server.db.session.commit()
+
+
+def _sync_payload(device_id, rng):
+    plans = [{
+        'day_of_week': day,
+        'hour': 8,
+        'minute': 30,
+        'feeding_amount': rng.choice((10.0, 15.0, 20.0))
+    } for day in range(1, 8)]
+    manuals = [{
+        'hour': 12,
+        'minute': 0,
+        'feeding_amount': 5.0,
+        'is_confirmed': True,
+        'is_executed': rng.random() < 0.5
+    }]
+    return {
+        'type': 'sync_result',
+        'device_id': device_id,
+        'grain_weight': round(rng.uniform(100, 2000), 1),
+        'feeding_plans': plans,
+        'manual_feedings': manuals
+    }
+
+
+async def simulate_device(index, args, url, stats, connect_gate, start_event):
+    rng = random.Random(args.seed * 100003 + index)
+    device_id = _device_id(index)
+    async with connect_gate:
+        started = time.perf_counter()
+        try:
+            websocket = await websockets.connect(url, open_timeout=30, max_queue=None)
+            await websocket.send(json.dumps({
+                'type': 'register',
+                'device_id': device_id,
+                'firmware_version': '1.0.0',
+                'protocol_version': '1.0',
+                'hardware_version': '1.0',
+                'encodings': [args.encoding],
+                'capabilities': ['command_batch']
+            }))
+            await asyncio.wait_for(websocket.recv(), 30)
+        except Exception:
+            stats.connect_failed += 1
+            stats.connect_finished(args.devices, args.duration, start_event)
+            return
+        stats.connect_ms.append((time.perf_counter() - started) * 1000)
+        stats.connected += 1
+        stats.connect_finished(args.devices, args.duration, start_event)
+
+    version_sent_at = {}
+
+    async def reader():
+        encoding = args.encoding
+        async for frame in websocket:
+            stats.received += 1
+            try:
+                msg = ws_codec.decode(encoding, frame)
+            except Exception:
+                continue
+            if isinstance(msg, dict) and msg.get('type') == 'version_check_result':
+                sent_at = version_sent_at.pop('pending', None)
+                if sent_at is not None:
+                    stats.version_rtt_ms.append((time.perf_counter() - sent_at) * 1000)
+
+    reader_task = asyncio.ensure_future(reader())
+    try:
+        await start_event.wait()
+        stop_at = stats.stop_at
+        # 各类消息的首次发送时间随机错开，避免所有设备同一时刻上报
+        loop_now = time.monotonic()
+        schedule = {
+            'grain_weight': loop_now + rng.uniform(0, args.grain_interval),
+            'feeding_record': loop_now + rng.uniform(0, args.record_interval),
+            'sync_result': loop_now + rng.uniform(0, args.sync_interval),
+            'version_check': loop_now + rng.uniform(0, args.version_interval),
+        }
+        intervals = {
+            'grain_weight': args.grain_interval,
+            'feeding_record': args.record_interval,
+            'sync_result': args.sync_interval,
+            'version_check': args.version_interval,
+        }
+        while True:
+            msg_type, due = min(schedule.items(), key=lambda kv: kv[1])
+            if due >= stop_at:
+                break
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if msg_type == 'grain_weight':
+                msg = {'type': 'grain_weight', 'device_id': device_id,
+                       'grain_weight': round(rng.uniform(100, 2000), 1)}
+            elif msg_type == 'feeding_record':
+                msg = {'type': 'feeding_record', 'device_id': device_id,
+                       'day_of_week': rng.randint(1, 7), 'hour': rng.randint(0, 23),
+                       'minute': rng.randint(0, 59), 'feeding_amount': 10.0,
+                       'timestamp': time.time()}
+            elif msg_type == 'sync_result':
+                msg = _sync_payload(device_id, rng)
+            else:
+                msg = {'type': 'version_check', 'device_id': device_id,
+                       'firmware_version': '1.0.0', 'protocol_version': '1.0',
+                       'hardware_version': '1.0'}
+                version_sent_at['pending'] = time.perf_counter()
+            await websocket.send(json.dumps(msg))
+            stats.count_sent(msg_type)
+            schedule[msg_type] = due + intervals[msg_type]
+    except Exception:
+        stats.disconnected += 1
+    finally:
+        await websocket.close()
+        reader_task.cancel()
+
+
+async def run_bench(args, server):
+    server.ws_loop = asyncio.get_running_loop()
+    server.db_writer.start()
+    server.presence.start()
+
+    async with websockets.serve(server.ws_handler, '127.0.0.1', args.port,
+                                **server._ws_serve_options()) as ws_server:
+        port = ws_server.sockets[0].getsockname()[1]
+        url = f"ws://127.0.0.1:{port}"
+        stats = FleetStats()
+        connect_gate = asyncio.Semaphore(args.connect_concurrency)
+        start_event = asyncio.Event()
+
+        connect_started = time.perf_counter()
+        tasks = [asyncio.ensure_future(simulate_device(i, args, url, stats, connect_gate, start_event))
+                 for i in range(args.devices)]
+        await start_event.wait()
+        connect_seconds = stats.all_connected_at - connect_started
+        measure_started = time.perf_counter()
+        received_before = stats.received
+        await asyncio.gather(*tasks, return_exceptions=True)
+        measure_seconds = time.perf_counter() - measure_started
+
+    # 等写线程把剩余变更提交完，写队列统计才完整
+    drain_started = time.perf_counter()
+    while server.db_writer.queue_depth() and time.perf_counter() - drain_started < 30:
+        await asyncio.sleep(0.05)
+    drain_seconds = time.perf_counter() - drain_started
+
+    sent_total = sum(stats.sent.values())
+    dispatcher = server.ws_dispatcher.metrics()
+    handler_latency = {}
+    for msg_type, metrics in dispatcher['message_types'].items():
+        if metrics['count']:
+            handler_latency[msg_type] = {
+                'count': metrics['count'],
+                'errors': metrics['errors'],
+                'avg_ms': metrics['avg_ms'],
+                'p50_ms': metrics['p50_ms'],
+                'p99_ms': metrics['p99_ms'],
+                'max_ms': metrics['max_ms'],
+            }
+    return {
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'config': {
+            'devices': args.devices,
+            'duration': args.duration,
+            'connect_concurrency': args.connect_concurrency,
+            'grain_interval': args.grain_interval,
+            'record_interval': args.record_interval,
+            'sync_interval': args.sync_interval,
+            'version_interval': args.version_interval,
+            'encoding': args.encoding,
+            'new_devices': args.new_devices,
+            'deflate': server.app.config['WS_DEFLATE'],
+        },
+        'connect': {
+            'connected': stats.connected,
+            'failed': stats.connect_failed,
+            'seconds': round(connect_seconds, 3),
+            'per_second': round(stats.connected / connect_seconds, 1) if connect_seconds else 0.0,
+            'register_rtt': _percentiles(stats.connect_ms),
+        },
+        'messages': {
+            'sent': sent_total,
+            'sent_by_type': stats.sent,
+            'received': stats.received - received_before,
+            'seconds': round(measure_seconds, 3),
+            'per_second': round(sent_total / measure_seconds, 1) if measure_seconds else 0.0,
+            'disconnected': stats.disconnected,
+        },
+        # 处理耗时来自服务端分发器直方图，分位数为所在桶的上限
+        'handler_latency_ms': handler_latency,
+        'version_check_rtt': _percentiles(stats.version_rtt_ms),
+        'write_behind': dict(server.db_writer.stats(), drain_seconds=round(drain_seconds, 3)),
+        'traffic': server.ws_traffic.stats(),
+    }
+
+
+def main():
+    args = parse_args()
+    fd_limit = _raise_file_limit()
+    if args.devices * 2 + 64 > fd_limit:
+        print(f"文件描述符上限 {fd_limit} 不足以模拟 {args.devices} 台设备", file=sys.stderr)
+        sys.exit(1)
+
+    tmp_dir = None
+    if args.database:
+        os.environ['PET_FEEDER_DATABASE_URI'] = args.database
+    else:
+        tmp_dir = tempfile.TemporaryDirectory(prefix='pet_feeder_bench_')
+        os.environ['PET_FEEDER_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp_dir.name, 'bench.db')}?timeout=30"
+    # 压测时服务端日志只保留警告，避免输出本身成为瓶颈；需要时可用环境变量覆盖
+    os.environ.setdefault('PET_FEEDER_LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('PET_FEEDER_LOG_FILE', '')
+
+    # 环境变量必须在导入服务器模块之前设置
+    import pet_feeder_server as server
+    server.create_tables()
+    if not args.new_devices:
+        seed_devices(server, args.devices)
+
+    result = asyncio.run(run_bench(args, server))
+    server.db_writer.stop()
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
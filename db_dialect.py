@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库方言相关的辅助函数
+
+默认使用 SQLite；把 PET_FEEDER_DATABASE_URI 设置为 postgresql:// 地址即切换到 PostgreSQL
+（需要安装 psycopg2-binary）。这里集中处理两者的差异：连接池参数、
+INSERT ... ON CONFLICT 写法和自增序列。
+"""
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+
+def is_sqlite_uri(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def engine_options(uri, pool_size=10, max_overflow=5, pool_timeout=10, pool_recycle=1800):
+    """SQLALCHEMY_ENGINE_OPTIONS：SQLite 使用默认连接池，其他数据库使用固定大小的连接池"""
+    if is_sqlite_uri(uri):
+        return {}
+    return {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+        'pool_recycle': pool_recycle,
+        'pool_pre_ping': True,
+    }
+
+
+def _dialect_insert(dialect_name):
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"不支持的数据库: {dialect_name}")
+    return insert
+
+
+def upsert(session, table, values, conflict_columns, update_columns=(), update_values=None,
+           increment_columns=()):
+    """INSERT ... ON CONFLICT DO UPDATE（SQLite 3.24+ 与 PostgreSQL 写法相同）
+
+    update_columns: 冲突时取本次插入值(excluded)覆盖的字段
+    update_values: 冲突时写入的其他字段值
+    increment_columns: 冲突时在原值上累加本次插入值的字段（计数/汇总）
+    都为空时冲突即忽略(DO NOTHING)。session 也可以是 Connection。
+    """
+    bind = session.get_bind() if hasattr(session, 'get_bind') else session
+    insert = _dialect_insert(bind.dialect.name)
+    stmt = insert(table).values(values)
+    set_ = {column: stmt.excluded[column] for column in update_columns}
+    set_.update({column: table.c[column] + stmt.excluded[column] for column in increment_columns})
+    set_.update(update_values or {})
+    if set_:
+        stmt = stmt.on_conflict_do_update(index_elements=conflict_columns, set_=set_)
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=conflict_columns)
+    return session.execute(stmt)
+
+
+def reset_sequences(connection, tables):
+    """PostgreSQL 中直接写入了 id 的表，把自增序列调整到当前最大 id 之后"""
+    if connection.dialect.name != 'postgresql':
+        return
+    for table in tables:
+        if 'id' not in table.c:
+            continue
+        connection.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table.name}), 0) + 1, false)"
+        ))
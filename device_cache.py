@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备信息读缓存
+
+按 device_id 缓存设备的只读快照（不是绑定 session 的 ORM 对象），
+LRU 淘汰，超过 ttl 秒重新加载。设备不存在的结果不缓存：新设备可能由其他进程
+（多进程网关、命令行）注册，缓存“不存在”会让它在 ttl 秒内无法使用。
+
+写路径通过 mark(session, device_id) 登记改动的设备，session 的事务结束
+（提交或回滚）后再失效缓存，其他线程不会在提交前把旧数据重新读进缓存。
+多进程部署时各进程的缓存互相独立，其他进程的改动最多 ttl 秒后可见。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+
+_MISSING = object()
+
+
+class DeviceCache(object):
+    """带 TTL 的 LRU 设备快照缓存
+
+    loader(device_id) 返回快照，设备不存在时返回 None。
+    """
+
+    def __init__(self, loader, max_size=1024, ttl=30.0):
+        self._loader = loader
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # device_id -> (过期时间, 快照)
+        self._generation = 0            # 每次失效加一，加载期间发生过失效的结果不写入缓存
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evictions': 0,
+            'invalidations': 0,
+        }
+
+    def get(self, device_id):
+        """设备快照，设备不存在返回 None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(device_id, _MISSING)
+            if entry is not _MISSING:
+                if entry[0] > now:
+                    self._entries.move_to_end(device_id)
+                    self._stats['hits'] += 1
+                    return entry[1]
+                del self._entries[device_id]
+                self._stats['expired'] += 1
+            self._stats['misses'] += 1
+            generation = self._generation
+        snapshot = self._loader(device_id)
+        if snapshot is None:
+            return None
+        with self._lock:
+            if generation == self._generation:
+                self._entries[device_id] = (now + self.ttl, snapshot)
+                self._entries.move_to_end(device_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self._stats['evictions'] += 1
+        return snapshot
+
+    def exists(self, device_id):
+        return self.get(device_id) is not None
+
+    def invalidate(self, *device_ids):
+        with self._lock:
+            self._generation += 1
+            for device_id in device_ids:
+                if self._entries.pop(device_id, None) is not None:
+                    self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._stats['invalidations'] += len(self._entries)
+            self._entries.clear()
+
+    def mark(self, session, *device_ids):
+        """登记 session 当前事务改动的设备，事务结束后失效"""
+        session.info.setdefault('device_cache_ids', set()).update(device_ids)
+
+    def bind(self, session_target):
+        """在 session（或 scoped_session/sessionmaker）的事务结束事件上执行登记的失效"""
+        def _transaction_end(session):
+            device_ids = session.info.pop('device_cache_ids', None)
+            if device_ids:
+                self.invalidate(*device_ids)
+
+        event.listen(session_target, 'after_commit', _transaction_end)
+        event.listen(session_target, 'after_rollback', _transaction_end)
+
+    def stats(self):
+        with self._lock:
+            info = dict(self._stats)
+            info['size'] = len(self._entries)
+        lookups = info['hits'] + info['misses']
+        info['hit_ratio'] = round(info['hits'] / lookups, 4) if lookups else None
+        info['max_size'] = self.max_size
+        info['ttl'] = self.ttl
+        return info
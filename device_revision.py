@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按设备的数据版本号
+
+每台设备一行 (device_id, revision)，设备的喂食计划/手动喂食每次变更都在同一事务中把
+revision 加一，轮询接口把它作为 ETag，客户端带 If-None-Match 时只需按主键读一个整数
+就能判断数据是否变化，未变化直接返回 304，不查询、不序列化业务数据。
+
+变更的登记方式：
+    - 通过 session 增删改的 ORM 对象（tracked 中的模型）在 flush 时自动登记
+    - 直接执行的批量 insert/update/delete 语句需要调用 mark(session, device_id)
+    - 不经过 session 的连接（如归档任务）调用 bump(connection, device_id)
+"""
+
+import re
+
+from sqlalchemy import event, select
+
+from db_dialect import upsert
+
+_ETAG_UNSAFE = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+class DeviceRevisions(object):
+    """device_id -> revision 计数器，table 需要 device_id（主键或唯一）和 revision 两列"""
+
+    def __init__(self, table, tracked=()):
+        self.table = table
+        self.tracked = tuple(tracked)
+
+    def bump(self, connection, *device_ids):
+        """在 connection（或 session）当前事务中把设备的版本号加一，设备没有记录时从 1 开始"""
+        for device_id in sorted(set(device_ids)):
+            upsert(connection, self.table, {'device_id': device_id, 'revision': 1},
+                   ['device_id'], increment_columns=['revision'])
+
+    def get(self, connection, device_id):
+        """当前版本号，设备没有记录时为 0"""
+        revision = connection.execute(
+            select(self.table.c.revision).where(self.table.c.device_id == device_id)).scalar()
+        return revision or 0
+
+    def mark(self, session, *device_ids):
+        """登记 session 当前事务中用批量语句改动了数据的设备，提交前统一加一"""
+        session.info.setdefault('device_revision_ids', set()).update(device_ids)
+
+    def bind(self, session_target):
+        """在 session（或 scoped_session/sessionmaker）上自动登记 tracked 模型的改动并在事务内加一"""
+        def _after_flush(session, flush_context):
+            device_ids = session.info.pop('device_revision_ids', set())
+            for instances in (session.new, session.dirty, session.deleted):
+                for instance in instances:
+                    if isinstance(instance, self.tracked) and (
+                            instances is not session.dirty or session.is_modified(instance)):
+                        device_ids.add(instance.device_id)
+            device_ids.discard(None)
+            if device_ids:
+                self.bump(session.connection(), *device_ids)
+
+        def _before_commit(session):
+            device_ids = session.info.pop('device_revision_ids', None)
+            if device_ids:
+                self.bump(session.connection(), *device_ids)
+
+        def _after_rollback(session):
+            session.info.pop('device_revision_ids', None)
+
+        event.listen(session_target, 'after_flush', _after_flush)
+        event.listen(session_target, 'before_commit', _before_commit)
+        event.listen(session_target, 'after_rollback', _after_rollback)
+
+
+def etag(device_id, revision):
+    """设备数据版本对应的 ETag 值（不含引号，由 Response.set_etag 加引号）"""
+    return f'{_ETAG_UNSAFE.sub("_", str(device_id))}.{revision}'
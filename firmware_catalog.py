@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+固件目录缓存
+
+在内存中保存活跃的固件版本列表，只在固件版本增删改后（invalidate）重新加载。
+设备的版本检查结果只取决于 (固件版本, 协议版本, 硬件版本)，按这个三元组缓存
+计算好的应答，同样的版本检查只是一次字典查找。
+
+generation 可以传入 multiprocessing.Value：在 fork 之前创建后，
+任一进程调用 invalidate 都会让所有进程的缓存失效（多进程网关）。
+命令行工具等不共享该值的进程修改了数据时，最多 max_age 秒后重新加载。
+"""
+
+import threading
+import time
+
+
+class FirmwareCatalog(object):
+    """活跃固件列表和版本检查应答的缓存
+
+    loader() 返回按版本从新到旧排序的活跃固件快照列表；
+    answer(latest, firmware, protocol, hardware) 根据最新稳定版计算应答 dict，
+    latest 为空表示没有可用的稳定版。
+    """
+
+    def __init__(self, loader, answer, generation=None, max_age=300.0, max_answers=4096):
+        self._loader = loader
+        self._answer = answer
+        self._generation = generation
+        self.max_age = max_age
+        self.max_answers = max_answers
+        self._lock = threading.Lock()
+        self._versions = None
+        self._latest = None
+        self._answers = {}
+        self._loaded_generation = None
+        self._loaded_at = 0.0
+        self._local_generation = 0
+        self._stats = {'loads': 0, 'hits': 0, 'misses': 0}
+
+    def _current_generation(self):
+        if self._generation is not None:
+            return self._generation.value
+        return self._local_generation
+
+    def _ensure_loaded(self):
+        """调用方持有 self._lock"""
+        generation = self._current_generation()
+        if (self._versions is not None and generation == self._loaded_generation
+                and time.monotonic() - self._loaded_at < self.max_age):
+            return
+        versions = self._loader()
+        self._versions = versions
+        self._latest = next((v for v in versions if v.is_stable), None)
+        self._answers = {}
+        self._loaded_generation = generation
+        self._loaded_at = time.monotonic()
+        self._stats['loads'] += 1
+
+    def versions(self):
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._versions)
+
+    def latest(self):
+        """最新的稳定版，没有返回 None"""
+        with self._lock:
+            self._ensure_loaded()
+            return self._latest
+
+    def answer(self, firmware, protocol, hardware):
+        """版本检查应答（不含 type/device_id），返回的 dict 为共享对象，调用方不要修改"""
+        key = (firmware, protocol, hardware)
+        with self._lock:
+            self._ensure_loaded()
+            cached = self._answers.get(key)
+            if cached is not None:
+                self._stats['hits'] += 1
+                return cached
+            self._stats['misses'] += 1
+            latest = self._latest
+        result = self._answer(latest, firmware, protocol, hardware)
+        with self._lock:
+            # 计算期间目录被重新加载过的话，这个结果对应旧目录，不缓存
+            if latest is self._latest:
+                if len(self._answers) >= self.max_answers:
+                    self._answers.clear()
+                self._answers[key] = result
+        return result
+
+    def invalidate(self):
+        """固件版本数据变更后调用，下次访问时重新加载"""
+        if self._generation is not None:
+            with self._generation.get_lock():
+                self._generation.value += 1
+        with self._lock:
+            self._local_generation += 1
+            self._versions = None
+
+    def stats(self):
+        with self._lock:
+            info = dict(self._stats)
+            info['versions'] = len(self._versions) if self._versions is not None else None
+            info['latest'] = self._latest.version_string if self._latest is not None else None
+            info['answers'] = len(self._answers)
+        return info
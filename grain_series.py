@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+粮桶重量时间序列
+
+每台设备在内存中保留最近 ring_size 个原始读数（环形缓冲），
+同时把读数按 bucket_seconds 秒聚合成一个点（平均/最小/最大/最后值/读数个数），
+聚合点只追加写入 <root>/<device_id>.bin（文件名为 device_id 的百分号编码），每个点固定 RECORD.size 字节，
+按时间查询时在文件中二分定位，不需要每个读数一行数据库记录。
+
+多进程网关下每个进程只聚合自己连接的设备，未落盘的聚合点只在本进程可见，
+flush_interval 秒内写入文件后所有进程都能查到。
+"""
+
+import atexit
+import logging
+import os
+import struct
+import threading
+import time
+from array import array
+from urllib.parse import quote
+
+log = logging.getLogger('pet_feeder.grain')
+
+# 聚合点: 起始时间(秒), 平均, 最小, 最大, 最后值, 读数个数
+RECORD = struct.Struct('<dffffI')
+
+
+class _Ring(object):
+    """定长环形缓冲，时间和读数分别存放在 array 中"""
+    __slots__ = ('times', 'values', 'start', 'size')
+
+    def __init__(self, capacity):
+        self.times = array('d', bytes(8 * capacity))
+        self.values = array('d', bytes(8 * capacity))
+        self.start = 0
+        self.size = 0
+
+    def append(self, ts, value):
+        capacity = len(self.times)
+        index = (self.start + self.size) % capacity
+        self.times[index] = ts
+        self.values[index] = value
+        if self.size < capacity:
+            self.size += 1
+        else:
+            self.start = (self.start + 1) % capacity
+
+    def items(self):
+        capacity = len(self.times)
+        for i in range(self.size):
+            index = (self.start + i) % capacity
+            yield self.times[index], self.values[index]
+
+
+class _Bucket(object):
+    """正在聚合的时间段"""
+    __slots__ = ('start', 'total', 'low', 'high', 'last', 'count')
+
+    def __init__(self, start, value):
+        self.start = start
+        self.total = self.low = self.high = self.last = value
+        self.count = 1
+
+    def add(self, value):
+        self.total += value
+        self.low = min(self.low, value)
+        self.high = max(self.high, value)
+        self.last = value
+        self.count += 1
+
+    def record(self):
+        return (self.start, self.total / self.count, self.low, self.high, self.last, self.count)
+
+
+def _point(record):
+    start, mean, low, high, last, count = record
+    return {'ts': start, 'mean': round(mean, 2), 'min': round(low, 2), 'max': round(high, 2),
+            'last': round(last, 2), 'count': count}
+
+
+class GrainSeries(object):
+    """按设备保存的粮桶重量时间序列"""
+
+    def __init__(self, root, bucket_seconds=300, ring_size=720, flush_interval=30.0):
+        self.root = root
+        self.bucket_seconds = bucket_seconds
+        self.ring_size = ring_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._rings = {}      # device_id -> _Ring
+        self._buckets = {}    # device_id -> 正在聚合的 _Bucket
+        self._closed = {}     # device_id -> 已结束、待写文件的聚合点
+        self._thread = None
+        self._stopping = threading.Event()
+        self._stats = {
+            'readings': 0,
+            'out_of_order': 0,
+            'points_written': 0,
+            'flushes': 0,
+            'last_flush_ms': 0.0,
+        }
+
+    def _path(self, device_id):
+        # 可逆编码：字母数字和 _.-~ 保持原样，不同设备不会写到同一文件
+        return os.path.join(self.root, quote(str(device_id), safe='') + '.bin')
+
+    def append(self, device_id, grams, ts=None):
+        """记录一次读数，早于当前聚合时间段的读数只进环形缓冲"""
+        ts = time.time() if ts is None else float(ts)
+        grams = float(grams)
+        start = ts - ts % self.bucket_seconds
+        with self._lock:
+            self._stats['readings'] += 1
+            ring = self._rings.get(device_id)
+            if ring is None:
+                ring = self._rings[device_id] = _Ring(self.ring_size)
+            ring.append(ts, grams)
+            bucket = self._buckets.get(device_id)
+            if bucket is None or start > bucket.start:
+                if bucket is not None:
+                    self._closed.setdefault(device_id, []).append(bucket.record())
+                self._buckets[device_id] = _Bucket(start, grams)
+            elif start == bucket.start:
+                bucket.add(grams)
+            else:
+                self._stats['out_of_order'] += 1
+
+    def recent(self, device_id):
+        """内存中最近的原始读数 [(ts, grams), ...]"""
+        with self._lock:
+            ring = self._rings.get(device_id)
+            return list(ring.items()) if ring else []
+
+    def flush(self, now=None):
+        """把已结束的聚合点追加写入文件，超过一个时间段没有新读数的聚合也一并结束"""
+        now = time.time() if now is None else now
+        started = time.perf_counter()
+        with self._lock:
+            for device_id, bucket in list(self._buckets.items()):
+                if bucket.start + 2 * self.bucket_seconds <= now:
+                    self._closed.setdefault(device_id, []).append(bucket.record())
+                    del self._buckets[device_id]
+            closed, self._closed = self._closed, {}
+        if not closed:
+            return 0
+        os.makedirs(self.root, exist_ok=True)
+        written = 0
+        for device_id, records in closed.items():
+            data = b''.join(RECORD.pack(*record) for record in records)
+            # 每次追加的数据是整数个记录，多进程同时追加同一文件也不会交错
+            with open(self._path(device_id), 'ab') as f:
+                f.write(data)
+            written += len(records)
+        with self._lock:
+            self._stats['points_written'] += written
+            self._stats['flushes'] += 1
+            self._stats['last_flush_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        return written
+
+    def _read_file(self, device_id, since, until):
+        try:
+            f = open(self._path(device_id), 'rb')
+        except FileNotFoundError:
+            return []
+        with f:
+            count = os.fstat(f.fileno()).st_size // RECORD.size
+
+            low = 0
+            if since is not None:
+                # 文件中的时间段按写入顺序递增，二分找到第一个结束时间晚于 since 的聚合点
+                # （bisect 的 key 参数需要 Python 3.10，这里按记录偏移手写二分）
+                target, high = since - self.bucket_seconds, count
+                while low < high:
+                    middle = (low + high) // 2
+                    f.seek(middle * RECORD.size)
+                    if RECORD.unpack(f.read(RECORD.size))[0] <= target:
+                        low = middle + 1
+                    else:
+                        high = middle
+            f.seek(low * RECORD.size)
+            data = f.read((count - low) * RECORD.size)
+        records = []
+        for record in RECORD.iter_unpack(data):
+            if until is not None and record[0] >= until:
+                break
+            records.append(record)
+        return records
+
+    def query(self, device_id, since=None, until=None, step=None):
+        """[since, until) 时间范围内的聚合点（含内存中未落盘的），按时间升序
+
+        step: 再按 step 秒合并聚合点（应为 bucket_seconds 的整数倍），查询长时间范围时减少点数
+        """
+        step = step or self.bucket_seconds
+        records = self._read_file(device_id, since, until)
+        with self._lock:
+            pending = list(self._closed.get(device_id, ()))
+            bucket = self._buckets.get(device_id)
+            if bucket is not None:
+                pending.append(bucket.record())
+        for record in pending:
+            if (since is None or record[0] + self.bucket_seconds > since) and (until is None or record[0] < until):
+                records.append(record)
+        # 按 step 合并；进程重启前落盘的未满时间段，重启后同一时间段会再写一个点，也在这里合并
+        merged = []
+        for record in records:
+            start = record[0] - record[0] % step
+            if merged and merged[-1][0] == start:
+                _, mean, low, high, _, count = merged[-1]
+                total = count + record[5]
+                merged[-1] = (start, (mean * count + record[1] * record[5]) / total,
+                              min(low, record[2]), max(high, record[3]), record[4], total)
+            else:
+                merged.append((start,) + tuple(record[1:]))
+        return [_point(record) for record in merged]
+
+    def consumption(self, device_id, since=None, until=None, noise_grams=2.0, points=None):
+        """估算每天消耗的克数
+
+        相邻聚合点之间的重量下降累加为消耗，上升超过 noise_grams 视为加粮不计入，
+        小于 noise_grams 的波动照常参与累加（上下抵消）。
+        """
+        if points is None:
+            points = self.query(device_id, since, until)
+        if len(points) < 2:
+            return {'grams_per_day': None, 'consumed_grams': 0.0, 'span_days': 0.0,
+                    'refills': 0, 'points': len(points), 'days_left': None}
+        levels = array('d', (p['last'] for p in points))
+        deltas = [b - a for a, b in zip(levels, levels[1:])]
+        consumed = -sum(d for d in deltas if d <= noise_grams)
+        refills = sum(1 for d in deltas if d > noise_grams)
+        span_days = (points[-1]['ts'] - points[0]['ts']) / 86400.0
+        rate = max(consumed, 0.0) / span_days if span_days > 0 else None
+        return {
+            'grams_per_day': round(rate, 2) if rate is not None else None,
+            'consumed_grams': round(max(consumed, 0.0), 2),
+            'span_days': round(span_days, 3),
+            'refills': refills,
+            'points': len(points),
+            'days_left': round(levels[-1] / rate, 1) if rate else None,
+        }
+
+    def start(self):
+        """启动定时落盘线程（重复调用无副作用），进程退出时再落盘一次"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='grain-series', daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
+        with self._lock:
+            for device_id, bucket in self._buckets.items():
+                self._closed.setdefault(device_id, []).append(bucket.record())
+            self._buckets.clear()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            info = dict(self._stats)
+            info['devices'] = len(self._rings)
+            info['open_buckets'] = len(self._buckets)
+            info['pending_points'] = sum(len(v) for v in self._closed.values())
+        info['bucket_seconds'] = self.bucket_seconds
+        info['running'] = bool(self._thread and self._thread.is_alive())
+        return info
+
+    def _run(self):
+        while not self._stopping.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                log.exception("粮桶重量序列落盘出错")
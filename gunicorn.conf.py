@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+gunicorn 生产部署配置
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+进程结构：
+    gunicorn 主进程 ── HTTP 工作进程 × PET_FEEDER_HTTP_WORKERS（gthread，每个 PET_FEEDER_HTTP_THREADS 个线程）
+                   └─ 服务进程：WebSocket（PET_FEEDER_WS_GATEWAY_WORKERS 个网关工作进程）和全部后台任务
+HTTP 工作进程通过网关共享路由表和IPC向设备下发；它们写入的指令由服务进程的发件箱从数据库补载后重试。
+"""
+
+import os
+
+bind = os.environ.get('PET_FEEDER_HTTP_BIND', '0.0.0.0:80')
+workers = int(os.environ.get('PET_FEEDER_HTTP_WORKERS', str(min(4, (os.cpu_count() or 1) * 2))))
+worker_class = 'gthread'
+threads = int(os.environ.get('PET_FEEDER_HTTP_THREADS', '4'))
+keepalive = int(os.environ.get('PET_FEEDER_HTTP_KEEPALIVE', '5'))
+timeout = int(os.environ.get('PET_FEEDER_HTTP_TIMEOUT', '30'))
+graceful_timeout = 10
+# 在主进程中导入应用，工作进程 fork 后共享已加载的代码
+preload_app = True
+accesslog = os.environ.get('PET_FEEDER_HTTP_ACCESS_LOG') or None
+
+
+def when_ready(server):
+    from pet_feeder_server import start_service_process
+    process = start_service_process()
+    server.log.info("服务进程已启动 (pid=%s)", process.pid)
+
+
+def post_fork(server, worker):
+    from pet_feeder_server import init_http_worker
+    init_http_worker(worker.age)
+
+
+def on_exit(server):
+    from pet_feeder_server import stop_service_process
+    stop_service_process()
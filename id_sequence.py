@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按块分配的整数序列
+
+序列的下一个可用值保存在 id_sequences 表中（每个序列一行）。
+分配器每次用一个 UPDATE 把下一个可用值加上 block_size，相当于在数据库中预留一段号码，
+之后从内存中逐个发放，用完再预留下一段。多个进程/线程各自预留不同的段，不会发出重复的值；
+进程退出时没用完的号码直接作废，序列会有空号但始终递增。
+"""
+
+import logging
+import os
+import threading
+
+from sqlalchemy import select, update
+
+log = logging.getLogger('pet_feeder.sequence')
+
+
+def ensure_sequence(connection, table, name, start):
+    """序列不存在时以 start 作为下一个可用值创建，已存在时不改动，返回当前的下一个可用值"""
+    current = connection.execute(select(table.c.next_value).where(table.c.name == name)).scalar()
+    if current is None:
+        connection.execute(table.insert().values(name=name, next_value=start))
+        current = start
+    return current
+
+
+def advance_sequence(connection, table, name, minimum):
+    """确保序列存在且下一个可用值不小于 minimum（只前进不回退），返回当前的下一个可用值"""
+    current = ensure_sequence(connection, table, name, minimum)
+    if current < minimum:
+        connection.execute(update(table).where(table.c.name == name).values(next_value=minimum))
+        current = minimum
+    return current
+
+
+class BlockAllocator(object):
+    """从 id_sequences 表按块预留号码，在内存中逐个发放"""
+
+    def __init__(self, engine, table, name, block_size=20):
+        self.engine = engine
+        self.table = table
+        self.name = name
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0           # 当前段的结束值（不含）
+        self._pid = None        # 预留当前段的进程，fork 出的子进程不能沿用父进程的号码段
+        self._stats = {'issued': 0, 'blocks': 0}
+
+    def _reserve(self):
+        with self.engine.begin() as connection:
+            updated = connection.execute(
+                update(self.table).where(self.table.c.name == self.name)
+                .values(next_value=self.table.c.next_value + self.block_size)
+            ).rowcount
+            if not updated:
+                raise LookupError(f"序列 {self.name} 不存在，请先执行数据库迁移")
+            end = connection.execute(
+                select(self.table.c.next_value).where(self.table.c.name == self.name)).scalar()
+        self._next, self._end, self._pid = end - self.block_size, end, os.getpid()
+        self._stats['blocks'] += 1
+        log.debug("序列 %s 预留号码段 [%s, %s)", self.name, self._next, end)
+
+    def next(self):
+        """发放下一个号码，当前段用完时预留新的一段"""
+        with self._lock:
+            if self._next >= self._end or self._pid != os.getpid():
+                self._reserve()
+            value = self._next
+            self._next += 1
+            self._stats['issued'] += 1
+            return value
+
+    def stats(self):
+        with self._lock:
+            info = dict(self._stats)
+            info['remaining'] = self._end - self._next if self._pid == os.getpid() else 0
+        info['block_size'] = self.block_size
+        return info
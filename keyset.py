@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+键集分页（keyset / cursor pagination）
+
+按一组唯一且非空的排序列翻页：下一页的条件是 (排序列...) 大于（倒序时小于）上一页
+最后一行的值，配合索引每页都只读取 limit 行，不随页数变深而变慢，也不需要 OFFSET。
+游标是上一页最后一行排序列的值，JSON 编码后再做 URL 安全的 base64，客户端原样传回即可。
+"""
+
+import base64
+import binascii
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import DateTime, literal, tuple_
+
+Page = namedtuple('Page', 'items next_cursor')
+
+
+class CursorError(ValueError):
+    """游标无法解析或与排序列不匹配"""
+
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values],
+                     separators=(',', ':'), ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, columns):
+    """解析游标，按排序列的类型还原取值"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw.decode('utf-8'))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise CursorError("无效的分页游标")
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise CursorError("分页游标与排序方式不匹配")
+    try:
+        return [datetime.fromisoformat(value) if isinstance(column.type, DateTime) and value is not None else value
+                for column, value in zip(columns, values)]
+    except (TypeError, ValueError):
+        raise CursorError("无效的分页游标")
+
+
+def _after(columns, values, descending):
+    params = [literal(value, column.type) for column, value in zip(columns, values)]
+    if len(columns) == 1:
+        key, bound = columns[0], params[0]
+    else:
+        key, bound = tuple_(*columns), tuple_(*params)
+    return key < bound if descending else key > bound
+
+
+def keyset_page(query, columns, cursor=None, limit=50, descending=False, session=None, params=None):
+    """取 query 的一页，返回 Page(本页行, 下一页游标)，没有下一页时游标为 None
+
+    columns: 排序列（ORM 属性），组合起来必须唯一且不为空，最后一列通常是主键；
+    query 中不要再带 order_by / limit。
+    query 也可以是 Core select 语句（结果行需包含排序列），此时由 session 执行，params 为绑定参数。
+    """
+    if cursor:
+        query = query.filter(_after(columns, decode_cursor(cursor, columns), descending))
+    query = query.order_by(*[column.desc() if descending else column.asc() for column in columns])
+    query = query.limit(limit + 1)
+    rows = (session.execute(query, params) if session is not None else query).all()
+    if len(rows) <= limit:
+        return Page(rows, None)
+    rows = rows[:limit]
+    return Page(rows, encode_cursor([getattr(rows[-1], column.key) for column in columns]))
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步日志管道
+
+业务线程（包括 WebSocket 事件循环）只把日志记录放进内存队列，
+由后台线程格式化并写到控制台/文件，避免在事件循环里同步写 stdout。
+
+- 日志调用统一使用 %s 占位符延迟格式化：级别未开启时不会格式化，
+  开启时格式化也在后台线程中进行
+- 带 device_id 的记录按 (device_id, 消息模板) 限流，超出部分丢弃并计数，
+  下一条放行的记录会附上被抑制的条数
+- 记录可带 sample_every=N，同一设备同一模板每 N 条只保留 1 条
+
+用法:
+    log = logging.getLogger('pet_feeder.ws')
+    log.debug("收到设备 %s 消息: %s", device_id, msg, extra=device_extra(device_id, sample_every=10))
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+ROOT_LOGGER = 'pet_feeder'
+
+_state = {'pid': None, 'listener': None, 'handler': None}
+_state_lock = threading.Lock()
+
+
+def device_extra(device_id, sample_every=None):
+    """日志调用的 extra 参数：标记设备，用于限流/采样和结构化输出"""
+    extra = {'device_id': device_id}
+    if sample_every:
+        extra['sample_every'] = sample_every
+    return extra
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """进程内队列：不在调用线程中格式化，原样把记录交给后台线程"""
+
+    def prepare(self, record):
+        return record
+
+
+class DeviceRateLimitFilter(logging.Filter):
+    """按 (device_id, 消息模板) 限流和采样
+
+    每个键在 window 秒内最多放行 burst 条；sample_every 在限流之前生效。
+    不带 device_id 的记录不受影响。
+    """
+
+    def __init__(self, burst=20, window=60.0, max_keys=10000):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = {}   # key -> [窗口开始时间, 本窗口已放行数, 已抑制数, 采样计数]
+        self.suppressed_total = 0
+
+    def filter(self, record):
+        device_id = getattr(record, 'device_id', None)
+        if device_id is None:
+            return True
+        key = (device_id, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._buckets.clear()
+                bucket = self._buckets[key] = [now, 0, 0, 0]
+            sample_every = getattr(record, 'sample_every', None)
+            if sample_every:
+                bucket[3] += 1
+                if (bucket[3] - 1) % sample_every:
+                    return False
+            if now - bucket[0] >= self.window:
+                bucket[0], bucket[1] = now, 0
+            if bucket[1] >= self.burst:
+                bucket[2] += 1
+                self.suppressed_total += 1
+                return False
+            bucket[1] += 1
+            if bucket[2]:
+                record.suppressed = bucket[2]
+                bucket[2] = 0
+        return True
+
+
+class StructuredFormatter(logging.Formatter):
+    """文本格式：在消息后附加 device_id 等字段；json=True 时每条输出一行JSON"""
+
+    FIELDS = ('device_id', 'peer', 'suppressed')
+
+    def __init__(self, fmt=None, as_json=False):
+        super().__init__(fmt)
+        self.as_json = as_json
+
+    def format(self, record):
+        if self.as_json:
+            item = {
+                'time': self.formatTime(record),
+                'level': record.levelname,
+                'logger': record.name,
+                'message': record.getMessage(),
+            }
+            for field in self.FIELDS:
+                value = getattr(record, field, None)
+                if value is not None:
+                    item[field] = value
+            if record.exc_info:
+                item['exc_info'] = self.formatException(record.exc_info)
+            return json.dumps(item, ensure_ascii=False, default=str)
+        text = super().format(record)
+        fields = []
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                fields.append(f"{field}={value}")
+        if fields:
+            text = f"{text} [{' '.join(fields)}]"
+        return text
+
+
+def setup_logging(level='INFO', log_file=None, fmt=None, as_json=False,
+                  rate_limit_burst=20, rate_limit_window=60.0):
+    """为 pet_feeder 日志树安装异步队列处理器，返回后台写线程(QueueListener)
+
+    同一进程重复调用直接返回已有的写线程；fork 出的子进程里调用会重新建立队列和写线程。
+    """
+    with _state_lock:
+        if _state['pid'] == os.getpid():
+            return _state['listener']
+
+        handlers = []
+        console = logging.StreamHandler()
+        console.setFormatter(StructuredFormatter(fmt, as_json))
+        handlers.append(console)
+        if log_file:
+            log_dir = os.path.dirname(log_file)
+            if log_dir:
+                os.makedirs(log_dir, exist_ok=True)
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=10 * 1024 * 1024, backupCount=5, encoding='utf-8')
+            file_handler.setFormatter(StructuredFormatter(fmt, as_json))
+            handlers.append(file_handler)
+
+        root = logging.getLogger(ROOT_LOGGER)
+        # fork 继承的处理器指向父进程的队列，子进程里替换掉
+        if _state['handler'] is not None:
+            root.removeHandler(_state['handler'])
+        log_queue = queue.SimpleQueue()
+        handler = _DeferredQueueHandler(log_queue)
+        handler.addFilter(DeviceRateLimitFilter(rate_limit_burst, rate_limit_window))
+        root.addHandler(handler)
+        root.setLevel(level)
+        root.propagate = False
+
+        listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        # 退出时把队列中剩余的日志写完
+        atexit.register(listener.stop)
+        _state.update(pid=os.getpid(), listener=listener, handler=handler)
+        return listener
+
+
+def rate_limit_stats():
+    """当前进程被限流/采样丢弃的日志条数"""
+    handler = _state['handler']
+    if handler is None or _state['pid'] != os.getpid():
+        return {'suppressed': 0}
+    suppressed = sum(getattr(f, 'suppressed_total', 0) for f in handler.filters)
+    return {'suppressed': suppressed}
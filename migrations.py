@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库结构版本迁移
+
+每个迁移有一个递增的整数版本号，执行成功后写入 schema_migrations 表，
+已执行的版本不会重复执行。迁移出错时抛出 MigrationError，不再吞掉异常。
+
+SQLite 中 DDL 语句不一定和版本记录处于同一事务，迁移函数需要可重复执行
+（建表/建索引用 IF NOT EXISTS，加字段前先检查字段是否存在）。
+"""
+
+import logging
+import time
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+log = logging.getLogger('pet_feeder.migrations')
+
+MIGRATIONS_TABLE = 'schema_migrations'
+
+
+class MigrationError(Exception):
+    """迁移执行失败"""
+
+
+class Migration(object):
+    """一个版本的迁移：upgrade(connection) 在事务连接上执行结构变更"""
+    __slots__ = ('version', 'name', 'upgrade')
+
+    def __init__(self, version, name, upgrade):
+        self.version = version
+        self.name = name
+        self.upgrade = upgrade
+
+
+def table_exists(connection, table):
+    return inspect(connection).has_table(table)
+
+
+def column_exists(connection, table, column):
+    return any(c['name'] == column for c in inspect(connection).get_columns(table))
+
+
+def add_column(connection, table, column, ddl):
+    """字段不存在时添加，返回是否新加了字段"""
+    if not table_exists(connection, table) or column_exists(connection, table, column):
+        return False
+    connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+    return True
+
+
+def explain(connection, statement):
+    """返回查询的执行计划（每行一条文本）
+
+    SQLite 使用 EXPLAIN QUERY PLAN，其他数据库使用 EXPLAIN。
+    参数按字面值编入SQL，执行计划不依赖绑定参数。
+    """
+    sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+    if connection.dialect.name == 'sqlite':
+        return [row[-1] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql)]
+    return [row[0] for row in connection.exec_driver_sql('EXPLAIN ' + sql)]
+
+
+class MigrationRunner(object):
+    """按版本号顺序执行尚未执行的迁移"""
+
+    def __init__(self, engine, migrations):
+        versions = [m.version for m in migrations]
+        if len(set(versions)) != len(versions):
+            raise ValueError("迁移版本号重复")
+        self.engine = engine
+        self.migrations = sorted(migrations, key=lambda m: m.version)
+
+    def ensure_table(self):
+        with self.engine.begin() as connection:
+            connection.execute(text(
+                f'CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ('
+                'version INTEGER PRIMARY KEY, '
+                'name VARCHAR(100) NOT NULL, '
+                'applied_at TIMESTAMP NOT NULL, '
+                'duration_ms FLOAT NOT NULL)'
+            ))
+
+    def applied(self):
+        """已执行的版本: version -> {name, applied_at, duration_ms}"""
+        self.ensure_table()
+        with self.engine.connect() as connection:
+            rows = connection.execute(text(
+                f'SELECT version, name, applied_at, duration_ms FROM {MIGRATIONS_TABLE} ORDER BY version'
+            )).all()
+        return {row.version: {'name': row.name, 'applied_at': row.applied_at, 'duration_ms': row.duration_ms}
+                for row in rows}
+
+    def pending(self, target=None):
+        applied = self.applied()
+        return [m for m in self.migrations
+                if m.version not in applied and (target is None or m.version <= target)]
+
+    def status(self):
+        applied = self.applied()
+        return [{
+            'version': m.version,
+            'name': m.name,
+            'applied': m.version in applied,
+            'applied_at': applied.get(m.version, {}).get('applied_at'),
+        } for m in self.migrations]
+
+    def upgrade(self, target=None):
+        """执行到 target 版本（默认全部），每个迁移一个事务，返回本次执行的迁移列表"""
+        done = []
+        for migration in self.pending(target):
+            started = time.perf_counter()
+            try:
+                with self.engine.begin() as connection:
+                    migration.upgrade(connection)
+                    duration_ms = (time.perf_counter() - started) * 1000
+                    connection.execute(text(
+                        f'INSERT INTO {MIGRATIONS_TABLE} (version, name, applied_at, duration_ms) '
+                        'VALUES (:version, :name, :applied_at, :duration_ms)'
+                    ), {
+                        'version': migration.version,
+                        'name': migration.name,
+                        'applied_at': datetime.utcnow(),
+                        'duration_ms': round(duration_ms, 3),
+                    })
+            except Exception as e:
+                raise MigrationError(f"迁移 {migration.version} ({migration.name}) 失败: {e}") from e
+            log.info("已执行迁移 %s (%s)，耗时 %.1fms", migration.version, migration.name, duration_ms)
+            done.append(migration)
+        return done
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备指令发件箱(outbox)的内存索引
+
+指令本身持久化在 device_commands 表中，这里按设备维护尚未确认的指令，
+负责重连时合并下发、按指数退避安排重试，以及收到确认且库中确认成功后出队。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class OutboxEntry(object):
+    """一条未确认的指令"""
+    __slots__ = ('id', 'device_id', 'command_type', 'ack_key', 'message',
+                 'status', 'attempts', 'next_attempt_at', 'acking')
+
+    def __init__(self, id, device_id, command_type, ack_key, message, status='pending', attempts=0):
+        self.id = id
+        self.device_id = device_id
+        self.command_type = command_type
+        self.ack_key = ack_key
+        self.message = message
+        self.status = status
+        self.attempts = attempts
+        self.next_attempt_at = 0.0
+        self.acking = False    # 已收到确认，等待库中确认结果
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'device_id': self.device_id,
+            'command_type': self.command_type,
+            'status': self.status,
+            'attempts': self.attempts,
+        }
+
+
+class OutboxIndex(object):
+    """按设备组织的未确认指令索引（线程安全）
+
+    retry_base 秒起按 2 的幂退避，单次间隔不超过 retry_max 秒，
+    发送 max_attempts 次仍未确认的指令判定为失败。
+    """
+
+    def __init__(self, retry_base=5.0, retry_max=300.0, max_attempts=5):
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._by_device = {}   # device_id -> OrderedDict(id -> OutboxEntry)
+        self._by_id = {}
+
+    def add(self, entry):
+        with self._lock:
+            self._by_device.setdefault(entry.device_id, OrderedDict())[entry.id] = entry
+            self._by_id[entry.id] = entry
+
+    def add_sent(self, entry, now=None):
+        """登记其他进程已发送过的指令，按已发送次数安排下次重试"""
+        now = now or time.monotonic()
+        entry.status = 'last_attempt' if entry.attempts >= self.max_attempts else 'sent'
+        entry.next_attempt_at = now + self._backoff(max(entry.attempts, 1))
+        self.add(entry)
+
+    def get(self, command_id):
+        return self._by_id.get(command_id)
+
+    def remove(self, command_id):
+        with self._lock:
+            return self._remove_locked(command_id)
+
+    def _remove_locked(self, command_id):
+        entry = self._by_id.pop(command_id, None)
+        if entry:
+            commands = self._by_device.get(entry.device_id)
+            if commands is not None:
+                commands.pop(command_id, None)
+                if not commands:
+                    del self._by_device[entry.device_id]
+        return entry
+
+    def begin_ack(self, device_id, ack_key):
+        """收到确认：把该设备最早一条匹配的指令标记为确认中并返回，暂不出队
+
+        确认中的指令不再匹配后续确认，也不参与重试；库中确认后调用 finish_ack。
+        """
+        with self._lock:
+            for entry in self._by_device.get(device_id, {}).values():
+                if entry.ack_key == ack_key and not entry.acking:
+                    entry.acking = True
+                    return entry
+        return None
+
+    def finish_ack(self, entry, acked):
+        """库中确认完成：确认成功才出队，否则恢复为未确认"""
+        with self._lock:
+            entry.acking = False
+            if acked:
+                self._remove_locked(entry.id)
+
+    def pending_for(self, device_id):
+        """设备所有未确认指令，按入队顺序"""
+        with self._lock:
+            return list(self._by_device.get(device_id, {}).values())
+
+    def device_ids(self):
+        with self._lock:
+            return set(self._by_device)
+
+    def mark_sent(self, entries, now=None):
+        """记录一次发送并安排下次重试"""
+        now = now or time.monotonic()
+        with self._lock:
+            for entry in entries:
+                entry.attempts += 1
+                # 最后一次发送后仍给设备一个退避周期来确认
+                entry.status = 'last_attempt' if entry.attempts >= self.max_attempts else 'sent'
+                entry.next_attempt_at = now + self._backoff(entry.attempts)
+
+    def mark_failed(self, entries, now=None):
+        """发送出错：计入发送次数，保持待发送状态，按退避稍后重试"""
+        now = now or time.monotonic()
+        with self._lock:
+            for entry in entries:
+                entry.attempts += 1
+                if entry.attempts >= self.max_attempts:
+                    entry.status = 'last_attempt'
+                entry.next_attempt_at = now + self._backoff(entry.attempts)
+
+    def due(self, online_ids, now=None):
+        """已到重试时间的在线设备指令，返回 (待重发, 已超过最大次数)"""
+        now = now or time.monotonic()
+        retry, expired = [], []
+        with self._lock:
+            for device_id, commands in self._by_device.items():
+                if device_id not in online_ids:
+                    continue
+                for entry in commands.values():
+                    # 从未尝试过的指令等设备上线时补发，不在这里重试
+                    if entry.acking or entry.next_attempt_at > now or (entry.status == 'pending' and not entry.attempts):
+                        continue
+                    if entry.status == 'last_attempt':
+                        expired.append(entry)
+                    else:
+                        retry.append(entry)
+        return retry, expired
+
+    def _backoff(self, attempts):
+        return min(self.retry_max, self.retry_base * (2 ** (attempts - 1)))
+
+    def stats(self):
+        with self._lock:
+            total = len(self._by_id)
+            sent = sum(1 for e in self._by_id.values() if e.status != 'pending')
+            devices = len(self._by_device)
+        return {'unacked': total, 'awaiting_ack': sent, 'queued_offline': total - sent, 'devices': devices}
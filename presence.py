@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备在线状态跟踪
+
+在线状态由 WebSocket 连接/断开事件驱动，保存在内存中；
+只有状态发生变化的设备才会写库，并且按时间窗口合并成批量更新。
+"""
+
+import logging
+import threading
+import time
+
+log = logging.getLogger('pet_feeder.presence')
+
+
+class PresenceTracker(object):
+    """内存中的设备在线状态
+
+    connected()/disconnected() 只修改内存并记录状态变化；
+    写线程每 flush_interval 秒调用一次 persist(online_ids, offline_ids)，
+    同一窗口内设备反复上下线只保留最后状态，与上次写库状态相同的直接丢弃。
+    """
+
+    def __init__(self, persist, flush_interval=1.0):
+        self._persist = persist
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._online = {}    # device_id -> 上线时间戳
+        self._pending = {}   # device_id -> 待写库的在线状态
+        self._stored = {}    # device_id -> 最近一次写库的在线状态
+        self._thread = None
+        self._stats = {
+            'connects': 0,
+            'disconnects': 0,
+            'flushes': 0,
+            'persisted_online': 0,
+            'persisted_offline': 0,
+        }
+
+    def start(self):
+        """启动定时写库线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='presence-flush', daemon=True)
+            self._thread.start()
+
+    def connected(self, device_id):
+        with self._lock:
+            self._online[device_id] = time.time()
+            self._pending[device_id] = True
+            self._stats['connects'] += 1
+
+    def disconnected(self, device_id):
+        with self._lock:
+            self._online.pop(device_id, None)
+            self._pending[device_id] = False
+            self._stats['disconnects'] += 1
+
+    def is_online(self, device_id):
+        return device_id in self._online
+
+    def online_ids(self):
+        with self._lock:
+            return set(self._online)
+
+    def flush(self):
+        """把积累的状态变化写库，返回 (上线数, 下线数)"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            online, offline = [], []
+            for device_id, state in pending.items():
+                if self._stored.get(device_id) == state:
+                    continue
+                (online if state else offline).append(device_id)
+                self._stored[device_id] = state
+        if online or offline:
+            self._persist(online, offline)
+            self._stats['persisted_online'] += len(online)
+            self._stats['persisted_offline'] += len(offline)
+        self._stats['flushes'] += 1
+        return len(online), len(offline)
+
+    def forget_stored(self, device_ids):
+        """对账修正过的设备，下次变化必须重新写库"""
+        with self._lock:
+            for device_id in device_ids:
+                self._stored.pop(device_id, None)
+
+    def stats(self):
+        info = dict(self._stats)
+        with self._lock:
+            info['online'] = len(self._online)
+            info['pending'] = len(self._pending)
+        info['flush_interval'] = self.flush_interval
+        return info
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                log.error("写入设备在线状态变化时出错: %s", e)
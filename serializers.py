@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API 响应序列化
+
+RowSerializer 按一组列（Core 列、ORM 属性或带 label 的表达式）生成 select 语句，
+并预先编译一个把结果行（元组）转换成 dict 的函数：每个字段是按位置取值，
+需要格式化的字段调用对应的转换函数，不经过 ORM 实例，也不在每行上查找属性。
+
+dumps() 优先使用 orjson（原生支持 datetime，输出 bytes），未安装时使用标准库 json。
+时间字段按现有接口的格式输出字符串：UTC 'YYYY-MM-DD HH:MM:SS'，
+北京时间用固定的 +8 小时偏移（1991 年以后上海不再实行夏令时）。
+"""
+
+import json
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+BEIJING_OFFSET = timedelta(hours=8)
+
+
+def format_datetime(value):
+    """datetime -> 'YYYY-MM-DD HH:MM:SS'，等同 strftime('%Y-%m-%d %H:%M:%S')"""
+    return value.isoformat(' ', 'seconds') if value is not None else None
+
+
+def format_beijing(value):
+    """UTC 的 naive datetime -> 北京时间 'YYYY-MM-DD HH:MM:SS'"""
+    return (value + BEIJING_OFFSET).isoformat(' ', 'seconds') if value is not None else None
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"无法序列化 {type(value).__name__}")
+
+
+def dumps(obj):
+    """序列化为 UTF-8 编码的 JSON bytes，datetime 输出 ISO 8601"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_json_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def backend():
+    return 'orjson' if orjson is not None else 'json'
+
+
+def _column_key(column):
+    key = getattr(column, 'key', None) or getattr(column, 'name', None)
+    if not key:
+        raise ValueError(f"列 {column!r} 没有名称，请使用 label()")
+    return key
+
+
+def _compile(keys, converters, constants):
+    """生成 serialize(row) 函数：返回字面量 dict，字段按位置从行元组中取值"""
+    namespace = {}
+    parts = []
+    for index, (key, converter) in enumerate(zip(keys, converters)):
+        if converter is None:
+            parts.append(f'{key!r}: row[{index}]')
+        else:
+            namespace[f'c{index}'] = converter
+            parts.append(f'{key!r}: c{index}(row[{index}])')
+    for index, (key, value) in enumerate(constants.items()):
+        namespace[f'k{index}'] = value
+        parts.append(f'{key!r}: k{index}')
+    source = 'def serialize(row):\n    return {' + ', '.join(parts) + '}\n'
+    exec(source, namespace)
+    return namespace['serialize']
+
+
+class RowSerializer(object):
+    """按列定义预编译的行序列化器
+
+    fields: 列，或 (列, 转换函数)；字段名取列的 key/label。
+    constants: 每行都附加的固定字段。
+    """
+
+    def __init__(self, fields, constants=None):
+        self.columns = []
+        converters = []
+        for field in fields:
+            column, converter = field if isinstance(field, tuple) else (field, None)
+            self.columns.append(column)
+            converters.append(converter)
+        self.keys = [_column_key(column) for column in self.columns]
+        self.constants = dict(constants or {})
+        self.serialize = _compile(self.keys, converters, self.constants)
+
+    def select(self):
+        """查询这些列的 select 语句，调用方再加 where/order_by/limit"""
+        return select(*self.columns)
+
+    def many(self, rows):
+        serialize = self.serialize
+        return [serialize(row) for row in rows]
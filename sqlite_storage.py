@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite 存储参数与 WAL 检查点
+
+- install_sqlite_profile：在引擎的 connect 事件中为每个新连接设置 PRAGMA，
+  连接池里的所有连接（包括 fork 后重建的）都使用同一组参数
+- WalCheckpointer：后台线程按 WAL 文件大小执行检查点，
+  超过 passive_bytes 执行 PASSIVE（不阻塞读写），超过 truncate_bytes 执行 TRUNCATE 把文件截断
+"""
+
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event
+
+log = logging.getLogger('pet_feeder.sqlite')
+
+# PRAGMA 执行顺序固定，journal_mode 放在最前
+PROFILE_PRAGMAS = ('journal_mode', 'synchronous', 'cache_size', 'mmap_size',
+                   'busy_timeout', 'temp_store', 'wal_autocheckpoint')
+
+
+def install_sqlite_profile(engine, profile):
+    """为引擎的每个新连接设置 PRAGMA，非 SQLite 引擎直接返回 False
+
+    profile: {'synchronous': 'NORMAL', 'cache_size': -20000, ...}，值为 None 的项不设置
+    """
+    if engine.dialect.name != 'sqlite':
+        return False
+    pragmas = [(name, profile[name]) for name in PROFILE_PRAGMAS if profile.get(name) is not None]
+
+    @event.listens_for(engine, 'connect')
+    def _apply_profile(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+    log.info("SQLite连接参数: %s", ', '.join(f'{n}={v}' for n, v in pragmas))
+    return True
+
+
+def sqlite_database_path(engine):
+    """SQLite 数据库文件路径，内存库或其他数据库返回 None"""
+    if engine.dialect.name != 'sqlite':
+        return None
+    database = engine.url.database
+    if not database or database == ':memory:' or database.startswith('file::memory:'):
+        return None
+    return database
+
+
+class WalCheckpointer(object):
+    """按 WAL 大小定期执行检查点
+
+    每 interval 秒检查一次 WAL 文件大小：
+    小于 passive_bytes 不处理；否则执行 PASSIVE；
+    大于等于 truncate_bytes 时执行 TRUNCATE（需要等待读写事务结束，受 busy_timeout 限制）。
+    """
+
+    def __init__(self, engine, interval=30.0, passive_bytes=4 * 1024 * 1024,
+                 truncate_bytes=64 * 1024 * 1024):
+        self.engine = engine
+        self.interval = interval
+        self.passive_bytes = passive_bytes
+        self.truncate_bytes = truncate_bytes
+        database = sqlite_database_path(engine)
+        self.wal_path = f'{database}-wal' if database else None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+        self._stats = {
+            'checks': 0,
+            'passive': 0,
+            'truncate': 0,
+            'busy': 0,
+            'errors': 0,
+            'last_mode': None,
+            'last_duration_ms': 0.0,
+            'max_duration_ms': 0.0,
+            'last_wal_bytes_before': 0,
+            'last_wal_bytes_after': 0,
+            'last_log_frames': 0,
+            'last_checkpointed_frames': 0,
+            'last_checkpoint_at': None,
+        }
+
+    def start(self):
+        """启动检查点线程（重复调用无副作用，非 SQLite 文件库不启动）"""
+        if self.wal_path is None:
+            return False
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return True
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='wal-checkpoint', daemon=True)
+            self._thread.start()
+        log.info("WAL检查点线程已启动: interval=%ss, passive>=%s, truncate>=%s",
+                 self.interval, self.passive_bytes, self.truncate_bytes)
+        return True
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def wal_size(self):
+        try:
+            return os.path.getsize(self.wal_path)
+        except (OSError, TypeError):
+            return 0
+
+    def checkpoint(self, mode=None):
+        """执行一次检查点，mode 为空时按 WAL 大小选择，返回执行的模式（未执行返回 None）"""
+        size = self.wal_size()
+        if mode is None:
+            if size >= self.truncate_bytes:
+                mode = 'TRUNCATE'
+            elif size >= self.passive_bytes:
+                mode = 'PASSIVE'
+            else:
+                return None
+        started = time.perf_counter()
+        try:
+            with self.engine.connect() as connection:
+                busy, log_frames, checkpointed = connection.exec_driver_sql(
+                    f'PRAGMA wal_checkpoint({mode})').one()
+        except Exception as e:
+            self._stats['errors'] += 1
+            log.warning("WAL检查点(%s)失败: %s", mode, e)
+            return None
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._stats[mode.lower()] = self._stats.get(mode.lower(), 0) + 1
+            if busy:
+                self._stats['busy'] += 1
+            self._stats['last_mode'] = mode
+            self._stats['last_duration_ms'] = round(elapsed_ms, 3)
+            self._stats['max_duration_ms'] = round(max(self._stats['max_duration_ms'], elapsed_ms), 3)
+            self._stats['last_wal_bytes_before'] = size
+            self._stats['last_wal_bytes_after'] = self.wal_size()
+            self._stats['last_log_frames'] = log_frames
+            self._stats['last_checkpointed_frames'] = checkpointed
+            self._stats['last_checkpoint_at'] = time.time()
+        log.debug("WAL检查点(%s): %s -> %s 字节, %.1fms, busy=%s",
+                  mode, size, self._stats['last_wal_bytes_after'], elapsed_ms, busy)
+        return mode
+
+    def stats(self):
+        with self._lock:
+            info = dict(self._stats)
+        info['wal_bytes'] = self.wal_size()
+        info['wal_path'] = self.wal_path
+        info['interval'] = self.interval
+        info['passive_bytes'] = self.passive_bytes
+        info['truncate_bytes'] = self.truncate_bytes
+        info['running'] = bool(self._thread and self._thread.is_alive())
+        return info
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            self._stats['checks'] += 1
+            try:
+                self.checkpoint()
+            except Exception:
+                log.exception("WAL检查点线程出错")
@@ -64,13 +64,13 @@ def main():
     
     try:
         # 导入并启动服务器
-        from pet_feeder_server import app, create_tables, start_offline_check
+        from pet_feeder_server import app, create_tables, start_background_services
         
         # 创建数据库表
         create_tables()
         
-        # 启动离线检测任务
-        start_offline_check()
+        # 启动WebSocket服务和后台任务
+        start_background_services()
         
         # 启动Flask应用
         app.run(host='127.0.0.1', port=80, debug=False)
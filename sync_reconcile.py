@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备同步数据核对
+
+设备上报的数据为准：把数据库中的现有行和设备上报的条目按稳定的键配对，
+一次算出需要新增、更新、删除的集合，由调用方批量写库。
+"""
+
+
+class SyncDiff(object):
+    """一次核对的结果
+
+    inserts: 数据库中没有的设备条目
+    updates: [(行ID, 需要修改的字段字典)]
+    deletes: 设备中已不存在的行ID
+    """
+
+    def __init__(self):
+        self.inserts = []
+        self.updates = []
+        self.deletes = []
+
+    def summary(self):
+        return {
+            'inserted': len(self.inserts),
+            'updated': len(self.updates),
+            'deleted': len(self.deletes),
+        }
+
+
+def reconcile(db_rows, device_items, row_key, item_key, changes):
+    """按键配对数据库行和设备条目
+
+    row_key(row) / item_key(item) 返回可哈希的键；同一个键有多条时按顺序一一配对，
+    多出的设备条目新增，多出的数据库行删除。
+    changes(row, item) 返回配对后需要修改的字段字典，无变化返回空字典。
+    row 需要有 id 属性。
+    """
+    rows_by_key = {}
+    for row in db_rows:
+        rows_by_key.setdefault(row_key(row), []).append(row)
+
+    diff = SyncDiff()
+    for item in device_items:
+        rows = rows_by_key.get(item_key(item))
+        if rows:
+            row = rows.pop(0)
+            values = changes(row, item)
+            if values:
+                diff.updates.append((row.id, values))
+        else:
+            diff.inserts.append(item)
+
+    for rows in rows_by_key.values():
+        diff.deletes.extend(row.id for row in rows)
+    return diff
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史数据归档（archive_store.py 与服务器的分批归档）测试
+
+归档目录和数据库都在临时目录中，可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+_tmp_dir = tempfile.TemporaryDirectory(prefix='pet_feeder_test_')
+# 环境变量必须在导入服务器模块之前设置
+os.environ.setdefault('PET_FEEDER_DATABASE_URI', f"sqlite:///{os.path.join(_tmp_dir.name, 'test.db')}")
+os.environ.setdefault('PET_FEEDER_LOG_LEVEL', 'WARNING')
+os.environ.setdefault('PET_FEEDER_LOG_FILE', '')
+
+import pet_feeder_server as server  # noqa: E402
+from archive_store import ArchiveStore, device_dir_name  # noqa: E402
+
+server.create_tables()
+
+BASE = datetime(2020, 3, 30, 12, 0, 0)
+
+
+def _store(name):
+    return ArchiveStore(os.path.join(_tmp_dir.name, name))
+
+
+def _rows(device_id, start_id, count, step=timedelta(days=1)):
+    return [{'id': start_id + i, 'device_id': device_id, 'created_at': BASE + step * i, 'feeding_amount': 10.0 + i}
+            for i in range(count)]
+
+
+def test_write_partitions_and_read_range():
+    """按设备和月份分区；读取按 [since, until) 过滤并把时间字段解析为 datetime"""
+    store = _store('range')
+    assert store.write('feeding_records', _rows('AR-1', 1, 5) + _rows('AR-2', 100, 1), 'created_at') == 3
+    assert store.months('feeding_records', 'AR-1') == ['2020-03', '2020-04']
+    rows = list(store.read('feeding_records', 'AR-1', 'created_at', BASE + timedelta(days=1), BASE + timedelta(days=3)))
+    assert [r['id'] for r in rows] == [2, 3]
+    assert rows[0]['created_at'] == BASE + timedelta(days=1)
+    assert [r['id'] for r in store.read('feeding_records', 'AR-1', 'created_at')] == [1, 2, 3, 4, 5]
+    assert list(store.read('feeding_records', 'AR-3', 'created_at')) == []
+    assert store.stats()['feeding_records']['files'] == 3
+
+
+def test_repeated_archive_deduplicated():
+    """归档后删除前中断会重复写入同一批行，读取时按 id 去重；追加的新行照常读出"""
+    store = _store('dedupe')
+    rows = _rows('AR-1', 1, 3)
+    store.write('feeding_records', rows, 'created_at')
+    store.write('feeding_records', rows, 'created_at')
+    store.write('feeding_records', _rows('AR-1', 4, 1), 'created_at')
+    path = os.path.join(store.root, 'feeding_records', 'AR-1', '2020-03.ndjson.gz')
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        assert len(f.readlines()) == 5           # 重复写入的行仍在文件中，三次写入各为一个 gzip 成员
+    assert sorted(r['id'] for r in store.read('feeding_records', 'AR-1', 'created_at')) == [1, 2, 3, 4]
+
+
+def test_device_dirs_do_not_collide():
+    """设备ID中的特殊字符可逆编码，"a b" 与 "a_b" 写入不同目录，读取互不混入"""
+    store = _store('collide')
+    store.write('feeding_records', _rows('a b', 1, 2), 'created_at')
+    store.write('feeding_records', _rows('a_b', 10, 2), 'created_at')
+    assert device_dir_name('a b') != device_dir_name('a_b')
+    assert device_dir_name('ESP-001_x.1') == 'ESP-001_x.1'      # 普通设备ID目录名不变
+    assert device_dir_name('..') not in ('.', '..') and '/' not in device_dir_name('../x')
+    assert [r['id'] for r in store.read('feeding_records', 'a b', 'created_at')] == [1, 2]
+    assert [r['id'] for r in store.read('feeding_records', 'a_b', 'created_at')] == [10, 11]
+
+
+def test_legacy_directory_filtered_by_device():
+    """旧版本把 "a b" 和 "a_b" 都写进 a_b 目录，读取时按行中的 device_id 区分"""
+    store = _store('legacy')
+    directory = os.path.join(store.root, 'feeding_records', 'a_b')
+    os.makedirs(directory)
+    data = ''.join(json.dumps(dict(row, created_at=row['created_at'].isoformat())) + '\n'
+                   for row in _rows('a b', 1, 2) + _rows('a_b', 10, 1)).encode('utf-8')
+    with open(os.path.join(directory, '2020-03.ndjson.gz'), 'wb') as f:
+        f.write(gzip.compress(data))
+    store.write('feeding_records', _rows('a b', 3, 1), 'created_at')
+    assert sorted(r['id'] for r in store.read('feeding_records', 'a b', 'created_at')) == [1, 2, 3]
+    assert [r['id'] for r in store.read('feeding_records', 'a_b', 'created_at')] == [10]
+
+
+def test_archive_table_in_chunks():
+    """过期行按批写入归档后删除，保留期内的行不动；再次执行没有可归档的行"""
+    device_id = 'AR-CHUNK'
+    with server.app.app_context():
+        server.db.session.add(server.Device(device_id=device_id, password='x'))
+        for i in range(10):
+            server.db.session.add(server.FeedingRecord(
+                device_id=device_id, day_of_week=1, hour=8, minute=30, feeding_amount=5,
+                created_at=BASE + timedelta(hours=i)))
+        server.db.session.add(server.FeedingRecord(device_id=device_id, day_of_week=1, hour=8, minute=30,
+                                                   feeding_amount=5, created_at=datetime(2022, 1, 1)))
+        server.db.session.commit()
+        server.db.session.remove()
+
+    store = _store('server')
+    writes = []
+    original_write = store.write
+    store.write = lambda table, rows, *args: writes.append(len(rows)) or original_write(table, rows, *args)
+    saved = (server.feeding_archive, server.app.config['RETENTION_CHUNK_PAUSE'])
+    server.feeding_archive = store
+    server.app.config['RETENTION_CHUNK_PAUSE'] = 0
+    try:
+        cutoff = datetime(2021, 1, 1)
+        assert server.archive_table('feeding_records', cutoff, dry_run=True) >= 10
+        archived = server.archive_table('feeding_records', cutoff, chunk_size=4)
+        assert archived >= 10 and all(n <= 4 for n in writes) and len(writes) >= 3
+        assert server.archive_table('feeding_records', cutoff, chunk_size=4) == 0
+    finally:
+        server.feeding_archive, server.app.config['RETENTION_CHUNK_PAUSE'] = saved
+    with server.app.app_context():
+        remaining = server.FeedingRecord.query.filter_by(device_id=device_id).all()
+        assert [r.created_at for r in remaining] == [datetime(2022, 1, 1)]
+        server.db.session.remove()
+    rows = list(store.read('feeding_records', device_id, 'created_at'))
+    assert len(rows) == 10 and rows[0]['created_at'] == BASE
+
+
+def main():
+    tests = [test_write_partitions_and_read_range, test_repeated_archive_deduplicated,
+             test_device_dirs_do_not_collide, test_legacy_directory_filtered_by_device, test_archive_table_in_chunks]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单进程ASGI模式（asgi_bridge.py 与命令路由）测试
+
+直接驱动 ASGI 的 http/websocket 调用，不需要安装 ASGI 服务器；不执行 lifespan，
+不启动后台任务。使用临时 SQLite 数据库，可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+_tmp_dir = tempfile.TemporaryDirectory(prefix='pet_feeder_test_')
+# 环境变量必须在导入服务器模块之前设置
+os.environ.setdefault('PET_FEEDER_DATABASE_URI', f"sqlite:///{os.path.join(_tmp_dir.name, 'test.db')}")
+os.environ.setdefault('PET_FEEDER_LOG_LEVEL', 'WARNING')
+os.environ.setdefault('PET_FEEDER_LOG_FILE', '')
+
+import pet_feeder_server as server  # noqa: E402
+from asgi_bridge import wsgi_environ  # noqa: E402
+
+server.create_tables()
+asgi_app = server.create_asgi_app()
+
+
+def _add_device(device_id):
+    with server.app.app_context():
+        server.db.session.add(server.Device(device_id=device_id, password='x'))
+        server.db.session.commit()
+
+
+def _session_cookie(**values):
+    signer = server.app.session_interface.get_signing_serializer(server.app)
+    return f"{server.app.config['SESSION_COOKIE_NAME']}={signer.dumps(values)}".encode('latin-1')
+
+
+async def _http(method, path, payload=None, cookie=None):
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    incoming = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    out = []
+
+    async def receive():
+        return incoming.pop(0) if incoming else {'type': 'http.disconnect'}
+
+    async def send(message):
+        out.append(message)
+
+    headers = [(b'content-type', b'application/json'), (b'host', b'feeder.local')]
+    if cookie:
+        headers.append((b'cookie', cookie))
+    await asgi_app({'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'root_path': '',
+                    'headers': headers, 'server': ('127.0.0.1', 80), 'client': ('127.0.0.1', 5555),
+                    'http_version': '1.1', 'scheme': 'http'}, receive, send)
+    return out[0]['status'], json.loads(out[1]['body']) if out[1]['body'] else None
+
+
+class AsgiSocket(object):
+    """在 ASGI 应用上打开一个 WebSocket 连接"""
+
+    def __init__(self, path):
+        self.incoming = asyncio.Queue()
+        self.sent = asyncio.Queue()
+        self.incoming.put_nowait({'type': 'websocket.connect'})
+        scope = {'type': 'websocket', 'path': path, 'headers': [], 'client': ('10.0.0.9', 1234), 'query_string': b''}
+        self.task = asyncio.ensure_future(asgi_app(scope, self.incoming.get, self.sent.put))
+
+    async def next_message(self, timeout=2):
+        return await asyncio.wait_for(self.sent.get(), timeout)
+
+    async def send_json(self, msg):
+        await self.incoming.put({'type': 'websocket.receive', 'text': json.dumps(msg)})
+
+    async def close(self):
+        await self.incoming.put({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.wait_for(self.task, 2)
+
+
+async def _connect_device(device_id):
+    ws = AsgiSocket('/ws')
+    assert (await ws.next_message())['type'] == 'websocket.accept'
+    await ws.send_json({'type': 'register', 'device_id': device_id})
+    await ws.next_message()
+    return ws
+
+
+def _run_on_loop(coro_fn):
+    """把本测试的事件循环当作 ws_loop（相当于 lifespan 启动后的状态），结束后恢复"""
+    async def run():
+        saved = server.ws_loop
+        server.ws_loop = asyncio.get_running_loop()
+        try:
+            return await coro_fn()
+        finally:
+            server.ws_loop = saved
+    return asyncio.run(run())
+
+
+def test_websocket_only_on_ws_path():
+    """只有 /ws 上的WebSocket连接被接受，其他路径握手前关闭"""
+    async def run():
+        rejected = AsgiSocket('/')
+        assert await rejected.next_message() == {'type': 'websocket.close', 'code': 1008}
+        await asyncio.wait_for(rejected.task, 2)
+        rejected = AsgiSocket('/api/devices')
+        assert (await rejected.next_message())['type'] == 'websocket.close'
+        ws = await _connect_device('ASGI-P1')
+        assert 'ASGI-P1' in server.connected_devices
+        await ws.close()
+        assert 'ASGI-P1' not in server.connected_devices
+    _run_on_loop(run)
+
+
+def test_command_route_sends_on_loop():
+    """下发指令的路由在事件循环中直接发送，不经 run_coroutine_threadsafe"""
+    _add_device('ASGI-C1')
+
+    def no_thread_hop(*args, **kwargs):
+        raise AssertionError("命令路由不应从线程提交到事件循环")
+
+    async def run():
+        ws = await _connect_device('ASGI-C1')
+        saved = server.asyncio.run_coroutine_threadsafe
+        server.asyncio.run_coroutine_threadsafe = no_thread_hop
+        try:
+            status, body = await _http('POST', '/manual_feeding', {
+                'device_id': 'ASGI-C1', 'hour': 8, 'minute': 30, 'feeding_amount': 12.5})
+        finally:
+            server.asyncio.run_coroutine_threadsafe = saved
+        assert status == 200 and body['message'] == 'Manual feeding added'
+        frame = await ws.next_message()
+        assert json.loads(frame['text'])['feeding_amount'] == 12.5
+        await ws.close()
+        return body['outbox_id']
+
+    outbox_id = _run_on_loop(run)
+    with server.app.app_context():
+        assert server.db.session.get(server.DeviceCommand, outbox_id).device_id == 'ASGI-C1'
+
+
+def test_command_route_offline_and_errors():
+    """设备离线时指令留在发件箱（202）；校验失败和权限检查在线程中的视图返回，不下发"""
+    _add_device('ASGI-C2')
+
+    async def run():
+        status, body = await _http('POST', '/ota_update', {'url': 'http://fw/1.bin'},
+                                   cookie=_session_cookie(device_id='ASGI-C2'))
+        assert status == 202 and body['outbox_id']
+        assert (await _http('POST', '/ota_update', {'url': 'http://fw/1.bin'}))[0] == 401
+        assert (await _http('POST', '/add_feeding_plan', {'device_id': 'ASGI-C2'}))[0] == 400
+        assert (await _http('POST', '/manual_feeding', {
+            'device_id': 'ASGI-NONE', 'hour': 1, 'minute': 2, 'feeding_amount': 3}))[0] == 404
+        status, body = await _http('POST', '/api/devices/ASGI-C2/rollback', {'target_version': 'v1.0.0'},
+                                   cookie=_session_cookie(admin_user='admin'))
+        assert status == 400 and body['error'] == '设备未在线'
+
+    _run_on_loop(run)
+
+
+def test_other_routes_use_wsgi():
+    """其他路由仍由线程池中的 Flask 处理"""
+    assert server.asgi_command_route(wsgi_environ(
+        {'method': 'GET', 'path': '/healthz', 'headers': []}, b'')) is None
+    assert asyncio.run(_http('GET', '/healthz'))[0] == 200
+
+
+def test_command_route_under_wsgi():
+    """WSGI 部署下同一路由在请求线程中下发，响应不变"""
+    _add_device('ASGI-C3')
+    client = server.app.test_client()
+    response = client.post('/manual_feeding', json={'device_id': 'ASGI-C3', 'hour': 9, 'minute': 15, 'feeding_amount': 5})
+    assert response.status_code == 200 and response.get_json()['outbox_id']
+    with client.session_transaction() as sess:
+        sess['device_id'] = 'ASGI-C3'
+    assert client.post('/ota_update', json={'url': 'http://fw/2.bin'}).status_code == 202
+
+
+def test_same_origin_from_config():
+    """同源连接由配置决定：asgi.py 在导入服务器模块前默认开启，服务器模块本身默认关闭"""
+    assert server.app.config['WS_SAME_ORIGIN'] is False
+    env = dict(os.environ, PET_FEEDER_DATABASE_URI=f"sqlite:///{os.path.join(_tmp_dir.name, 'sub.db')}")
+    env.pop('PET_FEEDER_WS_SAME_ORIGIN', None)
+    output = subprocess.check_output(
+        [sys.executable, '-c', "import asgi, pet_feeder_server as s; print(s.app.config['WS_SAME_ORIGIN'])"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    assert output.decode().strip().splitlines()[-1] == 'True'
+
+
+def main():
+    tests = [test_websocket_only_on_ws_path, test_command_route_sends_on_loop, test_command_route_offline_and_errors,
+             test_other_routes_use_wsgi, test_command_route_under_wsgi, test_same_origin_from_config]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备信息读缓存（device_cache.py）测试
+
+loader 用字典模拟设备表，事务结束后的失效使用内存 SQLite 的 session，
+可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from device_cache import DeviceCache
+
+
+class FakeTable(object):
+    """记录加载次数的设备表"""
+
+    def __init__(self, **devices):
+        self.devices = dict(devices)
+        self.loads = []
+
+    def load(self, device_id):
+        self.loads.append(device_id)
+        return self.devices.get(device_id)
+
+
+def test_not_found_not_cached():
+    """设备不存在的结果不缓存，其他进程注册后立即可见"""
+    table = FakeTable()
+    cache = DeviceCache(table.load, ttl=60)
+    assert cache.get('DC-NEW') is None
+    assert not cache.exists('DC-NEW')
+    table.devices['DC-NEW'] = {'device_id': 'DC-NEW'}
+    assert cache.exists('DC-NEW')
+    assert cache.get('DC-NEW') == {'device_id': 'DC-NEW'}
+    assert table.loads == ['DC-NEW'] * 3
+    assert cache.stats()['size'] == 1
+
+
+def test_ttl_and_lru():
+    """命中时不查库，过期后重新加载；超过容量淘汰最久未使用的设备"""
+    table = FakeTable(a=1, b=2, c=3)
+    cache = DeviceCache(table.load, max_size=2, ttl=0.2)
+    assert cache.get('a') == 1 and cache.get('b') == 2
+    assert cache.get('a') == 1                 # a 变为最近使用
+    cache.get('c')                             # 淘汰 b
+    assert table.loads == ['a', 'b', 'c']
+    cache.get('b')
+    assert table.loads[-1] == 'b'
+    time.sleep(0.25)
+    cache.get('c')
+    stats = cache.stats()
+    assert table.loads[-1] == 'c' and stats['expired'] == 1 and stats['evictions'] == 2
+
+
+def test_invalidate_during_load():
+    """加载期间发生的失效使这次结果不写入缓存"""
+    cache = None
+    table = FakeTable(a='old')
+
+    def load(device_id):
+        value = table.load(device_id)
+        cache.invalidate(device_id)
+        table.devices[device_id] = 'new'
+        return value
+
+    cache = DeviceCache(load)
+    assert cache.get('a') == 'old'
+    cache._loader = table.load
+    assert cache.get('a') == 'new'
+
+
+def test_mark_invalidates_after_transaction():
+    """mark 登记的设备在事务提交或回滚后才失效"""
+    table = FakeTable(a=1)
+    cache = DeviceCache(table.load)
+    session = Session(create_engine('sqlite://'))
+    cache.bind(session)
+    cache.get('a')
+    session.connection()                       # 开始事务
+    cache.mark(session, 'a')
+    table.devices['a'] = 2
+    assert cache.get('a') == 1                 # 未提交前仍是旧快照
+    session.commit()
+    assert cache.get('a') == 2
+    session.connection()
+    cache.mark(session, 'a')
+    session.rollback()
+    assert cache.stats()['invalidations'] == 2
+
+
+def main():
+    tests = [test_not_found_not_cached, test_ttl_and_lru, test_invalidate_during_load,
+             test_mark_invalidates_after_transaction]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
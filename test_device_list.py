@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备列表页面与接口（/devices、/admin/devices、/admin、/api/devices）测试
+
+使用临时 SQLite 数据库，不需要运行服务器，可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+import os
+import re
+import tempfile
+from datetime import datetime, timedelta
+
+_tmp_dir = tempfile.TemporaryDirectory(prefix='pet_feeder_test_')
+# 环境变量必须在导入服务器模块之前设置
+os.environ.setdefault('PET_FEEDER_DATABASE_URI', f"sqlite:///{os.path.join(_tmp_dir.name, 'test.db')}")
+os.environ.setdefault('PET_FEEDER_LOG_LEVEL', 'WARNING')
+os.environ.setdefault('PET_FEEDER_LOG_FILE', '')
+
+import pet_feeder_server as server  # noqa: E402
+
+server.create_tables()
+
+
+def _seed():
+    now = datetime.utcnow()
+    with server.app.app_context():
+        session = server.db.session
+        session.query(server.Device).filter(server.Device.device_id.like('LIST-%')).delete(synchronize_session=False)
+        session.add_all([
+            # is_online 由连接状态维护，与最近心跳时间不一定一致
+            server.Device(device_id='LIST-1', password='x', firmware_version='list-1.0', is_online=True,
+                          last_seen=now - timedelta(hours=2)),
+            server.Device(device_id='LIST-2', password='x', firmware_version='list-1.0', is_online=False,
+                          last_seen=now - timedelta(seconds=10)),
+            server.Device(device_id='LIST-3', password='x', firmware_version='list-2.0', is_online=True,
+                          last_seen=now - timedelta(hours=3)),
+        ])
+        session.commit()
+
+
+_seed()
+
+
+def _admin_client():
+    client = server.app.test_client()
+    with client.session_transaction() as sess:
+        sess['admin_user'] = 'admin'
+    return client
+
+
+def _stat_numbers(html):
+    return [int(n) for n in re.findall(r'class="stat-number">.*?(\d+)\s*</div>', html)]
+
+
+def test_devices_page_renders():
+    """/devices 渲染 devices.html，按游标翻页"""
+    client = server.app.test_client()
+    response = client.get('/devices?limit=2&firmware_version=list-1.0')
+    assert response.status_code == 200
+    html = response.get_data(as_text=True)
+    assert 'LIST-1' in html and 'LIST-2' in html and 'LIST-3' not in html
+    response = client.get('/devices?limit=1&firmware_version=list-1.0')
+    html = response.get_data(as_text=True)
+    assert 'LIST-1' in html and 'LIST-2' not in html
+    next_url = re.search(r'href="([^"]*cursor=[^"]*)"', html).group(1).replace('&amp;', '&')
+    assert 'firmware_version=list-1.0' in next_url and 'limit=1' in next_url
+    html = client.get(next_url).get_data(as_text=True)
+    assert 'LIST-2' in html and 'LIST-1' not in html
+    assert client.get('/devices?online=maybe').status_code == 400
+
+
+def test_online_count_matches_dashboard():
+    """设备管理页与仪表板的在线数都按 is_online 统计"""
+    client = _admin_client()
+    with server.app.app_context():
+        total = server.Device.query.count()
+        online = server.Device.query.filter_by(is_online=True).count()
+    dashboard = _stat_numbers(client.get('/admin').get_data(as_text=True))
+    devices_page = _stat_numbers(client.get('/admin/devices').get_data(as_text=True))
+    assert dashboard[:2] == [total, online]
+    assert devices_page[:3] == [total, online, total - online]
+
+
+def test_api_total_is_unfiltered():
+    """/api/devices 的 total_devices 是全部设备数，过滤只影响返回的设备"""
+    client = server.app.test_client()
+    with server.app.app_context():
+        total = server.Device.query.count()
+    data = client.get('/api/devices?firmware_version=list-2.0').get_json()
+    assert data['total_devices'] == total
+    assert [d['device_id'] for d in data['devices']] == ['LIST-3']
+    assert client.get('/api/devices').get_json()['total_devices'] == total
+
+
+def main():
+    tests = [test_devices_page_renders, test_online_count_matches_dashboard, test_api_total_is_unfiltered]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备数据版本号与轮询接口 ETag/304（device_revision.py 与 revision_etag_for）测试
+
+检查 ORM 改动、批量语句（mark）、无改动的确认/同步和回滚对版本号的影响，
+以及带 If-None-Match 的轮询返回 304。使用临时 SQLite 数据库，
+可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+import os
+import tempfile
+
+_tmp_dir = tempfile.TemporaryDirectory(prefix='pet_feeder_test_')
+# 环境变量必须在导入服务器模块之前设置
+os.environ.setdefault('PET_FEEDER_DATABASE_URI', f"sqlite:///{os.path.join(_tmp_dir.name, 'test.db')}")
+os.environ.setdefault('PET_FEEDER_LOG_LEVEL', 'WARNING')
+os.environ.setdefault('PET_FEEDER_LOG_FILE', '')
+
+import pet_feeder_server as server  # noqa: E402
+from device_revision import etag  # noqa: E402
+
+server.create_tables()
+
+PLAN = {'day_of_week': 2, 'hour': 9, 'minute': 9, 'feeding_amount': 5}
+
+
+def _add_device(device_id):
+    with server.app.app_context():
+        server.db.session.add(server.Device(device_id=device_id, password='x'))
+        server.db.session.commit()
+        server.db.session.remove()
+
+
+def _apply(fn, *args):
+    """按写线程的方式在一个事务中执行写入函数并提交"""
+    with server.app.app_context():
+        try:
+            fn(server.db.session, *args)
+            server.db.session.commit()
+        finally:
+            server.db.session.remove()
+
+
+def _manual_url(device_id):
+    return f'/api/manual_feedings?device_id={device_id}'
+
+
+def _status(client, url, tag):
+    return client.get(url, headers={'If-None-Match': tag}).status_code
+
+
+def test_etag_and_not_modified():
+    """首次轮询带 ETag 和 no-cache；If-None-Match 相同返回空的 304，其他设备不受影响"""
+    device_id = 'REV-1'
+    _add_device(device_id)
+    client = server.app.test_client()
+    response = client.get(_manual_url(device_id))
+    assert response.status_code == 200 and response.headers['ETag'] == f'"{device_id}.0"'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    cached = client.get(_manual_url(device_id), headers={'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304 and cached.data == b''
+    assert cached.headers['ETag'] == response.headers['ETag']
+    assert client.get(_manual_url('')).status_code == 400
+
+    with server.app.app_context():
+        server.db.session.add(server.ManualFeeding(device_id=device_id, hour=7, minute=11, feeding_amount=3.5))
+        server.db.session.commit()
+        server.db.session.remove()
+    changed = client.get(_manual_url(device_id), headers={'If-None-Match': response.headers['ETag']})
+    assert changed.status_code == 200 and changed.headers['ETag'] == f'"{device_id}.1"'
+    assert len(changed.get_json()['manual_feedings']) == 1
+    assert client.get(_manual_url('REV-OTHER')).headers['ETag'] == '"REV-OTHER.0"'
+
+
+def test_confirm_bumps_only_when_changed():
+    """设备确认手动喂食改动了行才加一；找不到待确认记录时版本号不变"""
+    device_id = 'REV-2'
+    _add_device(device_id)
+    client = server.app.test_client()
+    with server.app.app_context():
+        server.db.session.add(server.ManualFeeding(device_id=device_id, hour=8, minute=0, feeding_amount=4.0))
+        server.db.session.commit()
+        server.db.session.remove()
+    tag = client.get(_manual_url(device_id)).headers['ETag']
+    message = {'device_id': device_id, 'hour': 8, 'minute': 0, 'feeding_amount': 4.0}
+    _apply(server._apply_confirm_manual_feeding, message)
+    assert _status(client, _manual_url(device_id), tag) == 200
+    tag = client.get(_manual_url(device_id)).headers['ETag']
+    _apply(server._apply_confirm_manual_feeding, message)
+    assert _status(client, _manual_url(device_id), tag) == 304
+
+
+def test_sync_marks_plan_endpoints():
+    """同步核对用批量语句写入计划，两个计划轮询接口都失效；内容相同的再次同步不加一"""
+    device_id = 'REV-3'
+    _add_device(device_id)
+    client = server.app.test_client()
+    urls = [f'/api/feeding_plans/{device_id}', f'/get_feeding_plans?device_id={device_id}']
+    tags = [client.get(url).headers['ETag'] for url in urls]
+    _apply(server._apply_sync_result, device_id, {'feeding_plans': [PLAN]})
+    assert [_status(client, url, tag) for url, tag in zip(urls, tags)] == [200, 200]
+    tags = [client.get(url).headers['ETag'] for url in urls]
+    _apply(server._apply_sync_result, device_id, {'feeding_plans': [PLAN]})
+    assert [_status(client, url, tag) for url, tag in zip(urls, tags)] == [304, 304]
+
+
+def test_rollback_discards_bump():
+    """事务回滚时版本号随数据一起回滚，登记的设备也被清掉"""
+    device_id = 'REV-4'
+    _add_device(device_id)
+    with server.app.app_context():
+        session = server.db.session
+        session.add(server.FeedingPlan(device_id=device_id, day_of_week=1, hour=6, minute=0, feeding_amount=5))
+        session.flush()
+        server.device_revisions.mark(session, device_id)
+        session.rollback()
+        assert 'device_revision_ids' not in session.info
+        session.remove()
+        assert server.device_revision_etag(device_id) == f'{device_id}.0'
+
+
+def test_etag_escapes_device_id():
+    """设备ID中不能出现在 ETag 里的字符替换为下划线"""
+    assert etag('ESP-001', 3) == 'ESP-001.3'
+    assert etag('a"b c', 0) == 'a_b_c.0'
+
+
+def main():
+    tests = [test_etag_and_not_modified, test_confirm_bumps_only_when_changed, test_sync_marks_plan_endpoints,
+             test_rollback_discards_bump, test_etag_escapes_device_id]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+喂食记录接口（/api/feeding_records）与喂食日汇总测试
+
+检查按周期返回的明细不被截断、limit 参数、日汇总与原始记录一致，
+以及 db_copy.py 复制没有汇总表的旧数据库时重建汇总。
+使用临时 SQLite 数据库，可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, select
+
+_tmp_dir = tempfile.TemporaryDirectory(prefix='pet_feeder_test_')
+# 环境变量必须在导入服务器模块之前设置
+os.environ.setdefault('PET_FEEDER_DATABASE_URI', f"sqlite:///{os.path.join(_tmp_dir.name, 'test.db')}")
+os.environ.setdefault('PET_FEEDER_LOG_LEVEL', 'WARNING')
+os.environ.setdefault('PET_FEEDER_LOG_FILE', '')
+
+import pet_feeder_server as server  # noqa: E402
+
+server.create_tables()
+
+DEVICE_ID = 'REC-1'
+PLAN_COUNT = 150          # 多于以前默认截断的 100 条
+MANUAL_COUNT = 3
+
+
+def _seed():
+    """经写入路径保存记录，汇总随记录一起累加"""
+    now = datetime.utcnow()
+    with server.app.app_context():
+        session = server.db.session
+        session.add(server.Device(device_id=DEVICE_ID, password='x'))
+        session.commit()
+        for i in range(PLAN_COUNT):
+            at = now - timedelta(days=5) + timedelta(minutes=45 * i)
+            server._apply_feeding_record(session, {
+                'device_id': DEVICE_ID, 'day_of_week': at.weekday(), 'hour': at.hour, 'minute': at.minute,
+                'feeding_amount': 10 + i % 7, 'timestamp': (at - datetime(1970, 1, 1)).total_seconds()})
+        for i in range(MANUAL_COUNT):
+            at = now - timedelta(days=i + 1, hours=1)
+            minute = at.minute % 59 + 1
+            session.add(server.ManualFeeding(device_id=DEVICE_ID, hour=at.hour, minute=minute,
+                                             feeding_amount=5.5 + i, created_at=at))
+            session.flush()
+            server._apply_manual_feeding_executed(session, {
+                'device_id': DEVICE_ID, 'hour': at.hour, 'minute': minute, 'feeding_amount': 5.5 + i,
+                'timestamp': (at - datetime(1970, 1, 1)).total_seconds()})
+        session.commit()
+
+
+_seed()
+
+
+def _daily_rows():
+    with server.app.app_context():
+        rows = server.FeedingDailyRollup.query.filter_by(device_id=DEVICE_ID).order_by(server.FeedingDailyRollup.day)
+        return [row.to_dict() for row in rows]
+
+
+def test_period_returns_all_records():
+    """week/month/halfyear 返回周期内全部明细，daily 与明细按天合计一致"""
+    client = server.app.test_client()
+    for period in ('week', 'month', 'halfyear'):
+        data = client.get(f'/api/feeding_records/{DEVICE_ID}?period={period}').get_json()
+        assert len(data['records']) == PLAN_COUNT + MANUAL_COUNT
+        assert [r['created_at'] for r in data['records']] == sorted(r['created_at'] for r in data['records'])
+    totals = {}
+    for record in data['records']:
+        day = server.rollup_day(datetime.strptime(record['created_at'], '%Y-%m-%d %H:%M:%S')).strftime('%Y-%m-%d')
+        count, grams = totals.get(day, (0, 0.0))
+        totals[day] = (count + 1, grams + record['actual_amount'])
+    assert {d['date']: (d['feed_count'], d['actual_grams']) for d in data['daily']} == \
+        {day: (count, round(grams, 2)) for day, (count, grams) in totals.items()}
+    assert sum(d['manual_count'] for d in data['daily']) == MANUAL_COUNT
+
+
+def test_explicit_limit():
+    """limit 只返回最近的 limit 条明细，不影响 daily；非整数返回 400"""
+    client = server.app.test_client()
+    full = client.get(f'/api/feeding_records/{DEVICE_ID}?period=month').get_json()
+    data = client.get(f'/api/feeding_records/{DEVICE_ID}?period=month&limit=10').get_json()
+    assert data['records'] == full['records'][-10:]
+    assert data['daily'] == full['daily']
+    assert len(client.get(f'/api/feeding_records/{DEVICE_ID}?limit=2').get_json()['records']) == 2
+    assert client.get(f'/api/feeding_records/{DEVICE_ID}?period=week&limit=abc').status_code == 400
+
+
+def test_rebuild_matches_incremental():
+    """从原始记录重建的汇总与写入时累加的汇总一致"""
+    incremental = _daily_rows()
+    assert sum(d['feed_count'] for d in incremental) == PLAN_COUNT + MANUAL_COUNT
+    with server.app.app_context():
+        with server.db.engine.begin() as connection:
+            assert server._rebuild_feeding_rollup(connection, DEVICE_ID) == len(incremental)
+    assert _daily_rows() == incremental
+
+
+def test_db_copy_rebuilds_rollup():
+    """源库没有汇总表时，db_copy 按复制过来的记录重建汇总"""
+    source_path = os.path.join(_tmp_dir.name, 'old.db')
+    target_path = os.path.join(_tmp_dir.name, 'copy.db')
+    # 旧数据库：没有 feeding_daily_rollup 表
+    old_tables = [server.Device.__table__, server.FeedingRecord.__table__, server.ManualFeeding.__table__]
+    source = create_engine(f'sqlite:///{source_path}')
+    server.db.metadata.create_all(source, tables=old_tables)
+    with server.app.app_context():
+        with server.db.engine.connect() as src, source.begin() as dst:
+            for table in old_tables:
+                rows = [dict(row._mapping) for row in src.execute(
+                    select(table).where(table.c.device_id == DEVICE_ID))]
+                dst.execute(table.insert(), rows)
+    source.dispose()
+
+    env = dict(os.environ, PET_FEEDER_LOG_FILE='')
+    subprocess.check_output(
+        [sys.executable, 'db_copy.py', '--source', f'sqlite:///{source_path}', '--target', f'sqlite:///{target_path}'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+
+    with sqlite3.connect(target_path) as connection:
+        copied = connection.execute(
+            "SELECT day, feed_count, plan_count, manual_count, actual_grams FROM feeding_daily_rollup "
+            "WHERE device_id = ? ORDER BY day", (DEVICE_ID,)).fetchall()
+    expected = [(d['date'], d['feed_count'], d['plan_count'], d['manual_count'], d['actual_grams'])
+                for d in _daily_rows()]
+    assert [(day, *counts, round(grams, 2)) for day, *counts, grams in copied] == expected
+
+
+def main():
+    tests = [test_period_returns_all_records, test_explicit_limit, test_rebuild_matches_incremental,
+             test_db_copy_rebuilds_rollup]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量补传喂食记录（/add_feeding_records 与 feeding_records_batch 消息）测试
+
+检查批内和与已有记录的去重、不合法记录的逐条结果、重复补传不重复入库，
+以及日汇总只累加新写入的记录。使用临时 SQLite 数据库，
+可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+
+_tmp_dir = tempfile.TemporaryDirectory(prefix='pet_feeder_test_')
+# 环境变量必须在导入服务器模块之前设置
+os.environ.setdefault('PET_FEEDER_DATABASE_URI', f"sqlite:///{os.path.join(_tmp_dir.name, 'test.db')}")
+os.environ.setdefault('PET_FEEDER_LOG_LEVEL', 'WARNING')
+os.environ.setdefault('PET_FEEDER_LOG_FILE', '')
+
+import pet_feeder_server as server  # noqa: E402
+
+server.create_tables()
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _add_device(device_id):
+    with server.app.app_context():
+        server.db.session.add(server.Device(device_id=device_id, password='x'))
+        server.db.session.commit()
+        server.db.session.remove()
+
+
+def _record(at, amount=10.0, **extra):
+    return dict({'day_of_week': at.isoweekday(), 'hour': at.hour, 'minute': at.minute,
+                 'feeding_amount': amount, 'timestamp': (at - EPOCH).total_seconds()}, **extra)
+
+
+def _stored(device_id):
+    with server.app.app_context():
+        records = server.FeedingRecord.query.filter_by(device_id=device_id).all()
+        rollup = server.FeedingDailyRollup.query.filter_by(device_id=device_id).all()
+        result = (sorted((r.created_at, r.feeding_amount) for r in records),
+                  sum(r.feed_count for r in rollup), sum(r.actual_grams for r in rollup))
+        server.db.session.remove()
+    return result
+
+
+def test_http_batch_dedupe_and_results():
+    """批内重复和库中已有的记录都记为 duplicate，不合法的记为 rejected，其余一次写入"""
+    device_id = 'BATCH-HTTP'
+    _add_device(device_id)
+    base = datetime.utcnow().replace(microsecond=0) - timedelta(days=1)
+    client = server.app.test_client()
+    first = client.post('/add_feeding_records', json={'device_id': device_id, 'records': [_record(base)]})
+    assert first.status_code == 200 and first.get_json()['accepted'] == 1
+
+    records = [
+        _record(base),                                        # 库中已有
+        _record(base + timedelta(minutes=30)),
+        _record(base + timedelta(minutes=30)),                # 批内重复
+        _record(base + timedelta(minutes=30), amount=12.0),   # 同一时间不同分量，不算重复
+        _record(base + timedelta(hours=2), hour=25),
+        'not a record',
+        _record(base + timedelta(hours=3, microseconds=250000)),
+    ]
+    data = client.post('/add_feeding_records', json={'device_id': device_id, 'records': records}).get_json()
+    assert (data['accepted'], data['duplicates'], data['rejected']) == (3, 2, 2)
+    assert [r['status'] for r in data['results']] == ['duplicate', 'accepted', 'duplicate', 'accepted',
+                                                       'rejected', 'rejected', 'accepted']
+    assert data['results'][4]['error'].startswith('hour')
+
+    # 设备没收到应答而整批重传：全部重复，不再写入
+    again = client.post('/add_feeding_records', json={'device_id': device_id, 'records': records}).get_json()
+    assert (again['accepted'], again['duplicates'], again['rejected']) == (0, 5, 2)
+    stored, feed_count, grams = _stored(device_id)
+    assert len(stored) == 4 and feed_count == 4 and grams == 42.0
+    assert stored[-1][0] == base + timedelta(hours=3, microseconds=250000)
+
+
+def test_http_batch_limits():
+    """未注册设备返回 404，超过每批上限返回 413"""
+    client = server.app.test_client()
+    at = datetime.utcnow() - timedelta(hours=1)
+    response = client.post('/add_feeding_records', json={'device_id': 'BATCH-NONE', 'records': [_record(at)]})
+    assert response.status_code == 404
+    too_many = [_record(at)] * (server.app.config['FEEDING_RECORDS_BATCH_MAX'] + 1)
+    response = client.post('/add_feeding_records', json={'device_id': 'BATCH-NONE', 'records': too_many})
+    assert response.status_code == 413
+    assert client.post('/add_feeding_records', json={'device_id': 'BATCH-NONE', 'records': []}).status_code == 400
+
+
+class FakeDevice(object):
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, frame):
+        self.sent.append(json.loads(frame))
+
+
+def _inline_submit(fn, *args):
+    """在当前线程执行写入并提交，代替后台写线程"""
+    future = Future()
+    with server.app.app_context():
+        try:
+            result = fn(server.db.session, *args)
+            server.db.session.commit()
+            future.set_result(result)
+        except Exception as e:
+            server.db.session.rollback()
+            future.set_exception(e)
+        finally:
+            server.db.session.remove()
+    return future
+
+
+def test_websocket_batch_replies_per_record():
+    """设备经 WebSocket 补传时回复逐条结果，重传的记录为 duplicate"""
+    device_id = 'BATCH-WS'
+    _add_device(device_id)
+    base = datetime.utcnow().replace(microsecond=0) - timedelta(hours=5)
+    records = [_record(base), _record(base + timedelta(minutes=1)), _record(base)]
+    message = {'type': 'feeding_records_batch', 'device_id': device_id, 'records': records}
+    device = FakeDevice()
+    saved = server.db_writer.submit
+    server.db_writer.submit = _inline_submit
+    try:
+        asyncio.run(server.handle_feeding_records_batch(device, message, 'test'))
+        asyncio.run(server.handle_feeding_records_batch(device, message, 'test'))
+        asyncio.run(server.handle_feeding_records_batch(device, {'type': 'feeding_records_batch',
+                                                                 'device_id': device_id}, 'test'))
+    finally:
+        server.db_writer.submit = saved
+    first, second, missing = device.sent
+    assert first['type'] == 'feeding_records_batch_result' and first['device_id'] == device_id
+    assert [r['status'] for r in first['results']] == ['accepted', 'accepted', 'duplicate']
+    assert second['duplicates'] == 3 and second['accepted'] == 0
+    assert missing['error'] == 'Missing required fields'
+    assert len(_stored(device_id)[0]) == 2
+
+
+def main():
+    tests = [test_http_batch_dedupe_and_results, test_http_batch_limits, test_websocket_batch_replies_per_record]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
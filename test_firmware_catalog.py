@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+固件目录缓存（firmware_catalog.FirmwareCatalog）测试
+
+用假的 loader/answer 统计加载和计算次数，不需要数据库。
+可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+import multiprocessing
+import os
+import time
+from types import SimpleNamespace
+
+from firmware_catalog import FirmwareCatalog
+
+
+class FakeSource(object):
+    """可修改的固件列表，记录 loader 被调用的次数"""
+
+    def __init__(self, *versions):
+        self.rows = [SimpleNamespace(version_string=v, is_stable=stable) for v, stable in versions]
+        self.loads = 0
+        self.answers = 0
+
+    def load(self):
+        # 与服务器的 loader 一样，每次加载返回新的快照对象
+        self.loads += 1
+        return [SimpleNamespace(**vars(row)) for row in self.rows]
+
+    def answer(self, latest, firmware, protocol, hardware):
+        self.answers += 1
+        return {'latest': latest.version_string if latest else None, 'current': firmware}
+
+    def catalog(self, **kwargs):
+        return FirmwareCatalog(self.load, self.answer, **kwargs)
+
+
+def _invalidate_in_child(catalog):
+    catalog.invalidate()
+    os._exit(0)
+
+
+def test_answers_cached_until_invalidate():
+    """同一版本三元组只计算一次；invalidate 后重新加载并清空应答缓存"""
+    source = FakeSource(('1.3.0', False), ('1.2.0', True))
+    catalog = source.catalog()
+    assert catalog.answer('1.0.0', 1, 'v1') == {'latest': '1.2.0', 'current': '1.0.0'}
+    assert catalog.answer('1.0.0', 1, 'v1') is catalog.answer('1.0.0', 1, 'v1')
+    catalog.answer('1.1.0', 1, 'v1')
+    assert (source.loads, source.answers) == (1, 2)
+    assert catalog.stats() == {'loads': 1, 'hits': 2, 'misses': 2, 'versions': 2, 'latest': '1.2.0', 'answers': 2}
+
+    source.rows.insert(0, SimpleNamespace(version_string='1.4.0', is_stable=True))
+    assert catalog.latest().version_string == '1.2.0'     # 未 invalidate 前仍是旧目录
+    catalog.invalidate()
+    assert catalog.answer('1.0.0', 1, 'v1')['latest'] == '1.4.0'
+    assert (source.loads, source.answers) == (2, 3)
+    assert [v.version_string for v in catalog.versions()] == ['1.4.0', '1.3.0', '1.2.0']
+
+
+def test_shared_generation_between_catalogs():
+    """共享 generation 的两个目录，任一个 invalidate 都让另一个重新加载"""
+    generation = multiprocessing.Value('i', 0)
+    source = FakeSource(('1.2.0', True))
+    first, second = source.catalog(generation=generation), source.catalog(generation=generation)
+    first.latest()
+    second.latest()
+    assert source.loads == 2
+    first.invalidate()
+    assert generation.value == 1
+    second.latest()
+    second.latest()
+    first.latest()
+    assert source.loads == 4
+    assert second.stats()['loads'] == 2
+
+
+def test_invalidate_from_forked_process():
+    """fork 之前创建的 generation：子进程 invalidate 后父进程的缓存失效"""
+    if not hasattr(os, 'fork'):
+        return
+    ctx = multiprocessing.get_context('fork')
+    generation = ctx.Value('i', 0)
+    source = FakeSource(('1.2.0', True))
+    catalog = source.catalog(generation=generation)
+    catalog.answer('1.0.0', 1, 'v1')
+    child = ctx.Process(target=_invalidate_in_child, args=(catalog,))
+    child.start()
+    child.join(10)
+    assert child.exitcode == 0 and generation.value == 1
+    catalog.answer('1.0.0', 1, 'v1')
+    assert (source.loads, source.answers) == (2, 2)
+
+
+def test_max_age_reload_without_invalidate():
+    """不共享 generation 的进程改了数据，超过 max_age 后自动重新加载"""
+    source = FakeSource(('1.2.0', True))
+    catalog = source.catalog(max_age=0.05)
+    catalog.latest()
+    catalog.latest()
+    assert source.loads == 1
+    time.sleep(0.06)
+    catalog.latest()
+    assert source.loads == 2
+
+
+def test_answer_computed_against_stale_catalog_not_cached():
+    """计算应答期间目录被重新加载，旧目录的结果只返回不缓存"""
+    source = FakeSource(('1.2.0', True))
+    catalog = source.catalog()
+    original_answer = source.answer
+
+    def answer_then_invalidate(latest, *args):
+        result = original_answer(latest, *args)
+        catalog.invalidate()
+        catalog.latest()
+        return result
+    catalog._answer = answer_then_invalidate
+    assert catalog.answer('1.0.0', 1, 'v1')['latest'] == '1.2.0'
+    assert catalog.stats()['answers'] == 0
+
+
+def main():
+    tests = [test_answers_cached_until_invalidate, test_shared_generation_between_catalogs,
+             test_invalidate_from_forked_process, test_max_age_reload_without_invalidate,
+             test_answer_computed_against_stale_catalog_not_cached]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+粮桶重量时间序列（grain_series.py）测试
+
+序列文件写在临时目录中，读数时间由测试给定，可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+import os
+import tempfile
+
+from grain_series import RECORD, GrainSeries
+
+_tmp_dir = tempfile.TemporaryDirectory(prefix='pet_feeder_test_')
+
+BUCKET = 300
+T0 = 1699999200                     # 对齐到整点，step 合并的边界与时间段一致
+
+
+def _series(name, **kwargs):
+    return GrainSeries(os.path.join(_tmp_dir.name, name), bucket_seconds=BUCKET, **kwargs)
+
+
+def test_bucket_aggregation_and_flush():
+    """同一时间段的读数聚合为一个点；时间段结束后落盘，当前时间段在内存中也能查到"""
+    series = _series('agg')
+    for ts, grams in ((T0 + 10, 500), (T0 + 20, 490), (T0 + 200, 480), (T0 + BUCKET + 5, 470)):
+        series.append('GS-1', grams, ts=ts)
+    series.append('GS-1', 999, ts=T0 + 1)         # 早于当前时间段，只进环形缓冲
+    assert series.stats()['out_of_order'] == 1
+    assert series.flush(now=T0 + BUCKET + 6) == 1
+    assert os.path.getsize(series._path('GS-1')) == RECORD.size
+    points = series.query('GS-1')
+    assert points == [
+        {'ts': T0, 'mean': 490.0, 'min': 480.0, 'max': 500.0, 'last': 480.0, 'count': 3},
+        {'ts': T0 + BUCKET, 'mean': 470.0, 'min': 470.0, 'max': 470.0, 'last': 470.0, 'count': 1},
+    ]
+    assert series.recent('GS-1')[-1] == (T0 + 1, 999.0)
+    # 超过两个时间段没有新读数，当前聚合也随 flush 落盘
+    assert series.flush(now=T0 + 3 * BUCKET) == 1
+    assert series.query('GS-1') == points
+
+
+def test_binary_search_range():
+    """按时间范围查询在文件中二分定位，结果与逐条过滤一致"""
+    series = _series('search')
+    for i in range(1000):
+        series.append('GS-2', 1000 - i * 0.5, ts=T0 + i * BUCKET + 7)
+    series.flush(now=T0 + 2000 * BUCKET)
+    all_points = series.query('GS-2')
+    assert len(all_points) == 1000
+    for since, until in ((None, None), (T0, None), (T0 + 1, None), (T0 + 500 * BUCKET, T0 + 510 * BUCKET),
+                         (T0 + 500 * BUCKET + 150, None), (T0 - 10 ** 6, T0 + BUCKET),
+                         (T0 + 999 * BUCKET, None), (T0 + 1000 * BUCKET, None)):
+        expected = [p for p in all_points
+                    if (since is None or p['ts'] + BUCKET > since) and (until is None or p['ts'] < until)]
+        assert series.query('GS-2', since, until) == expected, (since, until)
+
+
+def test_step_merges_points():
+    """step 把多个时间段合并为一个点，均值按读数个数加权"""
+    series = _series('step')
+    series.append('GS-3', 100, ts=T0)
+    series.append('GS-3', 100, ts=T0 + 1)
+    series.append('GS-3', 40, ts=T0 + BUCKET)
+    series.append('GS-3', 10, ts=T0 + 4 * BUCKET)
+    series.flush(now=T0 + 10 * BUCKET)
+    points = series.query('GS-3', step=3 * BUCKET)
+    assert [(p['ts'], p['mean'], p['min'], p['max'], p['last'], p['count']) for p in points] == [
+        (T0, 80.0, 40.0, 100.0, 40.0, 3), (T0 + 3 * BUCKET, 10.0, 10.0, 10.0, 10.0, 1)]
+
+
+def test_consumption_rate():
+    """相邻点的下降累加为消耗，加粮不计入；按时间跨度折算每天消耗和剩余天数"""
+    series = _series('rate')
+    hour = 3600
+    levels = [1000, 950, 900, 1500, 1450, 1400, 1401]   # 第 3 个点后加粮，最后是 +1g 噪声
+    points = [{'ts': T0 + i * 6 * hour, 'last': level} for i, level in enumerate(levels)]
+    result = series.consumption('GS-4', points=points)
+    assert result['refills'] == 1 and result['consumed_grams'] == 199.0
+    assert result['span_days'] == 1.5 and result['grams_per_day'] == round(199 / 1.5, 2)
+    assert result['days_left'] == round(1401 / (199 / 1.5), 1)
+    empty = series.consumption('GS-4', points=points[:1])
+    assert empty['grams_per_day'] is None and empty['points'] == 1
+
+
+def test_device_files_do_not_collide():
+    """设备ID可逆编码为文件名，"a b" 与 "a_b" 写入不同文件"""
+    series = _series('collide')
+    series.append('a b', 10, ts=T0)
+    series.append('a_b', 20, ts=T0)
+    series.append('../x', 30, ts=T0)
+    series.flush(now=T0 + 10 * BUCKET)
+    assert series._path('a b') != series._path('a_b')
+    assert os.path.dirname(series._path('../x')) == series.root
+    assert series._path('ESP-001') == os.path.join(series.root, 'ESP-001.bin')
+    assert [p['last'] for p in series.query('a b')] == [10.0]
+    assert [p['last'] for p in series.query('a_b')] == [20.0]
+    assert [p['last'] for p in series.query('../x')] == [30.0]
+
+
+def main():
+    tests = [test_bucket_aggregation_and_flush, test_binary_search_range, test_step_merges_points,
+             test_consumption_rate, test_device_files_do_not_collide]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
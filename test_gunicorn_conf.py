@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+gunicorn 部署配置（gunicorn.conf.py）的钩子测试
+
+不需要安装 gunicorn：直接加载配置文件，用假的 server/worker 调用 when_ready、post_fork、on_exit。
+服务进程的后台任务替换为写一个标记文件。使用临时 SQLite 数据库，
+可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+import multiprocessing
+import os
+import runpy
+import tempfile
+import time
+
+_tmp_dir = tempfile.TemporaryDirectory(prefix='pet_feeder_test_')
+# 环境变量必须在导入服务器模块之前设置
+os.environ.setdefault('PET_FEEDER_DATABASE_URI', f"sqlite:///{os.path.join(_tmp_dir.name, 'test.db')}")
+os.environ.setdefault('PET_FEEDER_LOG_LEVEL', 'WARNING')
+os.environ.setdefault('PET_FEEDER_LOG_FILE', '')
+
+import pet_feeder_server as server  # noqa: E402
+
+server.create_tables()
+
+CONF = runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py'))
+
+
+class FakeLog(object):
+    def __init__(self):
+        self.messages = []
+
+    def info(self, msg, *args):
+        self.messages.append(msg % args)
+
+
+class FakeArbiter(object):
+    """gunicorn 主进程（钩子中的 server 参数）"""
+
+    def __init__(self):
+        self.log = FakeLog()
+
+
+class FakeWorker(object):
+    def __init__(self, age):
+        self.age = age
+
+
+def _wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_settings():
+    """gthread 工作进程，主进程预加载应用"""
+    assert CONF['worker_class'] == 'gthread' and CONF['preload_app'] is True
+    assert CONF['workers'] >= 1 and CONF['threads'] >= 1
+
+
+def test_when_ready_and_on_exit():
+    """when_ready fork 出服务进程并创建共享路由表，on_exit 结束服务进程"""
+    marker = os.path.join(_tmp_dir.name, 'service.pid')
+
+    def fake_background_services():
+        with open(marker, 'w') as f:
+            f.write(str(os.getpid()))
+
+    saved = (server.start_background_services, server.app.config['WS_GATEWAY_IPC_DIR'])
+    server.start_background_services = fake_background_services
+    server.app.config['WS_GATEWAY_IPC_DIR'] = os.path.join(_tmp_dir.name, 'ipc')
+    arbiter = FakeArbiter()
+    try:
+        CONF['when_ready'](arbiter)
+        process = server._service_process
+        assert _wait_for(lambda: os.path.exists(marker) and os.path.getsize(marker))
+        with open(marker) as f:
+            assert int(f.read()) == process.pid != os.getpid()
+        assert arbiter.log.messages == [f"服务进程已启动 (pid={process.pid})"]
+        assert server.ws_routes is not None and server.app.config['SERVICE_PID'] == process.pid
+        assert server._readiness_checks()['service'] == 'ok'
+        CONF['on_exit'](arbiter)
+        assert not process.is_alive() and process.exitcode == 0
+        assert server._readiness_checks()['service'].startswith('error')
+    finally:
+        server.start_background_services, server.app.config['WS_GATEWAY_IPC_DIR'] = saved
+        server.stop_service_process()
+        server.app.config.pop('SERVICE_PID', None)
+        if server._ws_gateway_manager is not None:
+            server._ws_gateway_manager.shutdown()
+        server.ws_routes = server._ws_gateway_manager = None
+
+
+def _forked_worker(log_file, result):
+    try:
+        server.app.config['LOG_FILE'] = log_file
+        CONF['post_fork'](FakeArbiter(), FakeWorker(age=3))
+        checks = {
+            'grain_series': server.grain_series._thread is not None and server.grain_series._thread.is_alive(),
+            'database': server._readiness_checks()['database'] == 'ok',
+        }
+        server.log.warning("工作进程日志")
+        checks['log_file'] = _wait_for(lambda: os.path.exists(f'{log_file}.http3') and
+                                       '工作进程日志' in open(f'{log_file}.http3', encoding='utf-8').read())
+        result.put(checks)
+    except Exception as e:
+        result.put({'error': repr(e)})
+
+
+def test_post_fork_initializes_worker():
+    """post_fork 按 worker.age 初始化 HTTP 工作进程：独立日志文件、重建数据库连接、启动粮桶曲线落盘"""
+    context = multiprocessing.get_context('fork')
+    result = context.Queue()
+    process = context.Process(target=_forked_worker, args=(os.path.join(_tmp_dir.name, 'server.log'), result))
+    process.start()
+    checks = result.get(timeout=10)
+    process.join(10)
+    assert checks == {'grain_series': True, 'database': True, 'log_file': True}
+
+
+def main():
+    tests = [test_settings, test_when_ready_and_on_exit, test_post_fork_initializes_worker]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
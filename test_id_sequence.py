@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按块分配的整数序列（id_sequence.py）测试
+
+使用临时 SQLite 数据库，不需要运行服务器，可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+import itertools
+import os
+import tempfile
+import threading
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, select
+
+from id_sequence import BlockAllocator, advance_sequence, ensure_sequence
+
+metadata = MetaData()
+sequences = Table(
+    'id_sequences', metadata,
+    Column('name', String(50), primary_key=True),
+    Column('next_value', Integer, nullable=False),
+)
+
+_tmp_dir = tempfile.TemporaryDirectory(prefix='pet_feeder_seq_')
+_db_names = itertools.count()
+
+
+def _engine(start=None):
+    """临时文件库（多个线程/连接共享），start 不为空时创建 device_id 序列"""
+    engine = create_engine(f"sqlite:///{os.path.join(_tmp_dir.name, f'seq{next(_db_names)}.db')}")
+    metadata.create_all(engine)
+    if start is not None:
+        with engine.begin() as connection:
+            ensure_sequence(connection, sequences, 'device_id', start)
+    return engine
+
+
+def _stored(engine, name='device_id'):
+    with engine.connect() as connection:
+        return connection.execute(select(sequences.c.next_value).where(sequences.c.name == name)).scalar()
+
+
+def test_ensure_sequence():
+    """不存在时以 start 创建，已存在时不改动"""
+    engine = _engine()
+    with engine.begin() as connection:
+        assert ensure_sequence(connection, sequences, 'device_id', 10) == 10
+        assert ensure_sequence(connection, sequences, 'device_id', 99) == 10
+    assert _stored(engine) == 10
+
+
+def test_advance_sequence():
+    """只前进不回退，序列不存在时以 minimum 创建"""
+    engine = _engine(start=10)
+    with engine.begin() as connection:
+        assert advance_sequence(connection, sequences, 'device_id', 5) == 10
+        assert advance_sequence(connection, sequences, 'device_id', 25) == 25
+        assert advance_sequence(connection, sequences, 'order_id', 3) == 3
+    assert _stored(engine) == 25
+    assert _stored(engine, 'order_id') == 3
+
+
+def test_block_exhaustion():
+    """号码段用完时预留下一段，发放的号码连续递增"""
+    engine = _engine(start=1)
+    allocator = BlockAllocator(engine, sequences, 'device_id', block_size=4)
+    assert [allocator.next() for _ in range(4)] == [1, 2, 3, 4]
+    assert allocator.stats() == {'issued': 4, 'blocks': 1, 'remaining': 0, 'block_size': 4}
+    assert _stored(engine) == 5
+    assert allocator.next() == 5
+    assert allocator.stats()['blocks'] == 2
+    assert allocator.stats()['remaining'] == 3
+    assert _stored(engine) == 9
+    assert [allocator.next() for _ in range(6)] == [6, 7, 8, 9, 10, 11]
+    assert allocator.stats()['blocks'] == 3
+
+
+def test_allocators_do_not_overlap():
+    """两个分配器（相当于两个进程）各自预留不同的号码段"""
+    engine = _engine(start=100)
+    first = BlockAllocator(engine, sequences, 'device_id', block_size=3)
+    second = BlockAllocator(engine, sequences, 'device_id', block_size=3)
+    issued = [first.next(), second.next(), first.next(), second.next(),
+              first.next(), first.next(), second.next(), second.next()]
+    assert issued == [100, 103, 101, 104, 102, 106, 105, 109]
+    assert len(set(issued)) == len(issued)
+
+
+def test_fork_reserves_new_block():
+    """进程号变化（fork 出的子进程）时不沿用父进程未用完的号码段"""
+    engine = _engine(start=1)
+    allocator = BlockAllocator(engine, sequences, 'device_id', block_size=10)
+    assert allocator.next() == 1
+    allocator._pid = -1   # 模拟在子进程中继续使用父进程的分配器
+    assert allocator.next() == 11
+    assert allocator.next() == 12
+
+
+def test_threads_unique():
+    """多个线程同时取号不会重复"""
+    engine = _engine(start=1)
+    allocator = BlockAllocator(engine, sequences, 'device_id', block_size=7)
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        values = [allocator.next() for _ in range(50)]
+        with lock:
+            results.extend(values)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(results) == list(range(1, 201))
+
+
+def test_missing_sequence():
+    """序列不存在时提示先执行迁移"""
+    allocator = BlockAllocator(_engine(), sequences, 'device_id')
+    try:
+        allocator.next()
+    except LookupError as e:
+        assert 'device_id' in str(e)
+    else:
+        raise AssertionError("序列不存在时应抛出 LookupError")
+
+
+def main():
+    tests = [test_ensure_sequence, test_advance_sequence, test_block_exhaustion,
+             test_allocators_do_not_overlap, test_fork_reserves_new_block, test_threads_unique,
+             test_missing_sequence]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
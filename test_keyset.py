@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+键集分页（keyset.py）测试
+
+使用内存 SQLite，不需要运行服务器，可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from keyset import CursorError, decode_cursor, encode_cursor, keyset_page
+
+metadata = MetaData()
+devices = Table(
+    'devices', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('device_id', String(20), nullable=False),
+    Column('last_seen', DateTime, nullable=False),
+)
+
+BASE_TIME = datetime(2024, 5, 1, 8, 0, 0, 123456)
+
+
+def _session(count=23):
+    """建表并写入 count 台设备，每三台设备的 last_seen 相同，用来检验排序列取值重复时的翻页"""
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(devices), [
+            {'id': i, 'device_id': f'ESP-{i:03d}', 'last_seen': BASE_TIME + timedelta(minutes=i // 3)}
+            for i in range(1, count + 1)])
+    return Session(engine)
+
+
+def _all_pages(session, columns, limit, descending=False):
+    pages, cursor = [], None
+    while True:
+        page = keyset_page(select(devices), columns, cursor, limit, descending, session=session)
+        pages.append([row.id for row in page.items])
+        if page.next_cursor is None:
+            return pages
+        cursor = page.next_cursor
+
+
+def test_cursor_round_trip():
+    """游标编码后按排序列类型还原，DateTime 列还原为 datetime（保留微秒）"""
+    columns = [devices.c.last_seen, devices.c.id]
+    values = [BASE_TIME, 42]
+    token = encode_cursor(values)
+    assert '=' not in token and '+' not in token and '/' not in token
+    assert decode_cursor(token, columns) == values
+    assert decode_cursor(encode_cursor(['ESP-007', 7]), [devices.c.device_id, devices.c.id]) == ['ESP-007', 7]
+
+
+def test_invalid_cursor():
+    """无法解析或与排序列个数不一致的游标抛出 CursorError"""
+    columns = [devices.c.last_seen, devices.c.id]
+    # 'eyJpZCI6MX0' 是 {"id":1} 的编码：能解析但不是列表
+    for token in ('不是游标', '!!!!', encode_cursor([1]), encode_cursor(['not-a-date', 1]), 'eyJpZCI6MX0'):
+        try:
+            decode_cursor(token, columns)
+        except CursorError:
+            continue
+        raise AssertionError(f"游标 {token!r} 应当无效")
+    assert issubclass(CursorError, ValueError)
+
+
+def test_pages_ascending():
+    """按主键升序翻页：每行恰好出现一次，最后一页没有下一页游标"""
+    session = _session()
+    pages = _all_pages(session, [devices.c.id], limit=5)
+    assert pages == [[1, 2, 3, 4, 5], [6, 7, 8, 9, 10], [11, 12, 13, 14, 15],
+                     [16, 17, 18, 19, 20], [21, 22, 23]]
+
+
+def test_pages_datetime_descending():
+    """按 (DateTime, 主键) 倒序翻页，DateTime 取值重复的行跨页时不重复不遗漏"""
+    session = _session()
+    pages = _all_pages(session, [devices.c.last_seen, devices.c.id], limit=4, descending=True)
+    ids = [row_id for page in pages for row_id in page]
+    expected = [row.id for row in session.execute(
+        select(devices.c.id).order_by(devices.c.last_seen.desc(), devices.c.id.desc()))]
+    assert ids == expected
+    assert len(ids) == len(set(ids)) == 23
+    assert all(len(page) == 4 for page in pages[:-1])
+
+
+def test_exact_multiple():
+    """行数正好是 limit 的整数倍时，最后一页不返回多余的游标"""
+    session = _session(count=10)
+    page = keyset_page(select(devices), [devices.c.id], None, 10, session=session)
+    assert [row.id for row in page.items] == list(range(1, 11))
+    assert page.next_cursor is None
+    pages = _all_pages(session, [devices.c.id], limit=5)
+    assert pages == [[1, 2, 3, 4, 5], [6, 7, 8, 9, 10]]
+
+
+def test_filtered_query():
+    """带过滤条件的查询翻页，游标条件与原有条件同时生效"""
+    session = _session()
+    query = select(devices).where(devices.c.id % 2 == 0)
+    page = keyset_page(query, [devices.c.id], None, 3, session=session)
+    assert [row.id for row in page.items] == [2, 4, 6]
+    page = keyset_page(query, [devices.c.id], page.next_cursor, 3, session=session)
+    assert [row.id for row in page.items] == [8, 10, 12]
+
+
+def main():
+    tests = [test_cursor_round_trip, test_invalid_cursor, test_pages_ascending,
+             test_pages_datetime_descending, test_exact_multiple, test_filtered_query]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志按设备限流和采样（log_pipeline.DeviceRateLimitFilter）测试
+
+直接构造 LogRecord 调用过滤器，不需要服务器，可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+import logging
+import time
+
+from log_pipeline import DeviceRateLimitFilter, StructuredFormatter
+
+
+def _record(msg='设备心跳 %s', device_id='LOG-1', **extra):
+    record = logging.LogRecord('pet_feeder.test', logging.INFO, __file__, 1, msg, ('x',), None)
+    if device_id is not None:
+        record.device_id = device_id
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+def _passed(flt, records):
+    return [r for r in records if flt.filter(r)]
+
+
+def test_burst_per_device_and_template():
+    """同一设备同一消息模板在窗口内最多放行 burst 条，其他设备、其他模板各自计数"""
+    flt = DeviceRateLimitFilter(burst=3, window=60)
+    assert len(_passed(flt, [_record() for _ in range(10)])) == 3
+    assert flt.suppressed_total == 7
+    assert len(_passed(flt, [_record(device_id='LOG-2') for _ in range(3)])) == 3
+    assert len(_passed(flt, [_record(msg='粮桶重量 %s') for _ in range(3)])) == 3
+    assert flt.suppressed_total == 7
+
+
+def test_records_without_device_not_limited():
+    """不带 device_id 的记录不受限流影响"""
+    flt = DeviceRateLimitFilter(burst=1, window=60)
+    assert len(_passed(flt, [_record(device_id=None) for _ in range(20)])) == 20
+    assert flt.suppressed_total == 0
+
+
+def test_window_resets_and_reports_suppressed():
+    """新窗口重新放行，第一条记录带上之前抑制的条数"""
+    flt = DeviceRateLimitFilter(burst=2, window=0.1)
+    _passed(flt, [_record() for _ in range(5)])
+    time.sleep(0.12)
+    first, second = _passed(flt, [_record(), _record()])
+    assert first.suppressed == 3
+    assert getattr(second, 'suppressed', None) is None
+    assert 'suppressed=3' in StructuredFormatter('%(message)s').format(first)
+
+
+def test_sampling_before_burst():
+    """sample_every=N 每 N 条放行第 1 条，被采样丢弃的不计入抑制数"""
+    flt = DeviceRateLimitFilter(burst=100, window=60)
+    passed = _passed(flt, [_record(sample_every=5, seq=i) for i in range(12)])
+    assert [r.seq for r in passed] == [0, 5, 10]
+    assert flt.suppressed_total == 0
+    # 采样后仍受 burst 限制
+    flt = DeviceRateLimitFilter(burst=2, window=60)
+    passed = _passed(flt, [_record(sample_every=2, seq=i) for i in range(10)])
+    assert [r.seq for r in passed] == [0, 2]
+    assert flt.suppressed_total == 3
+
+
+def test_max_keys_bounds_memory():
+    """键数超过上限时清空，避免大量设备把内存撑大"""
+    flt = DeviceRateLimitFilter(burst=1, window=60, max_keys=3)
+    for i in range(10):
+        flt.filter(_record(device_id=f'LOG-K{i}'))
+    assert len(flt._buckets) <= 3
+
+
+def main():
+    tests = [test_burst_per_device_and_template, test_records_without_device_not_limited,
+             test_window_resets_and_reports_suppressed, test_sampling_before_burst, test_max_keys_bounds_memory]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备指令发件箱（outbox.py 与服务器中的补发/重发/确认）测试
+
+OutboxIndex 测试不需要数据库；发件箱任务和确认的测试使用临时 SQLite 数据库，
+下发函数替换为记录调用。可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+import os
+import tempfile
+import time
+
+_tmp_dir = tempfile.TemporaryDirectory(prefix='pet_feeder_test_')
+# 环境变量必须在导入服务器模块之前设置
+os.environ.setdefault('PET_FEEDER_DATABASE_URI', f"sqlite:///{os.path.join(_tmp_dir.name, 'test.db')}")
+os.environ.setdefault('PET_FEEDER_LOG_LEVEL', 'WARNING')
+os.environ.setdefault('PET_FEEDER_LOG_FILE', '')
+
+import pet_feeder_server as server  # noqa: E402
+from outbox import OutboxEntry, OutboxIndex  # noqa: E402
+
+server.create_tables()
+
+
+def _entry(command_id, device_id='OB-1', ack_key='k', attempts=0):
+    return OutboxEntry(command_id, device_id, 'manual_feeding', ack_key, {'id': command_id}, attempts=attempts)
+
+
+def test_backoff():
+    """按 2 的幂退避，不超过 retry_max"""
+    index = OutboxIndex(retry_base=5, retry_max=30, max_attempts=10)
+    assert [index._backoff(n) for n in range(1, 6)] == [5, 10, 20, 30, 30]
+    entry = _entry(1)
+    index.add(entry)
+    index.mark_sent([entry], now=100)
+    index.mark_sent([entry], now=200)
+    assert entry.attempts == 2 and entry.next_attempt_at == 210
+
+
+def test_pending_not_retried():
+    """从未发送过的指令等设备上线时补发，不出现在重试列表里"""
+    index = OutboxIndex(retry_base=1)
+    index.add(_entry(1))
+    assert index.due({'OB-1'}, now=1000) == ([], [])
+    assert index.stats() == {'unacked': 1, 'awaiting_ack': 0, 'queued_offline': 1, 'devices': 1}
+
+
+def test_mark_sent_and_expiry():
+    """发送满 max_attempts 次后再等一个退避周期，仍未确认则判定为过期"""
+    index = OutboxIndex(retry_base=1, retry_max=10, max_attempts=2)
+    entry = _entry(1)
+    index.add(entry)
+    index.mark_sent([entry], now=100)
+    assert entry.status == 'sent'
+    assert index.due({'OB-1'}, now=100.5) == ([], [])
+    assert index.due({'OB-1'}, now=101) == ([entry], [])
+    assert index.due(set(), now=101) == ([], [])          # 离线设备不重试
+    index.mark_sent([entry], now=101)
+    assert entry.status == 'last_attempt'
+    assert index.due({'OB-1'}, now=102.5) == ([], [])
+    assert index.due({'OB-1'}, now=103) == ([], [entry])
+
+
+def test_mark_failed_keeps_pending():
+    """发送出错计入次数但保持待发送状态，满次数后同样过期"""
+    index = OutboxIndex(retry_base=1, retry_max=10, max_attempts=2)
+    entry = _entry(1)
+    index.add(entry)
+    index.mark_failed([entry], now=100)
+    assert entry.status == 'pending' and entry.attempts == 1
+    assert index.due({'OB-1'}, now=101) == ([entry], [])
+    assert index.stats()['awaiting_ack'] == 0
+    index.mark_failed([entry], now=101)
+    assert entry.status == 'last_attempt'
+    assert index.due({'OB-1'}, now=103) == ([], [entry])
+
+
+def test_add_sent():
+    """其他进程发送过的指令按已发送次数安排重试"""
+    index = OutboxIndex(retry_base=2, retry_max=100, max_attempts=3)
+    entry = _entry(1, attempts=2)
+    index.add_sent(entry, now=10)
+    assert entry.status == 'sent' and entry.next_attempt_at == 14
+    last = _entry(2, attempts=3)
+    index.add_sent(last, now=10)
+    assert last.status == 'last_attempt'
+    first = _entry(3, attempts=0)
+    index.add_sent(first, now=10)
+    assert first.next_attempt_at == 12
+    assert index.due({'OB-1'}, now=20) == ([entry, first], [last])
+
+
+def test_ack_order_and_finish():
+    """确认按入队顺序匹配；确认中的指令不再匹配、不重试；库中确认失败时恢复"""
+    index = OutboxIndex(retry_base=1)
+    first, second = _entry(1), _entry(2)
+    index.add(first)
+    index.add(second)
+    index.mark_sent([first, second], now=50)
+    assert index.begin_ack('OB-1', 'k') is first
+    assert index.begin_ack('OB-1', 'k') is second
+    assert index.begin_ack('OB-1', 'k') is None
+    assert index.begin_ack('OB-2', 'k') is None
+    assert index.due({'OB-1'}, now=100) == ([], [])
+    index.finish_ack(first, True)
+    index.finish_ack(second, False)
+    assert index.get(1) is None and index.get(2) is second
+    assert index.due({'OB-1'}, now=100) == ([second], [])
+
+
+class Deliveries(object):
+    """替换 push_batch_to_device，记录下发并模拟设备在线"""
+
+    def __init__(self):
+        self.online = set()
+        self.sent = []
+
+    def push_batch(self, device_id, messages):
+        if device_id not in self.online:
+            return False
+        self.sent.append((device_id, [m['hour'] for m in messages]))
+        return True
+
+
+class OutboxFixture(object):
+    """临时替换服务器的发件箱、在线设备和下发函数"""
+
+    def __init__(self, **options):
+        self.index = OutboxIndex(**options)
+        self.deliveries = Deliveries()
+
+    def __enter__(self):
+        self.saved = (server.outbox, server.online_device_ids, server.push_batch_to_device, server._outbox_owner)
+        server.outbox = self.index
+        server.online_device_ids = lambda: set(self.deliveries.online)
+        server.push_batch_to_device = self.deliveries.push_batch
+        server._outbox_owner = True
+        return self
+
+    def __exit__(self, *exc):
+        server.outbox, server.online_device_ids, server.push_batch_to_device, server._outbox_owner = self.saved
+
+
+def _queue_commands(device_id, hours):
+    """落库并登记到发件箱（相当于命令路由），返回指令ID"""
+    with server.app.app_context():
+        if not server.Device.query.filter_by(device_id=device_id).first():
+            server.db.session.add(server.Device(device_id=device_id, password='x'))
+        pairs = []
+        for hour in hours:
+            msg = {'type': 'manual_feeding', 'device_id': device_id, 'hour': hour, 'minute': 5, 'feeding_amount': 3}
+            pairs.append((server.queue_device_command(device_id, 'manual_feeding', msg), msg))
+        server.db.session.commit()
+        entries = [server.command_entry(command, msg) for command, msg in pairs]
+        server.db.session.remove()
+    for entry in entries:
+        server.outbox.add(entry)
+    return [entry.id for entry in entries]
+
+
+def _statuses(ids):
+    server.db_writer.submit(lambda session: None).result(5)   # 等写线程处理完之前提交的变更
+    with server.app.app_context():
+        rows = server.DeviceCommand.query.filter(server.DeviceCommand.id.in_(ids)).all()
+        result = {row.id: row.status for row in rows}
+        server.db.session.remove()
+    return [result[i] for i in ids]
+
+
+def test_dispatch_outbox_tick():
+    """设备上线时合并补发；未确认的按退避重发；库中已确认的不再重发；满次数后标记失败"""
+    with OutboxFixture(retry_base=1, retry_max=1, max_attempts=2) as fx:
+        ids = _queue_commands('OB-T1', [1, 2, 3])
+        online = server.outbox_tick(set())
+        assert online == set() and fx.deliveries.sent == []
+
+        fx.deliveries.online.add('OB-T1')
+        online = server.outbox_tick(online)
+        assert fx.deliveries.sent == [('OB-T1', [1, 2, 3])]
+        assert _statuses(ids) == ['sent', 'sent', 'sent']
+
+        # 其他进程在库中确认了第一条：重发前剔除
+        with server.app.app_context():
+            server.db.session.get(server.DeviceCommand, ids[0]).status = 'acked'
+            server.db.session.commit()
+            server.db.session.remove()
+        online = server.outbox_tick(online, now=time.monotonic() + 10)
+        assert fx.deliveries.sent[-1] == ('OB-T1', [2, 3])
+        assert fx.index.get(ids[0]) is None
+
+        # 第二次发送后再过一个退避周期仍未确认：标记失败，不再下发
+        sent_before = len(fx.deliveries.sent)
+        server.outbox_tick(online, now=time.monotonic() + 10)
+        assert len(fx.deliveries.sent) == sent_before
+        assert fx.index.device_ids() == set()
+        assert _statuses(ids) == ['acked', 'failed', 'failed']
+
+
+def test_ack_removes_only_when_db_acked():
+    """确认消息只有在库中确认了对应指令后才出队"""
+    with OutboxFixture(retry_base=1) as fx:
+        fx.deliveries.online.add('OB-A1')
+        ids = _queue_commands('OB-A1', [7, 8])
+        server.outbox_tick(set())
+        # 第二条在库中已被判定失败：确认不会让它出队
+        with server.app.app_context():
+            server.db.session.get(server.DeviceCommand, ids[1]).status = 'failed'
+            server.db.session.commit()
+            server.db.session.remove()
+        server.ack_device_command('manual_feeding', {'device_id': 'OB-A1', 'hour': 7, 'minute': 5, 'feeding_amount': 3})
+        server.ack_device_command('manual_feeding', {'device_id': 'OB-A1', 'hour': 8, 'minute': 5, 'feeding_amount': 3})
+        assert _statuses(ids) == ['acked', 'failed']
+        assert fx.index.get(ids[0]) is None
+        remaining = fx.index.get(ids[1])
+        assert remaining is not None and not remaining.acking
+
+
+def main():
+    tests = [test_backoff, test_pending_not_retried, test_mark_sent_and_expiry, test_mark_failed_keeps_pending,
+             test_add_sent, test_ack_order_and_finish, test_dispatch_outbox_tick, test_ack_removes_only_when_db_acked]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备在线状态（presence.PresenceTracker 与服务器的上下线写库、对账）测试
+
+使用临时 SQLite 数据库，可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmp_dir = tempfile.TemporaryDirectory(prefix='pet_feeder_test_')
+# 环境变量必须在导入服务器模块之前设置
+os.environ.setdefault('PET_FEEDER_DATABASE_URI', f"sqlite:///{os.path.join(_tmp_dir.name, 'test.db')}")
+os.environ.setdefault('PET_FEEDER_LOG_LEVEL', 'WARNING')
+os.environ.setdefault('PET_FEEDER_LOG_FILE', '')
+
+import pet_feeder_server as server  # noqa: E402
+from presence import PresenceTracker  # noqa: E402
+
+server.create_tables()
+
+
+class Recorder(object):
+    """记录每次 persist 调用的 (上线, 下线)"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, online_ids, offline_ids):
+        self.calls.append((sorted(online_ids), sorted(offline_ids)))
+
+
+def test_flush_collapses_window():
+    """同一窗口内反复上下线只写最后状态；与上次写库相同的变化不写库"""
+    recorder = Recorder()
+    tracker = PresenceTracker(recorder)
+    tracker.connected('P-1')
+    tracker.connected('P-2')
+    tracker.disconnected('P-2')
+    tracker.connected('P-2')
+    tracker.disconnected('P-3')
+    assert tracker.online_ids() == {'P-1', 'P-2'} and tracker.is_online('P-1')
+    assert tracker.flush() == (2, 1)
+    assert recorder.calls == [(['P-1', 'P-2'], ['P-3'])]
+
+    tracker.disconnected('P-1')
+    tracker.connected('P-1')                 # 窗口内断开又重连，最终状态与库中相同
+    assert tracker.flush() == (0, 0)
+    assert len(recorder.calls) == 1
+    tracker.disconnected('P-2')
+    assert tracker.flush() == (0, 1) and recorder.calls[-1] == ([], ['P-2'])
+    stats = tracker.stats()
+    assert (stats['connects'], stats['disconnects'], stats['flushes']) == (4, 4, 3)
+    assert (stats['persisted_online'], stats['persisted_offline'], stats['online'], stats['pending']) == (2, 2, 1, 0)
+
+
+def test_forget_stored_rewrites_next_change():
+    """对账修正过的设备，下次状态变化即使与上次写库相同也重新写库"""
+    recorder = Recorder()
+    tracker = PresenceTracker(recorder)
+    tracker.connected('P-4')
+    tracker.flush()
+    tracker.connected('P-4')
+    assert tracker.flush() == (0, 0)
+    tracker.forget_stored(['P-4'])
+    tracker.connected('P-4')
+    assert tracker.flush() == (1, 0)
+    assert recorder.calls == [(['P-4'], []), (['P-4'], [])]
+
+
+def test_background_flush_thread():
+    """start 后按 flush_interval 定时写库，重复 start 不会启动第二个线程"""
+    recorder = Recorder()
+    tracker = PresenceTracker(recorder, flush_interval=0.02)
+    tracker.start()
+    thread = tracker._thread
+    tracker.start()
+    assert tracker._thread is thread
+    tracker.connected('P-5')
+    deadline = time.monotonic() + 2
+    while not recorder.calls and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert recorder.calls == [(['P-5'], [])]
+
+
+def _online_state(device_ids):
+    with server.app.app_context():
+        devices = server.Device.query.filter(server.Device.device_id.in_(device_ids)).all()
+        state = {d.device_id: (d.is_online, d.last_seen) for d in devices}
+        server.db.session.remove()
+    return state
+
+
+def test_server_transitions_and_reconcile():
+    """批量写入上下线变化；对账只修正与连接表不一致的设备并返回它们"""
+    ids = ['PS-1', 'PS-2', 'PS-3']
+    created = datetime.utcnow() - timedelta(days=1)
+    with server.app.app_context():
+        session = server.db.session
+        for device_id in ids:
+            session.add(server.Device(device_id=device_id, password='x', is_online=device_id == 'PS-3',
+                                      last_seen=created))
+        session.commit()
+        server._apply_presence_transitions(session, ['PS-1'], ['PS-2'])
+        session.commit()
+        session.remove()
+    state = _online_state(ids)
+    assert {k: v[0] for k, v in state.items()} == {'PS-1': True, 'PS-2': False, 'PS-3': True}
+    assert state['PS-1'][1] > created and state['PS-2'][1] == created    # 只有上线更新 last_seen
+
+    # 连接表中 PS-1、PS-2 在线：PS-2 补为在线，残留在线标记的 PS-3 改为离线，PS-1 不动；
+    # pytest 下数据库与其他测试共用，其他已在线的设备视为仍在连接表中
+    connected = {'PS-1', 'PS-2'}
+    with server.app.app_context():
+        changed = server._apply_presence_reconcile(server.db.session, connected | {
+            row[0] for row in server.db.session.query(server.Device.device_id).filter(
+                server.Device.is_online == True, ~server.Device.device_id.in_(ids))})
+        server.db.session.commit()
+        server.db.session.remove()
+    assert sorted(changed) == ['PS-2', 'PS-3']
+    assert {k: v[0] for k, v in _online_state(ids).items()} == {'PS-1': True, 'PS-2': True, 'PS-3': False}
+
+
+def main():
+    tests = [test_flush_collapses_window, test_forget_stored_rewrites_next_change, test_background_flush_thread,
+             test_server_transitions_and_reconcile]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API 响应序列化（serializers.py）测试
+
+检查预编译序列化器的输出与改用它之前逐个 ORM 实例建 dict 的结果一致。
+使用临时 SQLite 数据库，不需要运行服务器，可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytz
+
+_tmp_dir = tempfile.TemporaryDirectory(prefix='pet_feeder_test_')
+# 环境变量必须在导入服务器模块之前设置
+os.environ.setdefault('PET_FEEDER_DATABASE_URI', f"sqlite:///{os.path.join(_tmp_dir.name, 'test.db')}")
+os.environ.setdefault('PET_FEEDER_LOG_LEVEL', 'WARNING')
+os.environ.setdefault('PET_FEEDER_LOG_FILE', '')
+
+import pet_feeder_server as server  # noqa: E402
+import serializers  # noqa: E402
+from serializers import RowSerializer, dumps, format_beijing, format_datetime  # noqa: E402
+
+BEIJING_TZ = pytz.timezone('Asia/Shanghai')
+NOW = datetime(2024, 12, 31, 20, 30, 15, 654321)
+# 用 pytest 一起运行时数据库与其他测试共用，只比较本文件写入的设备
+DEVICE_IDS = ('ESP-T01', 'ESP-T02')
+
+
+# 改用预编译序列化器之前的写法，作为对照
+def _legacy_beijing_str(at):
+    return at.replace(tzinfo=pytz.utc).astimezone(BEIJING_TZ).strftime('%Y-%m-%d %H:%M:%S') if at else None
+
+
+def _legacy_device_list_item(device, now):
+    return {
+        'device_id': device.device_id,
+        'device_type': device.device_type,
+        'firmware_version': device.firmware_version,
+        'heartbeat_count': device.heartbeat_count,
+        'first_seen': device.first_seen.strftime('%Y-%m-%d %H:%M:%S') if device.first_seen else None,
+        'last_seen': device.last_seen.strftime('%Y-%m-%d %H:%M:%S') if device.last_seen else None,
+        'last_seen_local': _legacy_beijing_str(device.last_seen),
+        'is_online': bool(device.last_seen) and now - device.last_seen < server.DEVICE_ONLINE_WINDOW,
+        'grain_weight': device.grain_weight,
+        'last_grain_update': _legacy_beijing_str(device.last_grain_update)
+    }
+
+
+def _legacy_plan_record_item(r):
+    return {
+        'id': r.id,
+        'day_of_week': r.day_of_week,
+        'hour': r.hour,
+        'minute': r.minute,
+        'feeding_amount': r.feeding_amount,
+        'actual_amount': r.actual_amount,
+        'status': r.status,
+        'created_at': r.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'type': 'plan'
+    }
+
+
+def _legacy_manual_record_item(m):
+    return {
+        'id': m.id,
+        'day_of_week': None,
+        'hour': m.hour,
+        'minute': m.minute,
+        'feeding_amount': m.feeding_amount,
+        'actual_amount': m.feeding_amount,
+        'status': 'success' if m.is_executed else '',
+        'created_at': m.executed_at.strftime('%Y-%m-%d %H:%M:%S') if m.executed_at else m.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'type': 'manual'
+    }
+
+
+def _seed():
+    server.create_tables()
+    with server.app.app_context():
+        session = server.db.session
+        for model in (server.FeedingRecord, server.ManualFeeding, server.Device):
+            session.query(model).filter(model.device_id.in_(DEVICE_IDS)).delete()
+        session.add_all([
+            server.Device(device_id='ESP-T01', password='x', firmware_version='1.2.3', heartbeat_count=7,
+                          first_seen=NOW - timedelta(days=30), last_seen=NOW - timedelta(seconds=30),
+                          grain_weight=321.5, last_grain_update=NOW - timedelta(hours=20)),
+            # 离线、没有粮桶读数、跨越北京时间零点
+            server.Device(device_id='ESP-T02', password='x', firmware_version=None, heartbeat_count=0,
+                          first_seen=datetime(2024, 6, 30, 16, 0, 0), last_seen=NOW - timedelta(minutes=10),
+                          grain_weight=0.0, last_grain_update=None),
+        ])
+        session.add_all([
+            server.FeedingRecord(device_id='ESP-T01', day_of_week=1, hour=8, minute=30, feeding_amount=12.5,
+                                 actual_amount=12.0, status='success', created_at=NOW - timedelta(hours=3)),
+            server.FeedingRecord(device_id='ESP-T01', day_of_week=6, hour=23, minute=59, feeding_amount=5.0,
+                                 actual_amount=None, status='failed', created_at=datetime(2024, 2, 29, 15, 59, 59, 999999)),
+        ])
+        session.add_all([
+            server.ManualFeeding(device_id='ESP-T01', hour=9, minute=5, feeding_amount=7.0, is_confirmed=True,
+                                 is_executed=True, created_at=NOW - timedelta(hours=2), executed_at=NOW - timedelta(hours=1)),
+            server.ManualFeeding(device_id='ESP-T01', hour=10, minute=0, feeding_amount=3.5, is_confirmed=True,
+                                 is_executed=True, created_at=NOW - timedelta(hours=5), executed_at=None),
+            server.ManualFeeding(device_id='ESP-T01', hour=11, minute=0, feeding_amount=2.0,
+                                 is_executed=False, created_at=NOW - timedelta(minutes=5)),
+        ])
+        session.commit()
+
+
+_seed()
+
+
+def test_format_datetime():
+    """与 strftime('%Y-%m-%d %H:%M:%S') 一致（舍去微秒），None 保持 None"""
+    for value in (NOW, datetime(2024, 1, 1), datetime(1999, 12, 31, 23, 59, 59, 999999)):
+        assert format_datetime(value) == value.strftime('%Y-%m-%d %H:%M:%S')
+    assert format_datetime(None) is None
+
+
+def test_format_beijing():
+    """固定 +8 小时偏移与 pytz 的 Asia/Shanghai 换算结果一致"""
+    value = datetime(1992, 1, 1, 0, 0, 1)
+    while value < datetime(2030, 1, 1):
+        assert format_beijing(value) == _legacy_beijing_str(value)
+        value += timedelta(days=13, hours=7, minutes=11, seconds=17)
+    assert format_beijing(datetime(2024, 6, 30, 16, 0, 0)) == '2024-07-01 00:00:00'
+    assert format_beijing(None) is None
+
+
+def test_row_serializer():
+    """字段按列顺序取值，转换函数和固定字段生效"""
+    serializer = RowSerializer([
+        server.FeedingRecord.id,
+        (server.FeedingRecord.created_at, format_datetime),
+        (server.FeedingRecord.status.label('ok'), lambda status: status == 'success'),
+    ], constants={'type': 'plan'})
+    assert serializer.keys == ['id', 'created_at', 'ok']
+    row = (3, datetime(2024, 1, 2, 3, 4, 5, 6), 'success')
+    assert serializer.serialize(row) == {'id': 3, 'created_at': '2024-01-02 03:04:05', 'ok': True, 'type': 'plan'}
+    assert serializer.many([row, (4, None, 'failed')])[1] == {'id': 4, 'created_at': None, 'ok': False, 'type': 'plan'}
+
+
+def test_dumps():
+    """输出 UTF-8 JSON bytes，中文不转义，datetime 为 ISO 8601"""
+    payload = {'message': '喂食成功', 'at': datetime(2024, 1, 2, 3, 4, 5), 'items': [1, 2.5, None, True]}
+    body = dumps(payload)
+    assert isinstance(body, bytes)
+    assert '喂食成功'.encode('utf-8') in body
+    assert json.loads(body) == {'message': '喂食成功', 'at': '2024-01-02T03:04:05', 'items': [1, 2.5, None, True]}
+    assert serializers.backend() in ('orjson', 'json')
+
+
+def test_device_list_parity():
+    """DEVICE_LIST_SERIALIZER 与原 _device_list_item 输出一致"""
+    serializer = server.DEVICE_LIST_SERIALIZER
+    with server.app.app_context():
+        session = server.db.session
+        rows = session.execute(serializer.select().where(server.Device.device_id.in_(DEVICE_IDS))
+                               .order_by(server.Device.device_id),
+                               {'online_cutoff': NOW - server.DEVICE_ONLINE_WINDOW}).all()
+        devices = session.query(server.Device).filter(server.Device.device_id.in_(DEVICE_IDS)) \
+            .order_by(server.Device.device_id).all()
+        assert serializer.many(rows) == [_legacy_device_list_item(d, NOW) for d in devices]
+        assert [item['is_online'] for item in serializer.many(rows)] == [True, False]
+
+
+def test_plan_record_parity():
+    """PLAN_RECORD_SERIALIZER 与原 _plan_record_item 输出一致"""
+    serializer = server.PLAN_RECORD_SERIALIZER
+    with server.app.app_context():
+        session = server.db.session
+        rows = session.execute(serializer.select().where(server.FeedingRecord.device_id.in_(DEVICE_IDS))
+                               .order_by(server.FeedingRecord.id)).all()
+        records = session.query(server.FeedingRecord).filter(server.FeedingRecord.device_id.in_(DEVICE_IDS)) \
+            .order_by(server.FeedingRecord.id).all()
+        assert len(records) == 2
+        assert serializer.many(rows) == [_legacy_plan_record_item(r) for r in records]
+
+
+def test_manual_record_parity():
+    """MANUAL_RECORD_SERIALIZER 与原 _manual_record_item 输出一致（含未执行、无执行时间的记录）"""
+    serializer = server.MANUAL_RECORD_SERIALIZER
+    with server.app.app_context():
+        session = server.db.session
+        rows = session.execute(serializer.select().where(server.ManualFeeding.device_id.in_(DEVICE_IDS))
+                               .order_by(server.ManualFeeding.id)).all()
+        manuals = session.query(server.ManualFeeding).filter(server.ManualFeeding.device_id.in_(DEVICE_IDS)) \
+            .order_by(server.ManualFeeding.id).all()
+        assert len(manuals) == 3
+        assert serializer.many(rows) == [_legacy_manual_record_item(m) for m in manuals]
+
+
+def test_json_body_parity():
+    """经 dumps 编码后的响应与原来 jsonify 的响应解析出相同的数据"""
+    serializer = server.PLAN_RECORD_SERIALIZER
+    with server.app.test_request_context('/'):
+        rows = server.db.session.execute(serializer.select().where(server.FeedingRecord.device_id.in_(DEVICE_IDS))
+                                         .order_by(server.FeedingRecord.id)).all()
+        records = server.FeedingRecord.query.filter(server.FeedingRecord.device_id.in_(DEVICE_IDS)) \
+            .order_by(server.FeedingRecord.id).all()
+        new_body = server.json_response({'records': serializer.many(rows)}).get_data()
+        old_body = server.jsonify({'records': [_legacy_plan_record_item(r) for r in records]}).get_data()
+        assert json.loads(new_body) == json.loads(old_body)
+
+
+def main():
+    tests = [test_format_datetime, test_format_beijing, test_row_serializer, test_dumps,
+             test_device_list_parity, test_plan_record_parity, test_manual_record_parity, test_json_body_parity]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite WAL 检查点（sqlite_storage.WalCheckpointer）测试
+
+在临时目录的 SQLite 文件库上关闭自动检查点，写入数据让 WAL 增长，
+检查按 WAL 大小选择的检查点模式。可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+import os
+import sqlite3
+import tempfile
+
+from sqlalchemy import create_engine
+
+from sqlite_storage import WalCheckpointer, install_sqlite_profile
+
+_tmp_dir = tempfile.TemporaryDirectory(prefix='pet_feeder_test_')
+
+PROFILE = {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 100, 'wal_autocheckpoint': 0}
+
+
+def _engine(name):
+    path = os.path.join(_tmp_dir.name, name)
+    engine = create_engine(f'sqlite:///{path}')
+    install_sqlite_profile(engine, PROFILE)
+    with engine.begin() as connection:
+        connection.exec_driver_sql('CREATE TABLE readings (id INTEGER PRIMARY KEY, payload TEXT)')
+    return engine, path
+
+
+def _write(engine, rows=50):
+    with engine.begin() as connection:
+        connection.exec_driver_sql('INSERT INTO readings (payload) VALUES (?)', [('x' * 1000,)] * rows)
+
+
+def test_mode_selection_by_wal_size():
+    """WAL 小于 passive_bytes 不执行；介于两者之间执行 PASSIVE；达到 truncate_bytes 执行 TRUNCATE 并截断文件"""
+    engine, path = _engine('modes.db')
+    _write(engine, rows=5)
+    size = os.path.getsize(f'{path}-wal')
+    checkpointer = WalCheckpointer(engine, passive_bytes=size + 1, truncate_bytes=size * 20)
+    assert checkpointer.wal_path == f'{path}-wal'
+    assert checkpointer.checkpoint() is None
+    assert checkpointer.stats()['last_mode'] is None
+
+    _write(engine, rows=20)
+    assert checkpointer.passive_bytes <= checkpointer.wal_size() < checkpointer.truncate_bytes
+    assert checkpointer.checkpoint() == 'PASSIVE'
+    stats = checkpointer.stats()
+    assert stats['passive'] == 1 and stats['last_checkpointed_frames'] == stats['last_log_frames'] > 0
+    assert stats['last_wal_bytes_after'] > 0          # PASSIVE 不截断WAL文件
+
+    _write(engine, rows=1000)
+    assert checkpointer.wal_size() >= checkpointer.truncate_bytes
+    assert checkpointer.checkpoint() == 'TRUNCATE'
+    stats = checkpointer.stats()
+    assert stats['truncate'] == 1 and stats['last_wal_bytes_after'] == 0 and checkpointer.wal_size() == 0
+    assert checkpointer.checkpoint() is None
+    engine.dispose()
+
+
+def test_explicit_mode():
+    """指定 mode 时不看 WAL 大小"""
+    engine, path = _engine('explicit.db')
+    _write(engine, rows=1)
+    checkpointer = WalCheckpointer(engine, passive_bytes=10 ** 9, truncate_bytes=10 ** 9)
+    assert checkpointer.checkpoint() is None
+    assert checkpointer.checkpoint('TRUNCATE') == 'TRUNCATE'
+    assert checkpointer.wal_size() == 0
+    engine.dispose()
+
+
+def test_truncate_busy_with_open_reader():
+    """有读事务时 TRUNCATE 在 busy_timeout 后返回 busy，计入统计，WAL 不截断"""
+    engine, path = _engine('busy.db')
+    _write(engine, rows=10)
+    reader = sqlite3.connect(path)
+    reader.execute('BEGIN')
+    reader.execute('SELECT count(*) FROM readings').fetchone()
+    try:
+        _write(engine, rows=10)
+        checkpointer = WalCheckpointer(engine, passive_bytes=1, truncate_bytes=1)
+        assert checkpointer.checkpoint() == 'TRUNCATE'
+        stats = checkpointer.stats()
+        assert stats['busy'] == 1 and stats['last_wal_bytes_after'] > 0
+    finally:
+        reader.rollback()
+        reader.close()
+    engine.dispose()
+
+
+def test_memory_database_not_started():
+    """内存库没有WAL文件，不启动检查点线程"""
+    checkpointer = WalCheckpointer(create_engine('sqlite://'), passive_bytes=0)
+    assert checkpointer.wal_path is None
+    assert checkpointer.start() is False
+    assert checkpointer.wal_size() == 0
+
+
+def main():
+    tests = [test_mode_selection_by_wal_size, test_explicit_mode, test_truncate_busy_with_open_reader,
+             test_memory_database_not_started]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
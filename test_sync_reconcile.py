@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备同步数据核对（sync_reconcile.reconcile）测试
+
+不需要运行服务器，可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+from collections import namedtuple
+
+from sync_reconcile import reconcile
+
+Plan = namedtuple('Plan', 'id day_of_week hour minute feeding_amount')
+
+
+def _row_key(row):
+    return (row.day_of_week, row.hour, row.minute)
+
+
+def _item_key(item):
+    return (int(item['day_of_week']), int(item['hour']), int(item['minute']))
+
+
+def _changes(row, item):
+    amount = float(item['feeding_amount'])
+    return {'feeding_amount': amount} if row.feeding_amount != amount else {}
+
+
+def _reconcile(rows, items):
+    return reconcile(rows, items, _row_key, _item_key, _changes)
+
+
+def test_insert():
+    """数据库中没有的设备条目全部新增"""
+    items = [{'day_of_week': 1, 'hour': 8, 'minute': 0, 'feeding_amount': 10},
+             {'day_of_week': 2, 'hour': 9, 'minute': 30, 'feeding_amount': 20}]
+    diff = _reconcile([], items)
+    assert diff.inserts == items
+    assert diff.updates == [] and diff.deletes == []
+    assert diff.summary() == {'inserted': 2, 'updated': 0, 'deleted': 0}
+
+
+def test_update():
+    """键相同、字段不同的行只更新变化的字段"""
+    rows = [Plan(1, 1, 8, 0, 10.0)]
+    diff = _reconcile(rows, [{'day_of_week': '1', 'hour': '8', 'minute': '0', 'feeding_amount': '15'}])
+    assert diff.updates == [(1, {'feeding_amount': 15.0})]
+    assert diff.inserts == [] and diff.deletes == []
+
+
+def test_delete():
+    """设备中已不存在的行删除"""
+    rows = [Plan(1, 1, 8, 0, 10.0), Plan(2, 3, 12, 0, 5.0)]
+    diff = _reconcile(rows, [{'day_of_week': 1, 'hour': 8, 'minute': 0, 'feeding_amount': 10}])
+    assert diff.deletes == [2]
+    assert diff.inserts == [] and diff.updates == []
+
+
+def test_no_op():
+    """数据一致时三个集合都为空"""
+    rows = [Plan(1, 1, 8, 0, 10.0), Plan(2, 3, 12, 0, 5.0)]
+    items = [{'day_of_week': 3, 'hour': 12, 'minute': 0, 'feeding_amount': 5},
+             {'day_of_week': 1, 'hour': 8, 'minute': 0, 'feeding_amount': 10}]
+    diff = _reconcile(rows, items)
+    assert diff.summary() == {'inserted': 0, 'updated': 0, 'deleted': 0}
+
+
+def test_mixed():
+    """新增、更新、删除同时出现"""
+    rows = [Plan(1, 1, 8, 0, 10.0), Plan(2, 2, 8, 0, 10.0), Plan(3, 3, 8, 0, 10.0)]
+    items = [{'day_of_week': 1, 'hour': 8, 'minute': 0, 'feeding_amount': 10},
+             {'day_of_week': 2, 'hour': 8, 'minute': 0, 'feeding_amount': 12},
+             {'day_of_week': 4, 'hour': 8, 'minute': 0, 'feeding_amount': 10}]
+    diff = _reconcile(rows, items)
+    assert diff.inserts == [items[2]]
+    assert diff.updates == [(2, {'feeding_amount': 12.0})]
+    assert diff.deletes == [3]
+
+
+def test_duplicate_keys():
+    """同一个键有多条时按顺序一一配对，多出的设备条目新增，多出的数据库行删除"""
+    item = {'day_of_week': 1, 'hour': 8, 'minute': 0, 'feeding_amount': 10}
+    rows = [Plan(1, 1, 8, 0, 10.0), Plan(2, 1, 8, 0, 10.0), Plan(3, 1, 8, 0, 10.0)]
+
+    diff = _reconcile(rows, [item])
+    assert diff.updates == [] and diff.inserts == []
+    assert diff.deletes == [2, 3]
+
+    diff = _reconcile(rows[:1], [item, dict(item, feeding_amount=20)])
+    assert diff.updates == []
+    assert diff.inserts == [dict(item, feeding_amount=20)]
+    assert diff.deletes == []
+
+    # 配对按数据库行的顺序：第一条设备条目配第一行，第二条配第二行
+    diff = _reconcile([Plan(5, 1, 8, 0, 10.0), Plan(6, 1, 8, 0, 30.0)],
+                      [dict(item, feeding_amount=30), dict(item, feeding_amount=30)])
+    assert diff.updates == [(5, {'feeding_amount': 30.0})]
+    assert diff.deletes == [] and diff.inserts == []
+
+
+def test_inputs_not_modified():
+    """核对不修改传入的行列表和条目"""
+    rows = [Plan(1, 1, 8, 0, 10.0), Plan(2, 1, 8, 0, 10.0)]
+    items = [{'day_of_week': 1, 'hour': 8, 'minute': 0, 'feeding_amount': 10}]
+    _reconcile(rows, items)
+    assert len(rows) == 2
+    assert items == [{'day_of_week': 1, 'hour': 8, 'minute': 0, 'feeding_amount': 10}]
+
+
+def main():
+    tests = [test_insert, test_update, test_delete, test_no_op, test_mixed,
+             test_duplicate_keys, test_inputs_not_modified]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
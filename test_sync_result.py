@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备同步数据上报（_apply_sync_result）测试
+
+使用临时 SQLite 数据库，不需要运行服务器，可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+from concurrent.futures import Future
+
+_tmp_dir = tempfile.TemporaryDirectory(prefix='pet_feeder_test_')
+# 环境变量必须在导入服务器模块之前设置
+os.environ.setdefault('PET_FEEDER_DATABASE_URI', f"sqlite:///{os.path.join(_tmp_dir.name, 'test.db')}")
+os.environ.setdefault('PET_FEEDER_LOG_LEVEL', 'WARNING')
+os.environ.setdefault('PET_FEEDER_LOG_FILE', '')
+
+import pet_feeder_server as server  # noqa: E402
+
+server.create_tables()
+
+
+def _device(device_id):
+    return server.db.session.execute(
+        server.select(server.Device).where(server.Device.device_id == device_id)).scalar()
+
+
+def test_unknown_device_not_created():
+    """未注册的设备ID上报同步数据时不创建设备（否则任何连接都能以默认密码建出可登录的设备）"""
+    with server.app.app_context():
+        session = server.db.session
+        summary = server._apply_sync_result(session, 'SYNC-UNKNOWN', {'grain_weight': 123.4})
+        session.commit()
+        assert summary['grain_weight_updated'] is False
+        assert _device('SYNC-UNKNOWN') is None
+
+
+def test_known_device_updated():
+    """已注册的设备只更新粮桶重量和更新时间"""
+    with server.app.app_context():
+        session = server.db.session
+        session.add(server.Device(device_id='SYNC-KNOWN', password='hash', grain_weight=1.0))
+        session.commit()
+        summary = server._apply_sync_result(session, 'SYNC-KNOWN', {'grain_weight': 88.5})
+        session.commit()
+        device = _device('SYNC-KNOWN')
+        assert summary['grain_weight_updated'] is True
+        assert device.grain_weight == 88.5
+        assert device.password == 'hash'
+        assert device.last_grain_update is not None
+
+
+class FakeFrontend(object):
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(json.loads(message))
+
+
+def test_write_failure_notifies_frontend():
+    """同步数据写库失败时，等待结果的前端收到失败消息并被清理"""
+    def failing_submit(fn, *args):
+        future = Future()
+        future.set_exception(RuntimeError('disk full'))
+        return future
+
+    frontend = FakeFrontend()
+    server.pending_sync_frontends['SYNC-FAIL'] = frontend
+    saved = server.db_writer.submit
+    server.db_writer.submit = failing_submit
+    try:
+        asyncio.run(server.handle_sync_result(object(), {'type': 'sync_result', 'device_id': 'SYNC-FAIL'}, 'test'))
+    finally:
+        server.db_writer.submit = saved
+    message, = frontend.sent
+    assert message['type'] == 'sync_result' and message['device_id'] == 'SYNC-FAIL'
+    assert message['status'] == 'error' and 'disk full' in message['message']
+    assert 'SYNC-FAIL' not in server.pending_sync_frontends
+
+
+def main():
+    tests = [test_unknown_device_not_created, test_known_device_updated, test_write_failure_notifies_frontend]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库写后批量提交器（write_behind.py）测试
+
+用假的 app/db 记录每次提交包含的变更，不需要数据库，可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+import contextlib
+import threading
+import time
+
+from write_behind import WriteBehindWriter, WriteQueueFull
+
+
+class FakeSession(object):
+    """记录已提交的变更；变更函数往 pending 里追加，commit 时整体落到 commits"""
+
+    def __init__(self):
+        self.pending = []
+        self.commits = []
+
+    def commit(self):
+        self.commits.append(list(self.pending))
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+
+
+class FakeDb(object):
+    def __init__(self):
+        self.session = FakeSession()
+        self.session.remove = lambda: None
+
+
+class FakeApp(object):
+    def app_context(self):
+        return contextlib.suppress()
+
+
+def _writer(**kwargs):
+    db = FakeDb()
+    return WriteBehindWriter(FakeApp(), db, **kwargs), db.session
+
+
+def _append(session, value):
+    session.pending.append(value)
+    return value
+
+
+def _fail(session, value):
+    session.pending.append(value)
+    raise ValueError(f'bad {value}')
+
+
+def test_batching():
+    """最大延迟内提交的变更合并到一个事务"""
+    writer, session = _writer(max_batch_size=50, max_latency=0.3)
+    futures = [writer.submit(_append, i) for i in range(10)]
+    assert [f.result(2) for f in futures] == list(range(10))
+    writer.stop()
+    assert session.commits == [list(range(10))]
+    stats = writer.stats()
+    assert stats['batches'] == 1 and stats['committed'] == 10 and stats['last_batch_size'] == 10
+
+
+def test_batch_size_limit():
+    """一批最多 max_batch_size 条"""
+    writer, session = _writer(max_batch_size=4, max_latency=0.3)
+    futures = [writer.submit(_append, i) for i in range(10)]
+    for f in futures:
+        f.result(2)
+    writer.stop()
+    assert [len(c) for c in session.commits] == [4, 4, 2]
+
+
+def test_replay_isolates_failure():
+    """整批失败后逐条重放，只有出错的变更失败"""
+    writer, session = _writer(max_batch_size=50, max_latency=0.3)
+    futures = [writer.submit(_fail if i == 3 else _append, i) for i in range(6)]
+    results = []
+    for f in futures:
+        try:
+            results.append(f.result(2))
+        except ValueError as e:
+            results.append(str(e))
+    writer.stop()
+    assert results == [0, 1, 2, 'bad 3', 4, 5]
+    assert session.commits == [[0], [1], [2], [4], [5]]
+    stats = writer.stats()
+    assert stats['committed'] == 5 and stats['failed'] == 1 and stats['batches'] == 1
+
+
+def test_stop_drains_queue():
+    """停止时队列中剩余的变更全部提交"""
+    writer, session = _writer(max_batch_size=3, max_latency=0.5)
+    futures = [writer.submit(_append, i) for i in range(7)]
+    writer.stop()
+    assert all(f.done() for f in futures)
+    assert sum(session.commits, []) == list(range(7))
+    assert not writer.stats()['running']
+
+
+def test_full_queue_rejects_without_blocking():
+    """队列已满时立即拒绝，返回以 WriteQueueFull 失败的 Future"""
+    writer, session = _writer(max_batch_size=1, max_latency=0, max_queue_size=1)
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocked(session):
+        started.set()
+        release.wait(2)
+
+    writer.submit(blocked)
+    assert started.wait(2)           # 写线程正在执行第一条
+    queued = writer.submit(_append, 1)
+    begin = time.monotonic()
+    rejected = writer.submit(_append, 2)
+    assert time.monotonic() - begin < 0.5
+    assert isinstance(rejected.exception(0), WriteQueueFull)
+    release.set()
+    assert queued.result(2) == 1
+    writer.stop()
+    stats = writer.stats()
+    assert stats['rejected'] == 1 and stats['enqueued'] == 2 and stats['committed'] == 2
+
+
+def test_stats_consistent_under_concurrency():
+    """多个线程同时提交时统计不丢失"""
+    writer, session = _writer(max_batch_size=100, max_latency=0.01)
+
+    def submit_many():
+        for i in range(500):
+            writer.submit(_append, i)
+
+    threads = [threading.Thread(target=submit_many) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    writer.stop()
+    stats = writer.stats()
+    assert stats['enqueued'] == stats['committed'] == 2000
+    assert len(sum(session.commits, [])) == 2000
+
+
+def main():
+    tests = [test_batching, test_batch_size_limit, test_replay_isolates_failure, test_stop_drains_queue,
+             test_full_queue_rejects_without_blocking, test_stats_consistent_under_concurrency]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备WebSocket消息编码（ws_codec.py）测试
+
+msgpack/cbor2 为可选依赖：已安装时用真实库做编解码往返，未安装时换成
+以JSON字节实现的假模块，只检查协商和按编码分派的逻辑。
+可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+import json
+from types import SimpleNamespace
+
+import ws_codec
+
+MESSAGE = {'type': 'feeding_plan', 'device_id': 'ESP-001', 'hour': 8, 'minute': 30, 'feeding_amount': 12.5,
+           'note': '早餐'}
+
+
+def _fake_module(tag, dumps_name, loads_name):
+    """按JSON编码、前面加标记字节的假编码模块，用来确认走的是哪个编码"""
+    def dumps(obj, **kwargs):
+        return tag + json.dumps(obj).encode('utf-8')
+
+    def loads(frame, **kwargs):
+        assert frame.startswith(tag)
+        return json.loads(frame[len(tag):].decode('utf-8'))
+    return SimpleNamespace(**{dumps_name: dumps, loads_name: loads})
+
+
+class Codecs(object):
+    """测试期间保证 msgpack/cbor2 都可用（未安装的用假模块），结束后恢复"""
+
+    def __enter__(self):
+        self.saved = (ws_codec.msgpack, ws_codec.cbor2)
+        if ws_codec.msgpack is None:
+            ws_codec.msgpack = _fake_module(b'M', 'packb', 'unpackb')
+        if ws_codec.cbor2 is None:
+            ws_codec.cbor2 = _fake_module(b'C', 'dumps', 'loads')
+        return self
+
+    def __exit__(self, *exc):
+        ws_codec.msgpack, ws_codec.cbor2 = self.saved
+
+
+def test_negotiate_without_optional_codecs():
+    """没有安装二进制编码时只能协商出JSON"""
+    saved = (ws_codec.msgpack, ws_codec.cbor2)
+    ws_codec.msgpack = ws_codec.cbor2 = None
+    try:
+        assert ws_codec.supported_encodings() == [ws_codec.JSON]
+        assert ws_codec.negotiate(['msgpack', 'cbor', 'json']) == ws_codec.JSON
+        assert ws_codec.negotiate(['msgpack']) == ws_codec.JSON
+    finally:
+        ws_codec.msgpack, ws_codec.cbor2 = saved
+
+
+def test_negotiate_order_and_allowed():
+    """按设备给出的优先级选第一个双方都支持的；allowed 限制服务器启用的编码，JSON 始终可用"""
+    with Codecs():
+        assert ws_codec.supported_encodings() == ['msgpack', 'cbor', 'json']
+        assert ws_codec.negotiate(['cbor', 'msgpack']) == 'cbor'
+        assert ws_codec.negotiate(['protobuf', 'msgpack']) == 'msgpack'
+        assert ws_codec.negotiate(['protobuf']) == 'json'
+        assert ws_codec.negotiate(None) == 'json'
+        assert ws_codec.negotiate([]) == 'json'
+        assert ws_codec.negotiate(['cbor', 'msgpack'], allowed=['msgpack']) == 'msgpack'
+        assert ws_codec.negotiate(['cbor'], allowed=['msgpack']) == 'json'
+        assert ws_codec.negotiate(['json', 'msgpack'], allowed=[]) == 'json'
+
+
+def test_encode_decode_roundtrip():
+    """JSON 为文本帧，其他编码为二进制帧；解码还原原消息"""
+    with Codecs():
+        frame = ws_codec.encode(ws_codec.JSON, MESSAGE)
+        assert isinstance(frame, str) and json.loads(frame) == MESSAGE
+        for encoding in (ws_codec.MSGPACK, ws_codec.CBOR):
+            frame = ws_codec.encode(encoding, MESSAGE)
+            assert isinstance(frame, bytes)
+            assert ws_codec.decode(encoding, frame) == MESSAGE
+        assert ws_codec.encode(ws_codec.MSGPACK, MESSAGE) != ws_codec.encode(ws_codec.CBOR, MESSAGE)
+
+
+def test_decode_text_frames_as_json():
+    """设备发来的文本帧不论协商结果都按JSON解析；JSON编码下的二进制帧按UTF-8 JSON解析"""
+    with Codecs():
+        text = json.dumps(MESSAGE)
+        for encoding in (ws_codec.JSON, ws_codec.MSGPACK, ws_codec.CBOR):
+            assert ws_codec.decode(encoding, text) == MESSAGE
+        assert ws_codec.decode(ws_codec.JSON, text.encode('utf-8')) == MESSAGE
+
+
+def test_traffic_counter():
+    """发送时累计实际字节和同一消息的JSON字节，差值为节省的流量"""
+    counter = ws_codec.TrafficCounter()
+    counter.sent('json', 100)
+    counter.sent('msgpack', 60, json_bytes=100)
+    counter.sent('msgpack', 30, json_bytes=50)
+    counter.received('msgpack', 20)
+    stats = counter.stats()
+    assert stats['json']['saved_bytes_out'] == 0 and stats['json']['frames_out'] == 1
+    assert stats['msgpack'] == {'frames_out': 2, 'bytes_out': 90, 'json_bytes_out': 150, 'frames_in': 1,
+                                'bytes_in': 20, 'saved_bytes_out': 60}
+
+
+def main():
+    tests = [test_negotiate_without_optional_codecs, test_negotiate_order_and_allowed,
+             test_encode_decode_roundtrip, test_decode_text_frames_as_json, test_traffic_counter]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
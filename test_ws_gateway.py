@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程WebSocket网关（ws_gateway.py）测试
+
+路由表使用真实的 multiprocessing Manager；多进程测试 fork 出两个网关工作进程，
+在临时端口上连接设备和前端，检查路由登记/释放和跨工作进程的下发、同步结果、订阅推送。
+使用临时 SQLite 数据库，可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import websockets
+
+_tmp_dir = tempfile.TemporaryDirectory(prefix='pet_feeder_test_')
+# 环境变量必须在导入服务器模块之前设置
+os.environ.setdefault('PET_FEEDER_DATABASE_URI', f"sqlite:///{os.path.join(_tmp_dir.name, 'test.db')}")
+os.environ.setdefault('PET_FEEDER_LOG_LEVEL', 'WARNING')
+os.environ.setdefault('PET_FEEDER_LOG_FILE', '')
+os.environ.setdefault('PET_FEEDER_GRAIN_SERIES_DIR', os.path.join(_tmp_dir.name, 'grain_series'))
+
+import pet_feeder_server as server  # noqa: E402
+from ws_gateway import RouteClient, RoutingTable, ipc_request, ipc_socket_path, start_workers  # noqa: E402
+
+server.create_tables()
+
+_manager = multiprocessing.get_context('fork').Manager()
+
+
+def test_claim_release():
+    """只有路由仍指向本进程时才释放；版本号随设备路由变化"""
+    routes = RoutingTable(_manager)
+    version, ids = routes.device_ids_since(None)
+    assert ids == []
+    routes.claim('GW-A', 0)
+    routes.claim('GW-B', 1)
+    version, ids = routes.device_ids_since(version)
+    assert sorted(ids) == ['GW-A', 'GW-B']
+    assert routes.device_ids_since(version) == (version, None)
+    routes.claim('GW-A', 1)        # 设备重连到工作进程1
+    routes.release('GW-A', 0)      # 工作进程0上旧连接的释放不影响新路由
+    assert routes.lookup('GW-A') == 1
+    routes.release('GW-A', 1)
+    routes.release('GW-C', 0)      # 从未登记的设备
+    assert routes.lookup('GW-A') is None
+    version, ids = routes.device_ids_since(version)
+    assert ids == ['GW-B']
+
+
+def test_route_client_order():
+    """submit 的写与之后 call 的读按顺序执行，读总能看到本进程之前的写"""
+    client = RouteClient(RoutingTable(_manager))
+
+    async def run():
+        for i in range(20):
+            client.submit('claim', f'GW-{i}', 0)
+        assert await client.call('lookup', 'GW-19') == 0
+        client.submit('release', 'GW-19', 0)
+        return await client.call('lookup', 'GW-19')
+
+    assert asyncio.run(run()) is None
+    assert client.stats()['writes'] == 21
+
+
+def test_route_client_subscriber_cache():
+    """订阅者查询结果缓存在本进程，失效后重新查询；查询期间发生的失效不写入缓存"""
+    routes = RoutingTable(_manager)
+    client = RouteClient(routes)
+    routes.add_subscriber('GW-S', 1)
+
+    async def run():
+        assert await client.subscriber_workers('GW-S') == (1,)
+        routes.add_subscriber('GW-S', 2)
+        assert await client.subscriber_workers('GW-S') == (1,)   # 未收到通知前使用缓存
+        client.invalidate_subscribers('GW-S')
+        assert await client.subscriber_workers('GW-S') == (1, 2)
+        # 查询进行中收到失效通知：结果照常返回但不缓存
+        pending = asyncio.ensure_future(client.subscriber_workers('GW-T'))
+        await asyncio.sleep(0)
+        client.invalidate_subscribers('GW-T')
+        assert await pending == ()
+        assert 'GW-T' not in client._subscribers
+
+    asyncio.run(run())
+    stats = client.stats()
+    assert stats['cache_hits'] == 1 and stats['invalidations'] == 2 and stats['cached_devices'] == 1
+
+
+def test_route_client_loop_not_blocked():
+    """路由表调用在专用线程中执行，等待期间事件循环照常运行"""
+    release = threading.Event()
+
+    class SlowRoutes(object):
+        def lookup(self, device_id):
+            release.wait(2)
+            return 3
+
+    client = RouteClient(SlowRoutes())
+
+    async def run():
+        lookup = asyncio.ensure_future(client.call('lookup', 'GW-X'))
+        ticks = 0
+        while not lookup.done():
+            ticks += 1
+            if ticks == 5:
+                release.set()
+            await asyncio.sleep(0.01)
+        return ticks, lookup.result()
+
+    ticks, worker_id = asyncio.run(run())
+    assert ticks >= 5 and worker_id == 3
+
+
+def test_online_device_ids_cached():
+    """路由没有变化时 online_device_ids 不重新取全部设备ID"""
+    routes = RoutingTable(_manager)
+    routes.claim('GW-O1', 0)
+    saved_routes, saved_cache = server.ws_routes, dict(server._online_ids_cache)
+    server.ws_routes = routes
+    server._online_ids_cache.update(version=None, ids=frozenset())
+    calls = []
+    original = routes.device_ids_since
+    routes.device_ids_since = lambda version: calls.append(original(version)) or calls[-1]
+    try:
+        assert server.online_device_ids() == {'GW-O1'}
+        assert server.online_device_ids() == {'GW-O1'}
+        routes.claim('GW-O2', 1)
+        assert server.online_device_ids() == {'GW-O1', 'GW-O2'}
+    finally:
+        server.ws_routes = saved_routes
+        server._online_ids_cache.update(saved_cache)
+    assert [ids is None for _, ids in calls] == [False, True, False]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+async def _recv_json(ws, timeout=3):
+    return json.loads(await asyncio.wait_for(ws.recv(), timeout))
+
+
+def test_multi_worker_gateway():
+    """两个工作进程：路由登记/释放、从其他进程下发、跨进程同步结果和订阅推送"""
+    ipc_dir = os.path.join(_tmp_dir.name, 'ipc')
+    os.makedirs(ipc_dir, exist_ok=True)
+    port = _free_port()
+    routes = RoutingTable(_manager)
+    saved = (server.app.config['WS_PORT'], server.app.config['WS_GATEWAY_IPC_DIR'])
+    server.app.config['WS_PORT'] = port
+    server.app.config['WS_GATEWAY_IPC_DIR'] = ipc_dir
+    try:
+        processes = start_workers(2, server.run_ws_worker, (routes, 2))
+    finally:
+        server.app.config['WS_PORT'], server.app.config['WS_GATEWAY_IPC_DIR'] = saved
+    url = f'ws://127.0.0.1:{port}'
+    try:
+        assert _wait_for(lambda: all(os.path.exists(ipc_socket_path(ipc_dir, i)) for i in range(2)))
+        asyncio.run(_exercise_gateway(url, routes, ipc_dir))
+    finally:
+        for p in processes:
+            p.terminate()
+        for p in processes:
+            p.join(5)
+
+
+async def _exercise_gateway(url, routes, ipc_dir):
+    loop = asyncio.get_running_loop()
+    # 前端订阅后路由表登记订阅者所在的工作进程，由此得知前端连在哪个进程
+    frontend = await websockets.connect(url)
+    token = server.ws_subscribe_token('GW-PROBE')
+    await frontend.send(json.dumps({'type': 'subscribe', 'device_ids': ['GW-PROBE'], 'token': token}))
+    assert (await _recv_json(frontend))['device_ids'] == ['GW-PROBE']
+    assert await loop.run_in_executor(None, _wait_for, lambda: routes.subscriber_workers('GW-PROBE'))
+    frontend_worker, = routes.subscriber_workers('GW-PROBE')
+
+    # 连接设备直到有设备落在另一个工作进程上（SO_REUSEPORT 按连接分配）
+    devices = {}
+    for i in range(40):
+        device_id = f'GW-M{i}'
+        ws = await websockets.connect(url)
+        await ws.send(json.dumps({'type': 'register', 'device_id': device_id}))
+        await _recv_json(ws)
+        devices[device_id] = ws
+        assert await loop.run_in_executor(None, _wait_for, lambda: routes.lookup(device_id) is not None)
+        if routes.lookup(device_id) != frontend_worker:
+            break
+    remote_id = device_id
+    assert routes.lookup(remote_id) != frontend_worker
+    assert set(routes.device_ids()) == set(devices)
+
+    # 测试进程（相当于HTTP进程）经IPC向每台设备下发
+    for device_id, ws in devices.items():
+        path = ipc_socket_path(ipc_dir, routes.lookup(device_id))
+        result = await loop.run_in_executor(None, ipc_request, path, {
+            'op': 'send', 'device_id': device_id, 'message': json.dumps({'type': 'ota_update', 'url': 'http://x'})})
+        assert result == {'ok': True}
+        assert (await _recv_json(ws))['type'] == 'ota_update'
+
+    # 等待同步结果的前端与设备不在同一进程：设备的 sync_result 经IPC送回前端
+    await frontend.send(json.dumps({'type': 'sync_request', 'device_id': remote_id}))
+    await _recv_json(frontend)
+    assert (await _recv_json(devices[remote_id]))['type'] == 'sync_request'
+    await devices[remote_id].send(json.dumps({'type': 'sync_result', 'device_id': remote_id}))
+    reply = await _recv_json(frontend)
+    assert reply['type'] == 'sync_result' and reply['device_id'] == remote_id
+    assert await loop.run_in_executor(None, _wait_for, lambda: routes.lookup_frontend(remote_id) is None)
+
+    # 订阅推送：设备在另一个工作进程上报粮桶重量，前端所在进程收到转发。
+    # 订阅前先上报一次，设备所在进程缓存了“没有订阅者”，订阅后须经IPC通知失效
+    await devices[remote_id].send(json.dumps({'type': 'grain_weight', 'device_id': remote_id, 'grain_weight': 1.0}))
+    await asyncio.sleep(0.2)
+    token = server.ws_subscribe_token(remote_id)
+    await frontend.send(json.dumps({'type': 'subscribe', 'device_ids': [remote_id], 'token': token}))
+    assert (await _recv_json(frontend))['device_ids'] == [remote_id]
+    assert await loop.run_in_executor(None, _wait_for, lambda: routes.subscriber_workers(remote_id) == [frontend_worker])
+    await asyncio.sleep(0.2)   # 失效通知在路由表写入之后异步发出
+    await devices[remote_id].send(json.dumps({'type': 'grain_weight', 'device_id': remote_id, 'grain_weight': 42.5}))
+    event = await _recv_json(frontend)
+    assert event['type'] == 'grain_weight_update' and event['grain_weight'] == 42.5
+
+    # 前端断开后订阅登记被移除，其他进程的缓存随之失效，不再转发
+    await frontend.close()
+    assert await loop.run_in_executor(None, _wait_for, lambda: routes.subscriber_workers(remote_id) == [])
+
+    # 设备断开后路由释放
+    for ws in devices.values():
+        await ws.close()
+    assert await loop.run_in_executor(None, _wait_for, lambda: routes.device_ids() == [])
+
+
+def main():
+    tests = [test_claim_release, test_route_client_order, test_route_client_subscriber_cache,
+             test_route_client_loop_not_blocked, test_online_device_ids_cached, test_multi_worker_gateway]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+前端事件订阅（ws_topics.TopicRegistry 与 subscribe 消息处理）测试
+
+WebSocket 连接用假对象代替，使用临时 SQLite 数据库，不需要运行服务器，
+可以直接执行本文件，也可以用 pytest 运行。
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+
+from websockets.exceptions import ConnectionClosedOK
+from websockets.frames import Close
+
+_tmp_dir = tempfile.TemporaryDirectory(prefix='pet_feeder_test_')
+# 环境变量必须在导入服务器模块之前设置
+os.environ.setdefault('PET_FEEDER_DATABASE_URI', f"sqlite:///{os.path.join(_tmp_dir.name, 'test.db')}")
+os.environ.setdefault('PET_FEEDER_LOG_LEVEL', 'WARNING')
+os.environ.setdefault('PET_FEEDER_LOG_FILE', '')
+
+import pet_feeder_server as server  # noqa: E402
+from ws_topics import TopicRegistry  # noqa: E402
+
+server.create_tables()
+
+
+class FakeSocket(object):
+    """按顺序返回 incoming 中的消息，取完后视为连接关闭；发送的消息记录在 sent 中"""
+
+    def __init__(self, incoming=(), delay=0, broken=False, on_close=None):
+        self.incoming = list(incoming)
+        self.sent = []
+        self.delay = delay
+        self.broken = broken
+        self.on_close = on_close
+        self.remote_address = ('127.0.0.1', 50000)
+
+    async def recv(self):
+        if self.incoming:
+            return self.incoming.pop(0)
+        if self.on_close:
+            self.on_close(self)
+        raise ConnectionClosedOK(Close(1000, ''), None)
+
+    async def send(self, data):
+        if self.broken:
+            raise ConnectionResetError('连接已断开')
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(data)
+
+
+def test_publish_only_to_subscribers():
+    """只推送给订阅了该设备的连接"""
+    registry = TopicRegistry()
+    a, b, c = FakeSocket(), FakeSocket(), FakeSocket()
+    registry.subscribe(a, 'ESP-001')
+    registry.subscribe(b, 'ESP-001')
+    registry.subscribe(c, 'ESP-002')
+    assert asyncio.run(registry.publish('ESP-001', 'm1')) == 2
+    assert asyncio.run(registry.publish('ESP-003', 'm2')) == 0
+    assert a.sent == ['m1'] and b.sent == ['m1'] and c.sent == []
+    assert registry.stats()['published'] == 1 and registry.stats()['delivered'] == 2
+
+
+def test_slow_and_broken_subscribers():
+    """慢连接超时只丢这一条并保留订阅，已断开的连接移除全部订阅，都不影响其他连接"""
+    registry = TopicRegistry(send_timeout=0.05)
+    ok, slow, broken = FakeSocket(), FakeSocket(delay=1), FakeSocket(broken=True)
+    for ws in (ok, slow, broken):
+        registry.subscribe(ws, 'ESP-001')
+    registry.subscribe(broken, 'ESP-002')
+    assert asyncio.run(registry.publish('ESP-001', 'm')) == 1
+    assert ok.sent == ['m']
+    assert registry.subscriber_count('ESP-001') == 2
+    assert registry.subscriber_count('ESP-002') == 0
+    stats = registry.stats()
+    assert stats['timeouts'] == 1 and stats['errors'] == 1
+
+
+def test_unsubscribe_and_topic_change():
+    """第一个订阅者出现/最后一个订阅者离开时通知，断开时清理全部订阅"""
+    changes = []
+    registry = TopicRegistry(max_topics_per_socket=2, on_topic_change=lambda topic, active: changes.append((topic, active)))
+    a, b = FakeSocket(), FakeSocket()
+    assert registry.subscribe(a, 'ESP-001') and registry.subscribe(a, 'ESP-002')
+    assert registry.subscribe(a, 'ESP-001')          # 重复订阅不占名额
+    assert not registry.subscribe(a, 'ESP-003')      # 超过单连接上限
+    registry.subscribe(b, 'ESP-001')
+    registry.unsubscribe(a, 'ESP-002')
+    assert sorted(registry.unsubscribe_all(a)) == ['ESP-001']
+    assert registry.subscriber_count('ESP-001') == 1
+    registry.unsubscribe_all(b)
+    assert changes == [('ESP-001', True), ('ESP-002', True), ('ESP-002', False), ('ESP-001', False)]
+    assert registry.stats()['sockets'] == 0 and registry.stats()['topics'] == 0
+
+
+def _subscribe(device_ids, token):
+    ws = FakeSocket()
+    asyncio.run(server.handle_subscribe(ws, {'type': 'subscribe', 'device_ids': device_ids, 'token': token}, 'test'))
+    server.ws_topics.unsubscribe_all(ws)
+    return json.loads(ws.sent[0])
+
+
+def test_subscribe_requires_token():
+    """没有令牌、令牌无效或令牌未授权的设备一律拒绝"""
+    token = server.ws_subscribe_token('ESP-101')
+    assert _subscribe(['ESP-101'], token) == {'type': 'subscribed', 'device_ids': ['ESP-101']}
+    assert _subscribe(['ESP-101', 'ESP-102'], token) == {
+        'type': 'subscribed', 'device_ids': ['ESP-101'], 'rejected': ['ESP-102']}
+    assert _subscribe(['ESP-101'], None)['rejected'] == ['ESP-101']
+    assert _subscribe(['ESP-101'], token[:-2] + 'xx')['rejected'] == ['ESP-101']
+    other_app = server.URLSafeTimedSerializer('another-secret', salt='ws-subscribe')
+    assert _subscribe(['ESP-101'], other_app.dumps(['ESP-101']))['rejected'] == ['ESP-101']
+
+
+def test_subscribe_token_expired():
+    """过期的令牌无效"""
+    token = server.ws_subscribe_token('ESP-101')
+    max_age = server.app.config['WS_SUBSCRIBE_TOKEN_MAX_AGE']
+    server.app.config['WS_SUBSCRIBE_TOKEN_MAX_AGE'] = -1
+    try:
+        assert server.ws_subscribe_grants(token) == set()
+    finally:
+        server.app.config['WS_SUBSCRIBE_TOKEN_MAX_AGE'] = max_age
+    assert server.ws_subscribe_grants(token) == {'ESP-101'}
+
+
+def test_disconnect_unsubscribes():
+    """前端连接断开时 ws_handler 清理它的订阅"""
+    counts = []
+    token = server.ws_subscribe_token('ESP-201', 'ESP-202')
+    ws = FakeSocket(
+        [json.dumps({'type': 'subscribe', 'device_ids': ['ESP-201', 'ESP-202'], 'token': token})],
+        on_close=lambda socket: counts.append(server.ws_topics.subscriber_count('ESP-201')))
+    asyncio.run(server.ws_handler(ws))
+    assert counts == [1]
+    assert server.ws_topics.subscriber_count('ESP-201') == 0
+    assert server.ws_topics.subscriber_count('ESP-202') == 0
+
+
+def test_page_renders_token():
+    """设备主页签发本设备的订阅令牌"""
+    with server.app.app_context():
+        server.db.session.add(server.Device(device_id='ESP-301', password='x'))
+        server.db.session.commit()
+    client = server.app.test_client()
+    with client.session_transaction() as sess:
+        sess['device_id'] = 'ESP-301'
+    html = client.get('/').get_data(as_text=True)
+    start = html.index("token: '") + len("token: '")
+    assert server.ws_subscribe_grants(html[start:html.index("'", start)]) == {'ESP-301'}
+
+
+def main():
+    tests = [test_publish_only_to_subscribers, test_slow_and_broken_subscribers, test_unsubscribe_and_topic_change,
+             test_subscribe_requires_token, test_subscribe_token_expired, test_disconnect_unsubscribes,
+             test_page_renders_token]
+    for test in tests:
+        test()
+        print(f"通过: {test.__name__}")
+    print(f"全部 {len(tests)} 项测试通过")
+
+
+if __name__ == "__main__":
+    main()
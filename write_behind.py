@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库写后(write-behind)批量提交器
+
+WebSocket处理函数不再在事件循环线程上直接执行 db.session.commit()，
+而是把变更函数放入队列，由独立的写线程批量取出，
+在一个事务中执行后统一提交。
+队列有上限时，队列已满的变更直接拒绝（返回失败的 Future），提交方不会阻塞。
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+log = logging.getLogger('pet_feeder.write_behind')
+
+
+class WriteQueueFull(RuntimeError):
+    """写队列已满，变更被拒绝"""
+
+
+class _Mutation(object):
+    """队列中的一条待执行变更"""
+    __slots__ = ('fn', 'args', 'kwargs', 'future', 'enqueued_at')
+
+    def __init__(self, fn, args, kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class WriteBehindWriter(object):
+    """批量提交数据库变更的写线程
+
+    submit(fn, *args) 把 fn(session, *args) 放入队列并立即返回 Future；
+    写线程每次最多攒 max_batch_size 条、最多等待 max_latency 秒，
+    然后在同一个事务里执行并提交。整批提交失败时逐条重放，
+    只有出错的那条变更会失败。max_queue_size 大于0时队列已满的变更被拒绝，
+    返回的 Future 以 WriteQueueFull 失败。
+    """
+
+    def __init__(self, app, db, max_batch_size=200, max_latency=0.05, max_queue_size=0):
+        self.app = app
+        self.db = db
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        # 统计由提交方线程和写线程共同更新
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'enqueued': 0,
+            'committed': 0,
+            'failed': 0,
+            'rejected': 0,
+            'batches': 0,
+            'last_batch_size': 0,
+            'last_flush_ms': 0.0,
+            'max_queue_depth': 0,
+        }
+
+    def start(self):
+        """启动写线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='db-write-behind', daemon=True)
+            self._thread.start()
+            log.info("数据库写后提交线程已启动: max_batch_size=%s, max_latency=%ss", self.max_batch_size, self.max_latency)
+
+    def stop(self, timeout=5.0):
+        """停止写线程，退出前会把队列中剩余的变更全部提交"""
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def submit(self, fn, *args, **kwargs):
+        """提交一条变更，返回 concurrent.futures.Future
+
+        在事件循环中需要结果时可以 await asyncio.wrap_future(future)。
+        从不阻塞：队列已满时返回以 WriteQueueFull 失败的 Future。
+        """
+        if not self._thread or not self._thread.is_alive():
+            self.start()
+        mutation = _Mutation(fn, args, kwargs)
+        try:
+            self._queue.put_nowait(mutation)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats['rejected'] += 1
+            log.warning("写队列已满(%s)，拒绝变更: %s", self._queue.maxsize, getattr(fn, '__name__', fn))
+            mutation.future.set_exception(WriteQueueFull("写队列已满"))
+            return mutation.future
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self._stats['enqueued'] += 1
+            if depth > self._stats['max_queue_depth']:
+                self._stats['max_queue_depth'] = depth
+        return mutation.future
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        """写队列统计信息"""
+        with self._stats_lock:
+            info = dict(self._stats)
+        info['queue_depth'] = self._queue.qsize()
+        info['max_batch_size'] = self.max_batch_size
+        info['max_latency'] = self.max_latency
+        info['running'] = bool(self._thread and self._thread.is_alive())
+        return info
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                try:
+                    first = self._queue.get(timeout=0.5)
+                except queue.Empty:
+                    if self._stopping.is_set():
+                        break
+                    continue
+                batch = [first]
+                deadline = first.enqueued_at + self.max_latency
+                while len(batch) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        if remaining > 0:
+                            batch.append(self._queue.get(timeout=remaining))
+                        else:
+                            # 已到最大延迟，只取队列里现成的
+                            batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self._flush(batch)
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        session = self.db.session
+        results = []
+        try:
+            for item in batch:
+                results.append(item.fn(session, *item.args, **item.kwargs))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            log.warning("批量提交失败，逐条重放 %s 条变更: %s", len(batch), e)
+            results = None
+        committed = failed = 0
+        if results is not None:
+            for item, result in zip(batch, results):
+                item.future.set_result(result)
+            committed = len(batch)
+        else:
+            for item in batch:
+                try:
+                    result = item.fn(session, *item.args, **item.kwargs)
+                    session.commit()
+                    item.future.set_result(result)
+                    committed += 1
+                except Exception as e:
+                    session.rollback()
+                    log.error("数据库变更执行失败: %s %s", getattr(item.fn, '__name__', item.fn), e)
+                    item.future.set_exception(e)
+                    failed += 1
+        self.db.session.remove()
+        with self._stats_lock:
+            self._stats['committed'] += committed
+            self._stats['failed'] += failed
+            self._stats['batches'] += 1
+            self._stats['last_batch_size'] = len(batch)
+            self._stats['last_flush_ms'] = round((time.perf_counter() - started) * 1000, 3)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备WebSocket消息编码
+
+设备在 register 消息里用 encodings 字段按优先级列出支持的编码，
+服务器选出双方都支持的第一个；之后服务器发给设备的消息用该编码
+（MessagePack/CBOR 走二进制帧），设备发来的文本帧始终按JSON解析。
+老固件不带 encodings 字段，继续使用JSON。
+
+msgpack、cbor2 为可选依赖，未安装时对应编码不参与协商。
+"""
+
+import json
+import threading
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+JSON = 'json'
+MSGPACK = 'msgpack'
+CBOR = 'cbor'
+
+
+def supported_encodings():
+    """本机可用的编码，按服务器偏好排序"""
+    encodings = []
+    if msgpack is not None:
+        encodings.append(MSGPACK)
+    if cbor2 is not None:
+        encodings.append(CBOR)
+    encodings.append(JSON)
+    return encodings
+
+
+def negotiate(requested, allowed=None):
+    """按设备给出的优先级选编码，没有可用的返回JSON"""
+    supported = supported_encodings()
+    if allowed is not None:
+        supported = [e for e in supported if e in allowed or e == JSON]
+    for encoding in requested or ():
+        if encoding in supported:
+            return encoding
+    return JSON
+
+
+def encode(encoding, obj):
+    """编码一条消息，JSON返回str（文本帧），其他返回bytes（二进制帧）"""
+    if encoding == MSGPACK:
+        return msgpack.packb(obj, use_bin_type=True)
+    if encoding == CBOR:
+        return cbor2.dumps(obj)
+    return json.dumps(obj)
+
+
+def decode(encoding, frame):
+    """解码设备发来的一帧：文本帧按JSON，二进制帧按协商的编码"""
+    if isinstance(frame, str):
+        return json.loads(frame)
+    if encoding == MSGPACK:
+        return msgpack.unpackb(frame, raw=False)
+    if encoding == CBOR:
+        return cbor2.loads(frame)
+    return json.loads(frame.decode('utf-8'))
+
+
+class TrafficCounter(object):
+    """按编码统计收发帧数和字节数
+
+    非JSON编码发送时同时累计同一消息JSON编码的字节数，
+    两者之差即为编码节省的流量（不含 permessage-deflate 压缩的收益）。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def _counter(self, encoding):
+        counter = self._counters.get(encoding)
+        if counter is None:
+            counter = self._counters[encoding] = {
+                'frames_out': 0,
+                'bytes_out': 0,
+                'json_bytes_out': 0,
+                'frames_in': 0,
+                'bytes_in': 0,
+            }
+        return counter
+
+    def sent(self, encoding, nbytes, json_bytes=None):
+        with self._lock:
+            counter = self._counter(encoding)
+            counter['frames_out'] += 1
+            counter['bytes_out'] += nbytes
+            counter['json_bytes_out'] += nbytes if json_bytes is None else json_bytes
+
+    def received(self, encoding, nbytes):
+        with self._lock:
+            counter = self._counter(encoding)
+            counter['frames_in'] += 1
+            counter['bytes_in'] += nbytes
+
+    def stats(self):
+        with self._lock:
+            info = {}
+            for encoding, counter in self._counters.items():
+                item = dict(counter)
+                item['saved_bytes_out'] = counter['json_bytes_out'] - counter['bytes_out']
+                info[encoding] = item
+        return info
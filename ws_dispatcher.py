@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WebSocket消息分发器
+
+按消息类型(type)注册处理函数，分发时一次字典查找，
+同时按类型统计调用次数、出错次数和处理耗时直方图。
+"""
+
+import time
+
+# 耗时直方图的桶上限（毫秒），最后一个桶为 +Inf
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class _TypeMetrics(object):
+    """单个消息类型的统计"""
+    __slots__ = ('count', 'errors', 'total_ms', 'max_ms', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, elapsed_ms, failed):
+        self.count += 1
+        if failed:
+            self.errors += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def quantile(self, q):
+        """根据直方图估算分位数（返回所在桶的上限，毫秒）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return float(LATENCY_BUCKETS_MS[i]) if i < len(LATENCY_BUCKETS_MS) else round(self.max_ms, 3)
+        return round(self.max_ms, 3)
+
+    def to_dict(self):
+        histogram = {}
+        for bound, n in zip(LATENCY_BUCKETS_MS, self.buckets):
+            histogram[f'le_{bound}ms'] = n
+        histogram['le_inf'] = self.buckets[-1]
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avg_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': self.quantile(0.50),
+            'p99_ms': self.quantile(0.99),
+            'histogram': histogram,
+        }
+
+
+class MessageDispatcher(object):
+    """按消息类型分发的注册表
+
+    用法:
+        dispatcher = MessageDispatcher()
+
+        @dispatcher.handler('grain_weight')
+        async def on_grain_weight(websocket, msg_data, peer):
+            ...
+
+        handled = await dispatcher.dispatch(msg_data.get('type'), websocket, msg_data, peer)
+    """
+
+    def __init__(self):
+        self._handlers = {}
+        self._metrics = {}
+        self.unknown_count = 0
+
+    def handler(self, msg_type):
+        """装饰器：为消息类型注册处理函数"""
+        def decorator(fn):
+            self.register(msg_type, fn)
+            return fn
+        return decorator
+
+    def register(self, msg_type, fn):
+        if msg_type in self._handlers:
+            raise ValueError(f"消息类型 {msg_type} 已注册处理函数")
+        self._handlers[msg_type] = fn
+        self._metrics[msg_type] = _TypeMetrics()
+
+    def message_types(self):
+        return list(self._handlers)
+
+    async def dispatch(self, msg_type, *args):
+        """分发消息，未注册的类型返回 False；处理函数抛出的异常会在记录后继续抛出"""
+        fn = self._handlers.get(msg_type)
+        if fn is None:
+            self.unknown_count += 1
+            return False
+        started = time.perf_counter()
+        failed = False
+        try:
+            await fn(*args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._metrics[msg_type].observe((time.perf_counter() - started) * 1000, failed)
+        return True
+
+    def metrics(self):
+        """各消息类型的统计信息"""
+        return {
+            'message_types': {t: m.to_dict() for t, m in self._metrics.items()},
+            'unknown': self.unknown_count,
+            'latency_buckets_ms': list(LATENCY_BUCKETS_MS),
+        }
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程WebSocket网关
+
+N 个工作进程通过 SO_REUSEPORT 绑定同一个端口，由内核在进程间分配新连接。
+设备连接在哪个进程上记录在共享路由表(device_id -> worker_id)里，
+其他进程（Flask 或别的工作进程）通过本机 Unix 套接字把消息交给该进程下发。
+
+IPC 协议：每个连接发送一行 JSON 请求，收到一行 JSON 应答后关闭。
+
+路由表的每次读写都是一次与 Manager 进程的阻塞往返，工作进程的事件循环中通过 RouteClient 使用：
+读写都在一个专用线程中按顺序执行，订阅者所在进程的查询结果在本进程缓存，由其他进程经IPC通知失效。
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger('pet_feeder.ws')
+
+
+def ipc_socket_path(ipc_dir, worker_id):
+    """工作进程的IPC套接字路径"""
+    return os.path.join(ipc_dir, f"ws_worker_{worker_id}.sock")
+
+
+class RoutingTable(object):
+    """设备到工作进程的共享路由表
+
+    基于 multiprocessing.Manager 的字典，在父进程中创建，fork 出的工作进程和
+    Flask 进程共用。除设备连接外，还记录等待 sync_result 的前端连接在哪个进程上，
+    以及哪些进程上有订阅某台设备事件的前端连接。
+    """
+
+    def __init__(self, manager):
+        self._devices = manager.dict()
+        self._frontends = manager.dict()
+        self._subscribers = manager.dict()   # device_id -> 有该设备订阅者的工作进程列表
+        self._subscribers_lock = manager.Lock()
+        self._version = manager.Value('i', 0)  # 设备路由每次变化加一，读取方据此判断是否需要重新取全部设备
+        self._version_lock = manager.Lock()
+
+    def _bump(self):
+        with self._version_lock:
+            self._version.value += 1
+
+    def claim(self, device_id, worker_id):
+        self._devices[device_id] = worker_id
+        self._bump()
+
+    def release(self, device_id, worker_id):
+        """只有路由仍指向本进程时才删除（设备可能已重连到别的进程）"""
+        try:
+            if self._devices.get(device_id) == worker_id:
+                del self._devices[device_id]
+                self._bump()
+        except KeyError:
+            pass
+
+    def lookup(self, device_id):
+        return self._devices.get(device_id)
+
+    def device_ids(self):
+        return list(self._devices.keys())
+
+    def device_ids_since(self, version):
+        """设备路由在 version 之后有变化时返回 (当前版本, 设备ID列表)，否则返回 (version, None)"""
+        current = self._version.value
+        if current == version:
+            return version, None
+        return current, list(self._devices.keys())
+
+    def claim_frontend(self, device_id, worker_id):
+        self._frontends[device_id] = worker_id
+
+    def release_frontend(self, device_id, worker_id):
+        try:
+            if self._frontends.get(device_id) == worker_id:
+                del self._frontends[device_id]
+        except KeyError:
+            pass
+
+    def lookup_frontend(self, device_id):
+        return self._frontends.get(device_id)
+
+    def add_subscriber(self, device_id, worker_id):
+        with self._subscribers_lock:
+            workers = self._subscribers.get(device_id, [])
+            if worker_id not in workers:
+                self._subscribers[device_id] = workers + [worker_id]
+
+    def remove_subscriber(self, device_id, worker_id):
+        with self._subscribers_lock:
+            workers = [w for w in self._subscribers.get(device_id, []) if w != worker_id]
+            if workers:
+                self._subscribers[device_id] = workers
+            else:
+                self._subscribers.pop(device_id, None)
+
+    def subscriber_workers(self, device_id):
+        return self._subscribers.get(device_id, [])
+
+
+class RouteClient(object):
+    """工作进程事件循环中使用 RoutingTable 的方式
+
+    submit() 把写操作排入专用线程后立即返回；call() 在同一线程中执行读操作并等待结果，
+    因此读总能看到本进程之前提交的写。subscriber_workers() 的结果缓存在本进程，
+    其他进程的订阅变化通过 IPC 通知后调用 invalidate_subscribers() 失效。
+    """
+
+    def __init__(self, routes, max_cached=10000):
+        self.routes = routes
+        self.max_cached = max_cached
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ws-routes')
+        self._subscribers = {}   # device_id -> 有订阅者的工作进程
+        self._generation = 0     # 每次失效加一，查询期间发生过失效的结果不写入缓存
+        self._stats = {'calls': 0, 'writes': 0, 'cache_hits': 0, 'invalidations': 0}
+
+    def submit(self, method, *args):
+        """按提交顺序在路由线程中执行写操作，返回 concurrent.futures.Future"""
+        self._stats['writes'] += 1
+        future = self._executor.submit(getattr(self.routes, method), *args)
+        future.add_done_callback(_log_route_error)
+        return future
+
+    async def call(self, method, *args):
+        self._stats['calls'] += 1
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, getattr(self.routes, method), *args)
+
+    async def subscriber_workers(self, device_id):
+        workers = self._subscribers.get(device_id)
+        if workers is not None:
+            self._stats['cache_hits'] += 1
+            return workers
+        generation = self._generation
+        workers = tuple(await self.call('subscriber_workers', device_id))
+        if generation == self._generation:
+            if len(self._subscribers) >= self.max_cached:
+                self._subscribers.clear()
+            self._subscribers[device_id] = workers
+        return workers
+
+    def invalidate_subscribers(self, device_id):
+        self._generation += 1
+        self._stats['invalidations'] += 1
+        self._subscribers.pop(device_id, None)
+
+    def stats(self):
+        info = dict(self._stats)
+        info['cached_devices'] = len(self._subscribers)
+        return info
+
+
+def _log_route_error(future):
+    if future.exception() is not None:
+        log.warning("更新网关路由表失败: %s", future.exception())
+
+
+def ipc_request(path, request, timeout=3.0):
+    """同步IPC请求（供 Flask 线程使用），返回应答字典"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        data = b''
+        while not data.endswith(b'\n'):
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+    if not data:
+        return {'ok': False, 'error': 'IPC无应答'}
+    return json.loads(data.decode('utf-8'))
+
+
+async def ipc_request_async(path, request, timeout=3.0):
+    """异步IPC请求（供工作进程之间转发使用）"""
+    reader, writer = await asyncio.wait_for(asyncio.open_unix_connection(path), timeout)
+    try:
+        writer.write((json.dumps(request) + '\n').encode('utf-8'))
+        await writer.drain()
+        line = await asyncio.wait_for(reader.readline(), timeout)
+    finally:
+        writer.close()
+    if not line:
+        return {'ok': False, 'error': 'IPC无应答'}
+    return json.loads(line.decode('utf-8'))
+
+
+async def serve_ipc(path, handle_request):
+    """在 path 上启动IPC服务，handle_request(request) 为协程，返回应答字典"""
+    if os.path.exists(path):
+        os.unlink(path)
+
+    async def on_connection(reader, writer):
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            try:
+                response = await handle_request(json.loads(line.decode('utf-8')))
+            except Exception as e:
+                response = {'ok': False, 'error': str(e)}
+            writer.write((json.dumps(response) + '\n').encode('utf-8'))
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_unix_server(on_connection, path=path)
+
+
+def start_workers(num_workers, target, args=()):
+    """fork 出 num_workers 个工作进程，每个调用 target(worker_id, *args)"""
+    ctx = multiprocessing.get_context('fork')
+    processes = []
+    for worker_id in range(num_workers):
+        p = ctx.Process(target=target, args=(worker_id,) + tuple(args),
+                        name=f"ws-worker-{worker_id}", daemon=True)
+        p.start()
+        processes.append(p)
+    return processes
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WebSocket事件订阅表
+
+前端页面/管理后台按设备ID订阅事件（粮桶重量、OTA进度等），
+设备上报时只推送给订阅了该设备的连接，并发发送，单个连接超时不影响其他连接。
+所有方法都在 WebSocket 事件循环中调用，不需要加锁。
+"""
+
+import asyncio
+
+
+class TopicRegistry(object):
+    """topic(device_id) -> 订阅连接集合
+
+    on_topic_change(topic, active) 在本进程某个 topic 出现第一个订阅者(True)
+    或失去最后一个订阅者(False)时调用，用于多进程网关登记订阅所在进程。
+    """
+
+    def __init__(self, send_timeout=2.0, max_topics_per_socket=50, on_topic_change=None):
+        self.send_timeout = send_timeout
+        self.max_topics_per_socket = max_topics_per_socket
+        self._on_topic_change = on_topic_change
+        self._topics = {}      # topic -> set(websocket)
+        self._by_socket = {}   # websocket -> set(topic)
+        self._stats = {
+            'published': 0,
+            'delivered': 0,
+            'timeouts': 0,
+            'errors': 0,
+        }
+
+    def subscribe(self, websocket, topic):
+        """订阅，超过单连接订阅上限返回 False"""
+        topics = self._by_socket.setdefault(websocket, set())
+        if topic in topics:
+            return True
+        if len(topics) >= self.max_topics_per_socket:
+            return False
+        topics.add(topic)
+        subscribers = self._topics.setdefault(topic, set())
+        subscribers.add(websocket)
+        if len(subscribers) == 1 and self._on_topic_change:
+            self._on_topic_change(topic, True)
+        return True
+
+    def unsubscribe(self, websocket, topic):
+        topics = self._by_socket.get(websocket)
+        if topics is not None:
+            topics.discard(topic)
+            if not topics:
+                del self._by_socket[websocket]
+        subscribers = self._topics.get(topic)
+        if subscribers is None or websocket not in subscribers:
+            return
+        subscribers.discard(websocket)
+        if not subscribers:
+            del self._topics[topic]
+            if self._on_topic_change:
+                self._on_topic_change(topic, False)
+
+    def unsubscribe_all(self, websocket):
+        """连接断开时清理其全部订阅，返回原来订阅的 topic 列表"""
+        topics = list(self._by_socket.get(websocket, ()))
+        for topic in topics:
+            self.unsubscribe(websocket, topic)
+        return topics
+
+    def subscriber_count(self, topic):
+        return len(self._topics.get(topic, ()))
+
+    async def publish(self, topic, message):
+        """并发推送给 topic 的全部订阅者，返回成功送达的连接数"""
+        subscribers = list(self._topics.get(topic, ()))
+        if not subscribers:
+            return 0
+        self._stats['published'] += 1
+        results = await asyncio.gather(*(self._send(ws, message) for ws in subscribers))
+        delivered = sum(results)
+        self._stats['delivered'] += delivered
+        return delivered
+
+    async def _send(self, websocket, message):
+        try:
+            await asyncio.wait_for(websocket.send(message), self.send_timeout)
+            return 1
+        except asyncio.TimeoutError:
+            # 慢连接只丢这一条，保留订阅
+            self._stats['timeouts'] += 1
+        except Exception:
+            # 连接已关闭，移除其订阅
+            self._stats['errors'] += 1
+            self.unsubscribe_all(websocket)
+        return 0
+
+    def stats(self):
+        info = dict(self._stats)
+        info['topics'] = len(self._topics)
+        info['sockets'] = len(self._by_socket)
+        info['subscriptions'] = sum(len(s) for s in self._topics.values())
+        info['send_timeout'] = self.send_timeout
+        return info
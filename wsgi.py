@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WSGI 入口
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+WebSocket服务和后台任务由 gunicorn.conf.py 在主进程中 fork 出的服务进程运行，
+这里只导出 Flask 应用，HTTP 工作进程不会启动它们。
+"""
+
+from pet_feeder_server import app
+
+application = app